@@ -0,0 +1,67 @@
+"""Benchmarks the extraction of the v7 activities (`client_vu7.WhoopClient.get_activities`).
+
+Compares the previous extraction (`eval` of each workout cell, a lambda per zone and row and a
+per-row sport lookup) with the columnar one on multi-year mock data.
+
+Usage (from the repository root): python -m benchmarks.bench_activities [--years 1 5 10]
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import timed, vu7_windows
+from whoopy.client_vu7 import WhoopClient, _normalize_during
+from whoopy.models.models_v1 import SPORT_IDS
+
+
+def legacy_activities(data: pd.DataFrame, sport_dict) -> pd.DataFrame:
+    """Previous implementation of `get_activities` (on a copy of the key data)."""
+    data = data.copy()
+
+    def apply_zone(item, zone):
+        if item is None or zone not in item:
+            return None
+        return item[zone] / 60000.0
+
+    data["strain.workouts"] = data["strain.workouts"].apply(lambda x: eval(str(x)))
+    data = data[data["strain.workouts"].apply(len) > 0]
+    data = data.explode("strain.workouts")
+    act_data = pd.json_normalize(data["strain.workouts"])
+    act_data = _normalize_during(act_data, False, day=True)
+    for z in range(0, 6):
+        act_data["zone{}_minutes".format(z + 1)] = act_data["zones"].apply(
+            lambda x: apply_zone(x, z)
+        )
+    act_data["sport_name"] = act_data.sportId.apply(lambda x: sport_dict[x])
+    act_data.drop(["zones", "during.bounds"], axis=1, inplace=True)
+    act_data.drop_duplicates(inplace=True)
+    return act_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 5, 10])
+    args = parser.parse_args()
+
+    client = WhoopClient()
+    client.start_datetime = True
+    client.sport_dict = SPORT_IDS
+    print(f"{'years':<8}{'workouts':>10}{'legacy':>12}{'columnar':>12}{'speedup':>10}  (seconds)")
+    for years in args.years:
+        data = client.get_keydata(raw_data=vu7_windows(365 * years))
+        legacy = legacy_activities(data, SPORT_IDS)
+        fast = client.get_activities(all_data=data)
+        assert np.allclose(legacy["total_minutes"], fast["total_minutes"])
+        assert (legacy["sport_name"].values == fast["sport_name"].astype(str).values).all()
+
+        t_legacy = timed(legacy_activities, data, SPORT_IDS)
+        t_fast = timed(lambda: client.get_activities(all_data=data))
+        print(
+            f"{years:<8}{len(fast):>10}{t_legacy:>12.3f}{t_fast:>12.3f}{t_legacy / t_fast:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
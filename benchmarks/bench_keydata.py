@@ -0,0 +1,67 @@
+"""Benchmarks the flattening of the v7 key data (`client_vu7.WhoopClient.get_keydata`).
+
+Compares the previous implementation (concat of all windows, per-row lambdas for the minute
+conversion and the nap durations) with the vectorized one on multi-year mock data.
+
+Usage (from the repository root): python -m benchmarks.bench_keydata [--years 5]
+"""
+
+import argparse
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import timed, vu7_windows
+from whoopy.client_vu7 import WhoopClient
+
+
+def legacy_keydata(raw_data: List[List[Dict]]) -> pd.DataFrame:
+    """Previous implementation of `get_keydata`."""
+    all_data = pd.concat([pd.json_normalize(data) for data in raw_data])
+    all_data.reset_index(drop=True, inplace=True)
+    all_data["days"] = all_data["days"].map(lambda d: d[0])
+    all_data.rename(columns={"days": r"day"}, inplace=True)
+    for sleep_col in ["qualityDuration", "needBreakdown.baseline", "needBreakdown.debt"]:
+        all_data["sleep." + sleep_col] = (
+            all_data["sleep." + sleep_col]
+            .astype(float)
+            .apply(lambda x: np.nan if np.isnan(x) else x / 60000)
+        )
+    all_data["nap_duration"] = all_data["sleep.naps"].apply(
+        lambda x: x[0]["qualityDuration"] / 60000
+        if len(x) == 1 and x[0]["qualityDuration"] is not None
+        else (
+            sum([y["qualityDuration"] for y in x if y["qualityDuration"] is not None]) / 60000
+            if len(x) > 0
+            else 0
+        )
+    )
+    all_data.drop(["sleep.naps"], axis=1, inplace=True)
+    all_data.drop_duplicates(subset=["day", "sleep.id"], inplace=True)
+    return all_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 5, 10])
+    args = parser.parse_args()
+
+    client = WhoopClient()
+    print(f"{'years':<8}{'days':>8}{'legacy':>12}{'vectorized':>12}{'speedup':>10}  (seconds)")
+    for years in args.years:
+        windows = vu7_windows(365 * years)
+        legacy = legacy_keydata(windows)
+        fast = client.get_keydata(raw_data=windows)
+        assert np.allclose(legacy["nap_duration"], fast["nap_duration"])
+        assert np.allclose(legacy["sleep.qualityDuration"], fast["sleep.qualityDuration"])
+
+        t_legacy = timed(legacy_keydata, windows)
+        t_fast = timed(client.get_keydata, windows)
+        print(
+            f"{years:<8}{len(fast):>8}{t_legacy:>12.3f}{t_fast:>12.3f}{t_legacy / t_fast:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Benchmarks the construction of v1 records from API payloads.
+
+Compares the previous construction (`strptime` + `time_helper` + validated nested models),
+the validated `from_dict` and its fast path for trusted payloads (`validate=False`). The speedup
+is the one of the fast path over the validated `from_dict`.
+
+Usage (from the repository root): python -m benchmarks.bench_models [--years 10]
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import time
+from typing import Callable, Dict, List
+
+import time_helper as th
+
+from benchmarks import common
+from whoopy.mock.generator import MODELS
+
+
+def legacy_from_dict(cls, data: Dict, correct_offset: bool = False):
+    """Previous implementation of `UserData.from_dict` (without the print of each record)."""
+    td = timedelta(days=0)
+    if correct_offset and "timezone_offset" in data:
+        to_str = data["timezone_offset"]
+        negative = to_str[0] == "-"
+        if to_str[0] in ["+", "-"]:
+            to_str = to_str[1:]
+        hours, minutes = to_str.split(":")
+        td = timedelta(hours=int(hours), minutes=int(minutes))
+        if negative:
+            td *= -1
+    for dt in ["created_at", "updated_at", "start", "end"]:
+        if dt in data and data[dt] is not None:
+            date = datetime.strptime(data[dt], "%Y-%m-%dT%H:%M:%S.%fZ")
+            data[dt] = th.any_to_datetime(date) + td
+    data = cls._dict_parse(data)
+    return cls(**data)
+
+
+def records_per_sec(fn: Callable[[Dict], object], payloads: List[Dict], copy: bool = False) -> float:
+    """Measures the throughput of the construction function."""
+    if copy:
+        # legacy implementation modifies the payloads (copy outside of the timing)
+        import copy as cp
+
+        payloads = cp.deepcopy(payloads)
+    start = time.perf_counter()
+    for p in payloads:
+        fn(p)
+    return len(payloads) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=10)
+    args = parser.parse_args()
+
+    data = common.payloads(365 * args.years)
+    print(f"{'model':<16}{'legacy':>14}{'validated':>14}{'fast':>14}{'speedup':>10}  (records/sec)")
+    for resource, cls in MODELS.items():
+        records = data[resource]
+        legacy = records_per_sec(lambda p: legacy_from_dict(cls, p, True), records, copy=True)
+        validated = records_per_sec(lambda p: cls.from_dict(p, True), records)
+        fast = records_per_sec(lambda p: cls.from_dict(p, True, validate=False), records)
+        print(f"{resource:<16}{legacy:>14,.0f}{validated:>14,.0f}{fast:>14,.0f}{fast / validated:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Inputs and timing shared by the benchmarks.
+
+All inputs are generated by the mock dataset (`whoopy.mock.generator`), so the benchmarks run on
+the same payloads the mock server and the generated datasets serve (and the same seed always gives
+the same input).
+"""
+
+from functools import lru_cache
+import time
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+from whoopy.handlers.handler_v1 import WhoopDataHandler
+from whoopy.mock.generator import MODELS, iter_plans, iter_records
+from whoopy.models import models_v1 as models
+
+
+SEED = 42
+
+
+def timed(fn, *args, repeat: int = 3) -> float:
+    """Returns the best time of the function in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@lru_cache(maxsize=None)
+def plans(days: int) -> List[Tuple[Dict, Dict]]:
+    """The plans of `days` days of the first mock user (with the plan of the following day)."""
+    return list(iter_plans(0, days, SEED))
+
+
+@lru_cache(maxsize=None)
+def payloads(days: int) -> Dict[str, List[Dict]]:
+    """The payloads of `days` days of the first mock user keyed by resource (see `iter_records`)."""
+    records = {}
+    for resource, record in iter_records(0, days, SEED):
+        records.setdefault(resource, []).append(record)
+    return records
+
+
+@lru_cache(maxsize=None)
+def v1_payloads(days: int) -> List[Tuple[str, Dict]]:
+    """The v1 records of `days` days as `(resource, payload)`."""
+    return [(resource, record) for resource in MODELS for record in payloads(days)[resource]]
+
+
+def v1_frames(days: int) -> Dict[str, pd.DataFrame]:
+    """The v1 records of `days` days as the frames of the data handlers (keyed by resource)."""
+    handler = WhoopDataHandler(None, "cycle", models.UserCycle)
+    data = payloads(days)
+    return {
+        resource: handler._to_df([model.from_dict(p, True, validate=False) for p in data[resource]])
+        for resource, model in MODELS.items()
+    }
+
+
+def vu7_windows(days: int) -> List[List[Dict]]:
+    """The v7 cycles of `days` days in 7 day windows (as returned by `iter_keydata_raw`)."""
+    cycles = payloads(days)["vu7_cycle"]
+    return [cycles[i : i + 7] for i in range(0, len(cycles), 7)]
+
+
+def vu7_sleeps(days: int) -> Dict[int, Dict]:
+    """The v7 sleep payloads of `days` days keyed by their id (as returned by `pull_sleep`)."""
+    return {sleep["activityId"]: sleep for sleep in payloads(days)["vu7_sleep"]}
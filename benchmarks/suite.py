@@ -0,0 +1,310 @@
+"""Microbenchmarks of the parsing and transform hot paths with stored baselines.
+
+Runs each case on fixed synthetic inputs (from the mock dataset, see `benchmarks.common`, so the same
+seed always gives the same input) at several sizes and measures the best wall time and the peak
+traced memory (`tracemalloc`, i.e. python allocations including numpy and pandas buffers). Results are written as
+JSON; `compare` flags cases that got slower or allocate more than the baseline by more than the
+threshold (and exits with status 1, so it can gate CI).
+
+Usage (from the repository root):
+    python -m benchmarks.suite run [--cases keydata hr_decode] [--output benchmarks/baselines/baseline.json]
+    python -m benchmarks.suite compare benchmarks/baselines/baseline.json [results.json] [--threshold 0.25]
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import json
+import platform
+import sys
+import tracemalloc
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+import pydantic
+
+from benchmarks.common import SEED, payloads, plans, timed, v1_frames, v1_payloads, vu7_sleeps, vu7_windows
+from tools.explorer.Helper import preprocess_metrics, recovery_by_cycle
+from whoopy.client_vu7 import WhoopClient, whoop_time_str
+from whoopy.handlers.handler_v1 import WhoopDataHandler
+from whoopy.heart_rate import HeartRateBuffer, decode_samples
+from whoopy.mock.data import heart_rate, user_id
+from whoopy.mock.generator import MODELS
+from whoopy.models import models_v1 as models
+
+
+DEFAULT_BASELINE = "benchmarks/baselines/baseline.json"
+DEFAULT_THRESHOLD = 0.25
+# times and peaks below these are dominated by noise and never flagged
+MIN_TIME = 0.002
+MIN_PEAK_MB = 0.1
+
+
+def _client(**kwargs) -> WhoopClient:
+    client = WhoopClient(**kwargs)
+    client.auth_token = "benchmark"
+    client.start_datetime = True
+    client.sport_dict = models.SPORT_IDS
+    return client
+
+
+# ---- cases (each returns the callable to measure on the input of the size) ----
+
+
+def case_from_dict(days: int) -> Callable:
+    """`UserData.from_dict` of all v1 records on the fast path for trusted payloads (`validate=False`)."""
+    records = [(MODELS[r], p) for r, p in v1_payloads(days)]
+
+    def run():
+        for cls, payload in records:
+            cls.from_dict(payload, True, validate=False)
+
+    return run
+
+
+def case_from_dict_validated(days: int) -> Callable:
+    """`UserData.from_dict` of all v1 records through pydantic validation."""
+    records = [(MODELS[r], p) for r, p in v1_payloads(days)]
+
+    def run():
+        for cls, payload in records:
+            cls.from_dict(payload, True)
+
+    return run
+
+
+def case_to_df(days: int) -> Callable:
+    """`WhoopDataHandler._to_df` of the parsed sleeps."""
+    handler = WhoopDataHandler(None, "activity/sleep", models.UserSleep)
+    data = [models.UserSleep.from_dict(p, True, validate=False) for p in payloads(days)["activity/sleep"]]
+    return lambda: handler._to_df(data)
+
+
+def case_whoop_time_str(count: int) -> Callable:
+    """`client_vu7.whoop_time_str` of window bounds."""
+    start = datetime(2020, 1, 1)
+    dates = [start + timedelta(minutes=37 * i) for i in range(count)]
+
+    def run():
+        for date in dates:
+            whoop_time_str(date)
+
+    return run
+
+
+def case_keydata(days: int) -> Callable:
+    """`WhoopClient.get_keydata` of the raw 7 day windows."""
+    client, windows = _client(), vu7_windows(days)
+    return lambda: client.get_keydata(raw_data=windows)
+
+
+def case_activities(days: int) -> Callable:
+    """`WhoopClient.get_activities` of the key data."""
+    client = _client()
+    data = client.get_keydata(raw_data=vu7_windows(days))
+    return lambda: client.get_activities(all_data=data)
+
+
+def case_sleep_events(days: int) -> Callable:
+    """`WhoopClient.get_sleep_events_all` after `get_sleep` (the sleeps come from the cache, parsing only)."""
+    sleeps = vu7_sleeps(days)
+    client = _client()
+    client.whoop_id = user_id(0)
+    data = client.get_keydata(raw_data=vu7_windows(days))
+
+    # serve the sleeps without a server (each sleep must only be pulled once with the default cache)
+    pulled = []
+
+    def pull_api(url, *args, **kwargs):
+        pulled.append(url)
+        return sleeps[int(url.rsplit("/", 1)[1])]
+
+    client.pull_api = pull_api
+    client.get_sleep(all_data=data)
+    client.get_sleep_events_all(all_data=data)
+    assert len(pulled) == len(sleeps), "sleeps were downloaded again"
+    return lambda: client.get_sleep_events_all(all_data=data)
+
+
+def case_hr_decode(days: int) -> Callable:
+    """Sample conversion of `WhoopClient.get_hr`: decode of the responses into a compact frame."""
+    windows = []
+    for plan, next_plan in plans(days):
+        times, bpm = heart_rate(plan, next_plan, SEED, 0)
+        windows.append([{"time": t, "data": b} for t, b in zip(times.tolist(), bpm.tolist())])
+
+    def run():
+        hr = HeartRateBuffer()
+        for values in windows:
+            hr.append(*decode_samples(values))
+        return hr.to_frame()
+
+    return run
+
+
+def case_explorer(days: int) -> Callable:
+    """`preprocess_metrics` of the explorer pages on the handler frames."""
+    frames = v1_frames(days)
+    rec = recovery_by_cycle(frames["recovery"], frames["cycle"])
+    return lambda: preprocess_metrics(rec, frames["activity/sleep"], frames["activity/workout"])
+
+
+# name: (case, sizes, unit of the sizes)
+CASES = {
+    "from_dict": (case_from_dict, [30, 365, 1825], "days"),
+    "from_dict_validated": (case_from_dict_validated, [30, 365, 1825], "days"),
+    "to_df": (case_to_df, [30, 365, 1825], "days"),
+    "whoop_time_str": (case_whoop_time_str, [100, 1000, 10000], "dates"),
+    "keydata": (case_keydata, [30, 365, 1825], "days"),
+    "activities": (case_activities, [30, 365, 1825], "days"),
+    "sleep_events": (case_sleep_events, [30, 365, 1825], "days"),
+    "hr_decode": (case_hr_decode, [1, 7, 28], "days"),
+    "explorer": (case_explorer, [30, 365, 1825], "days"),
+}
+
+
+def measure(run: Callable, repeat: int = 3) -> Dict[str, float]:
+    """Measures the best time (seconds) and the peak traced memory (MB) of the callable."""
+    # warm up (imports, caches) outside of the measurements
+    run()
+    best = timed(run, repeat=repeat)
+
+    # memory in a separate run (tracing slows down the code)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"time": best, "peak_mb": peak / 2**20}
+
+
+def _key(name: str, size: int) -> str:
+    return f"{name}[{size}]"
+
+
+def run_suite(cases: List[str] = None, repeat: int = 3, verbose: bool = True) -> Dict:
+    """Runs the cases at all their sizes.
+
+    Args:
+        cases (List[str], optional): Names of the cases to run. Defaults to all.
+        repeat (int, optional): Number of timed runs per case (the best is kept). Defaults to 3.
+        verbose (bool, optional): Print each result as it finishes. Defaults to True.
+
+    Returns:
+        Dict: The environment (`meta`) and the measurements keyed by `name[size]` (`results`).
+    """
+    unknown = set(cases or []) - set(CASES)
+    if unknown:
+        raise ValueError(f"Unknown cases: {', '.join(sorted(unknown))}")
+
+    results = {}
+    if verbose:
+        print(f"{'case':<32}{'time (s)':>12}{'peak (MB)':>12}")
+    for name in cases or CASES:
+        case, sizes, unit = CASES[name]
+        for size in sizes:
+            key = _key(name, size)
+            results[key] = dict(measure(case(size), repeat), size=size, unit=unit)
+            if verbose:
+                print(f"{key:<32}{results[key]['time']:>12.4f}{results[key]['peak_mb']:>12.2f}")
+    meta = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "pydantic": pydantic.VERSION,
+        "repeat": repeat,
+    }
+    return {"meta": meta, "results": results}
+
+
+def compare(
+    baseline: Dict,
+    current: Dict,
+    threshold: float = DEFAULT_THRESHOLD,
+    min_time: float = MIN_TIME,
+    min_peak: float = MIN_PEAK_MB,
+) -> List[str]:
+    """Compares two runs and prints the relative change of each case.
+
+    Args:
+        baseline (Dict): Results of the baseline run.
+        current (Dict): Results of the current run.
+        threshold (float, optional): Relative increase of time or memory that counts as regression.
+            Defaults to 0.25.
+        min_time (float, optional): Times below this (seconds) are never flagged. Defaults to 0.002.
+        min_peak (float, optional): Peaks below this (MB) are never flagged. Defaults to 0.1.
+
+    Returns:
+        List[str]: Keys of the regressed cases.
+    """
+    base, cur = baseline["results"], current["results"]
+    regressions = []
+    print(f"{'case':<32}{'base (s)':>10}{'now (s)':>10}{'change':>9}{'base (MB)':>11}{'now (MB)':>10}{'change':>9}")
+    for key in base:
+        if key not in cur:
+            print(f"{key:<32}{'missing':>10}")
+            continue
+        b, c = base[key], cur[key]
+        d_time = c["time"] / b["time"] - 1
+        d_mem = c["peak_mb"] / b["peak_mb"] - 1 if b["peak_mb"] > 0 else 0.0
+        slower = d_time > threshold and max(b["time"], c["time"]) >= min_time
+        larger = d_mem > threshold and max(b["peak_mb"], c["peak_mb"]) >= min_peak
+        flag = "  REGRESSION" if slower or larger else ""
+        if flag:
+            regressions.append(key)
+        print(
+            f"{key:<32}{b['time']:>10.4f}{c['time']:>10.4f}{d_time:>+9.0%}"
+            f"{b['peak_mb']:>11.2f}{c['peak_mb']:>10.2f}{d_mem:>+9.0%}{flag}"
+        )
+    return regressions
+
+
+def _load(path: str) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--cases", nargs="+", choices=list(CASES), help="cases to run (default: all)")
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--output", help=f"write the results as json (e.g. {DEFAULT_BASELINE})")
+
+    compare_parser = commands.add_parser("compare", help="compare results against a baseline")
+    compare_parser.add_argument("baseline", nargs="?", default=DEFAULT_BASELINE)
+    compare_parser.add_argument("current", nargs="?", help="results to compare (default: run the baseline cases)")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    compare_parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run_suite(args.cases, args.repeat)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+                f.write("\n")
+        return
+
+    baseline = _load(args.baseline)
+    if args.current:
+        current = _load(args.current)
+    else:
+        cases = list(dict.fromkeys(key.split("[")[0] for key in baseline["results"]))
+        current = run_suite([c for c in cases if c in CASES], args.repeat, verbose=False)
+    meta = baseline["meta"]
+    print(f"baseline: {meta['created']} (python {meta['python']}, pandas {meta['pandas']})")
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"no regressions above {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -39,6 +39,7 @@ setup(
     license="MIT License",
     packages=find_packages(include=["whoopy", "whoopy.*"]),
     install_requires=required_list,
+    extras_require={"async": ["aiohttp>=3.8"], "archive": ["pyarrow>=8.0.0"]},
     setup_requires=["pytest-runner", "flake8"],
     tests_require=["pytest"],
     include_package_data=True,
@@ -0,0 +1,52 @@
+"""Shared fixtures: a local mock of the Whoop API (see `whoopy.mock`)."""
+
+import pytest
+
+from whoopy.handlers.scheduler import RequestScheduler
+from whoopy.mock import MockDataset, MockWhoopServer
+from whoopy.mock.data import user_id
+
+
+# a few months of data keep the crawls short (and span multiple pages of every collection)
+YEARS = 0.25
+
+
+@pytest.fixture(scope="session")
+def dataset():
+    return MockDataset(users=2, years=YEARS)
+
+
+@pytest.fixture(scope="session")
+def server(dataset):
+    with MockWhoopServer(dataset=dataset) as srv:
+        yield srv
+
+
+@pytest.fixture
+def flaky_server(dataset):
+    """Server that fails about a third of the requests with 500 or 503."""
+    with MockWhoopServer(dataset=dataset, error_rate=0.3, seed=7) as srv:
+        yield srv
+
+
+@pytest.fixture
+def throttled_server(dataset):
+    """Server that allows 5 requests per second (429 with `Retry-After` beyond)."""
+    with MockWhoopServer(dataset=dataset, rate_limit=5, rate_window=1) as srv:
+        yield srv
+
+
+@pytest.fixture
+def scheduler():
+    """Scheduler without a client side rate limit and with short backoffs."""
+    return RequestScheduler(rate=100000, backoff=0.01, max_retries=10)
+
+
+@pytest.fixture
+def records(dataset):
+    """Returns all records of a collection of the n-th user (newest first, as the API)."""
+
+    def get(resource: str, user: int = 0):
+        return dataset.user(user_id(user)).collection(resource)
+
+    return get
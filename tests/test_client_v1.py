@@ -0,0 +1,97 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from whoopy.handlers.handler_v1 import WhoopAPIError
+from whoopy.handlers.scheduler import RequestScheduler
+
+
+def ids(records):
+    return [r["id"] for r in records]
+
+
+def test_collection_df(server, scheduler, records):
+    client = server.v1_client(scheduler=scheduler)
+    df, token = client.sleep.collection_df(limit=10)
+    assert token is None
+    assert df["id"].tolist() == ids(records("activity/sleep"))
+
+
+def test_fetch_many(server, scheduler, records):
+    client = server.v1_client(1, scheduler=scheduler)
+    frames = client.fetch_many(["cycle", "recovery"], limit=25)
+    assert frames["cycle"]["id"].tolist() == ids(records("cycle", 1))
+    assert len(frames["recovery"]) == len(records("recovery", 1))
+    client.close()
+
+
+def test_fetch_many_nested(server, scheduler, records):
+    # a crawl of the client that fetches again must not wait for a slot it holds itself
+    client = server.v1_client(scheduler=scheduler, max_workers=1)
+    future = client._get_executor().submit(client._run_limited, client.fetch_many, ["cycle", "workout"])
+    frames = future.result(timeout=30)
+    assert len(frames["cycle"]) == len(records("cycle"))
+    assert len(frames["workout"]) == len(records("activity/workout"))
+    client.close()
+
+
+def test_single_many(server, scheduler, records):
+    # errors are keyed by position (a failing id may repeat)
+    ids = [1] + [r["id"] for r in records("cycle")[:3]] + [1]
+    results, errors = server.v1_client(scheduler=scheduler).cycle.single_many(ids, max_concurrency=2)
+    assert [r.id for r in results[1:-1]] == ids[1:-1]
+    assert results[0] is None and results[-1] is None
+    assert sorted(errors) == [0, 4]
+    assert all(isinstance(e, WhoopAPIError) and e.status_code == 404 for e in errors.values())
+
+
+def test_resume_from_error(flaky_server, records):
+    client = flaky_server.v1_client(scheduler=RequestScheduler(rate=100000, max_retries=0))
+    frames, token, failures = [], None, 0
+    while True:
+        try:
+            df, token = client.cycle.collection_df(next=token, limit=10)
+        except WhoopAPIError as err:
+            # keep the pages before the failed one and resume at it
+            failures += 1
+            frames.append(err.partial)
+            token = err.next_token
+            continue
+        frames.append(df)
+        break
+
+    assert failures > 0
+    df = pd.concat(frames, ignore_index=True)
+    assert df["id"].tolist() == ids(records("cycle"))
+
+
+@pytest.mark.parametrize("shards,limit", [(2, 2), (3, 1)])
+def test_shards_deduplicate(server, scheduler, records, shards, limit):
+    handler = server.v1_client(scheduler=scheduler).cycle
+    crawled = []
+
+    def crawl_shard(*args):
+        recs, children = type(handler)._crawl_shard(handler, *args)
+        crawled.extend(recs)
+        return recs, children
+
+    # split shards include their oldest record again (it is dropped on merge)
+    handler._crawl_shard = crawl_shard
+    df, _ = handler.collection_df(datetime(2019, 12, 1), datetime(2020, 6, 1), shards=shards, limit=limit)
+    assert df["id"].is_unique
+    assert sorted(df["id"].tolist()) == sorted(ids(records("cycle")))
+    assert len(crawled) > len(df)
+
+
+def test_shard_timestamps_without_fraction(server, scheduler):
+    handler = server.v1_client(scheduler=scheduler).cycle
+    pages = [([{"id": 1, handler._time_key: "2020-05-31T12:00:00Z"}], "token")]
+    handler._get_data = lambda *args: pages.pop() if pages else ([], None)
+
+    # the density estimate parses API timestamps with and without fractional seconds
+    with ThreadPoolExecutor() as executor:
+        recs, children = handler._crawl_shard(datetime(2020, 1, 1), datetime(2020, 6, 1), 1, executor)
+        assert recs[0]["id"] == 1
+        assert len(children) == handler.SHARD_SPLIT
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+import pytest
+import requests
+
+pytest.importorskip("aiohttp")
+
+from whoopy.client_v1_async import AsyncWhoopClient  # noqa: E402
+from whoopy.handlers.handler_v1 import WhoopAPIError  # noqa: E402
+from whoopy.handlers.scheduler import RequestScheduler  # noqa: E402
+from whoopy.mock import access_token, refresh_token  # noqa: E402
+from whoopy.mock.data import user_id  # noqa: E402
+from whoopy.mock.server import SCOPES, TOKEN_TTL  # noqa: E402
+
+
+def run(server, scheduler, fn, user: int = 0, **kwargs):
+    """Runs `fn(client)` with an async client of the n-th user of the server."""
+    uid = user_id(user)
+
+    async def main():
+        client = AsyncWhoopClient(
+            access_token(uid),
+            TOKEN_TTL,
+            SCOPES,
+            refresh_token(uid),
+            client_id="mock",
+            client_secret="mock",
+            base_url=server.url,
+            scheduler=scheduler,
+            **kwargs,
+        )
+        async with client:
+            return await fn(client)
+
+    return asyncio.run(main())
+
+
+def test_collection_df(server, scheduler, records):
+    df, token = run(server, scheduler, lambda c: c.cycle.collection_df())
+    expected = records("cycle")
+    assert token is None
+    assert df["id"].tolist() == [r["id"] for r in expected]
+
+
+def test_iter_pages(server, scheduler, records):
+    async def pages(client):
+        return [(len(page), token) async for page, token in client.sleep.iter_pages(limit=10)]
+
+    result = run(server, scheduler, pages)
+    assert sum(n for n, _ in result) == len(records("activity/sleep"))
+    assert all(n == 10 for n, _ in result[:-1])
+    assert all(token for _, token in result[:-1]) and result[-1][1] is None
+
+
+def test_single_many(server, scheduler, records):
+    # errors are keyed by position (a failing id may repeat)
+    ids = [1] + [r["id"] for r in records("activity/workout")[:5]] + [1]
+    results, errors = run(server, scheduler, lambda c: c.workout.single_many(ids, max_concurrency=2))
+    assert [r.id for r in results[1:-1]] == ids[1:-1]
+    assert results[0] is None and results[-1] is None
+    assert sorted(errors) == [0, 6]
+    assert all(isinstance(e, WhoopAPIError) and e.status_code == 404 for e in errors.values())
+
+
+def test_fetch_many(server, scheduler, records):
+    frames = run(server, scheduler, lambda c: c.fetch_many(["recovery", "workout"]))
+    assert list(frames) == ["recovery", "workout"]
+    assert len(frames["recovery"]) == len(records("recovery"))
+    assert len(frames["workout"]) == len(records("activity/workout"))
+
+
+def test_refresh(server, scheduler):
+    async def refresh(client):
+        client.token = "expired"
+        client.session.headers.update(client._headers())
+        with pytest.raises(WhoopAPIError):
+            await client.user.profile()
+        await client.refresh()
+        return client.token, await client.user.profile()
+
+    token, profile = run(server, scheduler, refresh, user=1)
+    assert token == access_token(user_id(1))
+    assert profile.user_id == user_id(1)
+
+
+def test_retries_server_errors(flaky_server, scheduler, records):
+    df, _ = run(flaky_server, scheduler, lambda c: c.cycle.collection_df(limit=10))
+    assert len(df) == len(records("cycle"))
+    assert flaky_server.stats["errors"] > 0
+    assert scheduler.stats["retries"] == flaky_server.stats["errors"]
+
+
+def test_retries_throttled_requests(throttled_server, scheduler, records):
+    # use up the budget of the window, so the first request of the client is throttled
+    for _ in range(throttled_server.rate_limit):
+        requests.get(f"{throttled_server.url}sports")
+    started = time.monotonic()
+    frames = run(throttled_server, scheduler, lambda c: c.fetch_many(["cycle", "sleep"], limit=25))
+    assert len(frames["cycle"]) == len(records("cycle"))
+    assert len(frames["sleep"]) == len(records("activity/sleep"))
+    assert scheduler.stats["throttled"] >= 1
+    # Retry-After (up to a second) is honored before the next attempt
+    assert time.monotonic() - started >= 0.5
+
+
+def test_no_retries(flaky_server):
+    with pytest.raises(WhoopAPIError) as err:
+        run(flaky_server, RequestScheduler(rate=100000, max_retries=0), lambda c: c.cycle.collection_df(limit=1))
+    assert err.value.status_code in (500, 503)
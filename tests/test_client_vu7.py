@@ -0,0 +1,12 @@
+def test_sleep_pulls_download_each_sleep_once(server):
+    # more sleeps than the cache holds (the payloads of the pull are kept regardless)
+    client = server.vu7_client(sleep_cache_size=10)
+    data = client.get_keydata()
+    requests = server.stats["requests"]
+    sleep = client.get_sleep(all_data=data)
+    assert server.stats["requests"] - requests == len(sleep) > 10
+
+    requests = server.stats["requests"]
+    events = client.get_sleep_events_all(all_data=data)
+    assert server.stats["requests"] == requests
+    assert set(events["id"]) == set(sleep["activityId"])
@@ -0,0 +1,32 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from whoopy.storage.hr_store import HeartRateStore, to_epoch_ms
+
+
+def test_sync_from_membership_start(server, tmp_path):
+    client = server.vu7_client()
+    # the membership start of the v7 client is an aware datetime
+    assert client.start_datetime.tzinfo is not None
+
+    store = HeartRateStore(str(tmp_path))
+    added = store.sync(client, end=datetime(2020, 1, 8))
+    times = store.query()["time"]
+    assert added == len(store) > 0
+    assert times[0] >= to_epoch_ms(client.start_datetime)
+    assert times[-1] < to_epoch_ms(datetime(2020, 1, 8))
+    assert (np.diff(times) > 0).all()
+
+
+def test_sync_appends_only_new_samples(server, tmp_path):
+    client = server.vu7_client()
+    store = HeartRateStore(str(tmp_path))
+    first = store.sync(client, end=datetime(2020, 1, 5))
+
+    # aware and naive ends are both taken as UTC
+    second = store.sync(client, end=datetime(2020, 1, 8, tzinfo=timezone.utc))
+    assert second > 0
+    assert store.sync(client, end=datetime(2020, 1, 8)) == 0
+    assert len(store) == first + second
+    assert (np.diff(store.query()["time"]) > 0).all()
@@ -0,0 +1,18 @@
+import pytest
+
+from whoopy.mock.generator import MODELS
+from whoopy.models import models_v1
+
+
+@pytest.mark.parametrize("resource", list(MODELS))
+def test_from_dict_fast_path(records, resource):
+    model = MODELS[resource]
+    for payload in records(resource):
+        assert model.from_dict(payload, True, validate=False) == model.from_dict(payload, True)
+
+
+@pytest.mark.skipif(not models_v1.PYDANTIC_V2, reason="pydantic v1 does not validate on the fast path")
+def test_from_dict_fast_path_rejects_malformed(records):
+    payload = dict(records("cycle")[0], user_id="not an id")
+    with pytest.raises(ValueError):
+        models_v1.UserCycle.from_dict(payload, validate=False)
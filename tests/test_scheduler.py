@@ -0,0 +1,55 @@
+import time
+
+import pytest
+import requests
+
+from whoopy.handlers.handler_v1 import WhoopAPIError
+from whoopy.handlers.scheduler import RequestScheduler, parse_limit, parse_retry_after
+
+
+def test_parse_headers():
+    assert parse_limit("100, 100;window=60, 10000;window=86400") == (100, 60.0)
+    assert parse_limit("5;window=1") == (5, 1.0)
+    assert parse_limit(None) is None
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+
+
+def test_retry_delay():
+    scheduler = RequestScheduler(backoff=0.01)
+    assert scheduler.retry_delay(0, 503, {}) <= 0.01
+    # throttled responses wait at least `Retry-After` and block all requests meanwhile
+    assert scheduler.retry_delay(0, 429, {"Retry-After": "0.5"}) == 0.5
+    assert scheduler.try_acquire() > 0.4
+    assert scheduler.stats["throttled"] == 1
+
+
+def test_retries_server_errors(flaky_server, scheduler, records):
+    client = flaky_server.v1_client(scheduler=scheduler)
+    df, _ = client.workout.collection_df(limit=10)
+    assert df["id"].tolist() == [r["id"] for r in records("activity/workout")]
+    assert flaky_server.stats["errors"] > 0
+    assert scheduler.stats["retries"] == flaky_server.stats["errors"]
+
+
+def test_retries_throttled_requests(throttled_server, scheduler, records):
+    # use up the budget of the window, so the first request of the client is throttled
+    for _ in range(throttled_server.rate_limit):
+        requests.get(f"{throttled_server.url}sports")
+    client = throttled_server.v1_client(scheduler=scheduler)
+    started = time.monotonic()
+    df, _ = client.cycle.collection_df(limit=25)
+    assert len(df) == len(records("cycle"))
+    assert throttled_server.stats["throttled"] >= 1
+    assert scheduler.stats["throttled"] == throttled_server.stats["throttled"]
+    # Retry-After (up to a second) is honored before the next attempt
+    assert time.monotonic() - started >= 0.5
+
+
+def test_gives_up_after_max_retries(flaky_server):
+    client = flaky_server.v1_client(scheduler=RequestScheduler(rate=100000, backoff=0.01, max_retries=1))
+    with pytest.raises(WhoopAPIError) as err:
+        for _ in range(100):
+            client.cycle.collection_df(limit=1, get_all_pages=False)
+    assert err.value.status_code in (500, 503)
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+import os
+import time
+
+import pytest
+
+from whoopy.handlers.handler_v1 import ResponseCache
+from whoopy.mock import MockDataset, MockWhoopServer
+from whoopy.storage.record_store import RecordStore
+
+
+def ids(records):
+    return [r["id"] for r in records]
+
+
+@pytest.fixture
+def recent_server():
+    """Server with the last two weeks of data (part of it within the refresh window)."""
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    dataset = MockDataset(users=1, years=14 / 365, start=today - timedelta(days=14))
+    with MockWhoopServer(dataset=dataset) as srv:
+        yield srv
+
+
+def test_record_store(server, scheduler, records):
+    client = server.v1_client(scheduler=scheduler, store=RecordStore())
+    expected = ids(records("activity/sleep"))
+    df, _ = client.sleep.collection_df(limit=25)
+    assert df["id"].tolist() == expected
+
+    # the synced window is answered from the store (only the refresh window is fetched again)
+    requests = server.stats["requests"]
+    df, _ = client.sleep.collection_df(limit=25)
+    assert df["id"].tolist() == expected
+    assert server.stats["requests"] - requests <= 1
+    assert client.store.state(client.user_id, "activity/sleep") is not None
+
+
+def test_response_cache(server, scheduler, records):
+    client = server.v1_client(scheduler=scheduler, cache=ResponseCache(ttls={"cycle": 0.2}))
+    first, _ = client.cycle.collection_df(limit=25)
+    requests = server.stats["requests"]
+    second, _ = client.cycle.collection_df(limit=25)
+    assert server.stats["requests"] == requests
+    assert client.cache.stats["hits"] > 0
+
+    # stale entries are revalidated (the server answers 304 without a body)
+    time.sleep(0.3)
+    not_modified = server.stats["not_modified"]
+    third, _ = client.cycle.collection_df(limit=25)
+    assert client.cache.stats["revalidated"] == server.stats["not_modified"] - not_modified > 0
+    assert first["id"].tolist() == second["id"].tolist() == third["id"].tolist() == ids(records("cycle"))
+
+
+def test_response_cache_disk(server, scheduler, tmp_path):
+    client = server.v1_client(scheduler=scheduler, cache=ResponseCache(disk_path=str(tmp_path)))
+    profile = client.user.profile()
+
+    # a new cache on the same directory answers from disk
+    client.cache = ResponseCache(disk_path=str(tmp_path))
+    requests = server.stats["requests"]
+    assert client.user.profile() == profile
+    assert server.stats["requests"] == requests
+    assert client.cache.stats["disk_hits"] == 1
+
+
+def test_parquet_archive(server, scheduler, records, tmp_path):
+    archive = pytest.importorskip("whoopy.storage.parquet_archive")
+    client = server.v1_client(scheduler=scheduler, archive=archive.ParquetArchive(str(tmp_path)))
+    expected = ids(records("activity/workout"))
+    df, _ = client.workout.collection_df(limit=25)
+    assert df["id"].tolist() == expected
+
+    # the covered window is read from the archive (only the refresh window is fetched again)
+    requests = server.stats["requests"]
+    again, _ = client.workout.collection_df(limit=25)
+    assert server.stats["requests"] - requests <= 1
+    assert again["id"].tolist() == expected
+    assert again.dtypes.equals(df.dtypes)
+
+
+def test_parquet_archive_empty(server, scheduler, tmp_path):
+    archive = pytest.importorskip("whoopy.storage.parquet_archive")
+    client = server.v1_client(scheduler=scheduler, archive=archive.ParquetArchive(str(tmp_path)))
+    df, _ = client.recovery.collection_df(datetime(2010, 1, 1), datetime(2010, 2, 1))
+    assert df.empty
+    assert "score.recovery_score" in df.columns
+
+    df, _ = client.recovery.collection_df(datetime(2010, 1, 1), datetime(2010, 2, 1), time_index=True, columnar=True)
+    assert df.empty
+
+
+def test_parquet_archive_tail(recent_server, scheduler, tmp_path):
+    archive = pytest.importorskip("whoopy.storage.parquet_archive")
+    client = recent_server.v1_client(scheduler=scheduler, archive=archive.ParquetArchive(str(tmp_path)))
+    expected = ids(recent_server.dataset.user(client.user_id).collection("cycle"))
+
+    def files():
+        return sorted(os.path.relpath(os.path.join(d, f), tmp_path) for d, _, fs in os.walk(tmp_path) for f in fs)
+
+    # the refresh window is fetched again on every read, but replaces the tail instead of adding parts
+    df, _ = client.cycle.collection_df(limit=25)
+    written = files()
+    assert any(f.endswith(archive.TAIL_FILE) for f in written)
+    for _ in range(3):
+        df, _ = client.cycle.collection_df(limit=25)
+        assert df["id"].tolist() == expected
+    assert files() == written
@@ -1,5 +1,5 @@
 import os
-from whoopy import WhoopClient
+from whoopy import WhoopClient, ResponseCache
 
 class WhoopClientSingleton:
     _instance = None
@@ -35,6 +35,9 @@ class WhoopClientSingleton:
                 self.token_file, self.config["client_id"], self.config["client_secret"]
             )
 
+        # serve streamlit reruns from the cache while the data is fresh
+        self.client.cache = ResponseCache()
+
     def get_client(self):
         return self.client
     
\ No newline at end of file
@@ -1,5 +1,7 @@
 import os
 
+from whoopy import SPORT_IDS
+
 def helper_milliseconds_to_hours(millis):
     return millis / 1000 / 60 / 60
 def helper_milliseconds_to_hours_minutes(milliseconds):
@@ -14,3 +16,51 @@ def helper_milliseconds_to_hours_minutes(milliseconds):
 def helper_delta_percentage(old_value, new_value):
     percentage_change = ((new_value - old_value) / old_value) * 100
     return percentage_change
+
+def recovery_by_cycle(rec, cycle):
+    """Dates the recoveries by the (local) start of their cycle (recoveries have no start of their own)."""
+    cycle = cycle.dropna(subset=["start"])
+    return rec.merge(cycle[["id", "start"]].rename(columns={"id": "cycle_id"}), on="cycle_id", how="inner")
+
+def day_type(days):
+    return days.apply(lambda x: "Weekend" if x >= 5 else "Weekday")
+
+# using "end" since sleep cycles can start on the same day they end
+def preprocess_metrics(rec, sleep, workout):
+    """Adds the weekday (type) and the durations in hours and minutes to the frames of the pages.
+
+    Expects the recoveries dated by their cycle (see `recovery_by_cycle`). Returns the recoveries,
+    the sleeps without naps and the workouts.
+    """
+    filtered_sleep = sleep[sleep["nap"] == False].copy()  # noqa: E712
+    filtered_sleep["day_of_week"] = filtered_sleep["end"].dt.weekday
+    filtered_sleep["day_type"] = day_type(filtered_sleep["day_of_week"])
+    stages = "score.stage_summary."
+    filtered_sleep[stages + "time_in_bed_hours"] = filtered_sleep[stages + "total_in_bed_time_milli"].apply(
+        lambda x: x / 1000 / 60 / 60
+    )
+    filtered_sleep[stages + "total_awake_time_hours"] = filtered_sleep[stages + "total_awake_time_milli"].apply(
+        lambda x: x / 1000 / 60 / 60
+    )
+    for stage in ["light_sleep", "slow_wave_sleep", "rem_sleep"]:
+        filtered_sleep[f"{stages}total_{stage}_time_minutes"] = filtered_sleep[
+            f"{stages}total_{stage}_time_milli"
+        ].apply(lambda x: x / 1000 / 60)
+    filtered_sleep[stages + "total_sleep_time_hours"] = (
+        filtered_sleep[stages + "time_in_bed_hours"] - filtered_sleep[stages + "total_awake_time_hours"]
+    )
+
+    rec_copy = rec.copy()
+    rec_copy["day_of_week"] = rec_copy["start"].dt.weekday
+    rec_copy["day_type"] = day_type(rec_copy["day_of_week"])
+
+    workout_copy = workout.copy()
+    workout_copy["day_of_week"] = workout_copy["start"].dt.weekday
+    workout_copy["day_type"] = day_type(workout_copy["day_of_week"])
+    workout_copy["score.kilocalories"] = workout_copy["score.kilojoule"]
+    workout_copy["sport"] = workout_copy["sport_id"].map(SPORT_IDS)
+    for zone in ["zero", "one", "two", "three", "four", "five"]:
+        workout_copy[f"score.zone_duration.zone_{zone}_minutes"] = workout_copy[
+            f"score.zone_duration.zone_{zone}_milli"
+        ].apply(lambda x: x / 1000 / 60)
+    return rec_copy, filtered_sleep, workout_copy
@@ -14,7 +14,8 @@ import webbrowser
 
 import streamlit as st
 import plotly.express as px
-from whoopy import WhoopClient, SPORT_IDS
+from whoopy import WhoopClient, ResponseCache, SPORT_IDS
+from Helper import recovery_by_cycle
 
 # Page wide Config
 st.set_page_config(page_title="Whoop", page_icon="🏃‍♂️")
@@ -70,6 +71,12 @@ def login_url(config: Dict) -> Tuple[str, str]:
     return url, state
 
 
+# keep one response cache across reruns
+@st.cache(allow_output_mutation=True)
+def response_cache() -> ResponseCache:
+    return ResponseCache()
+
+
 # run through login UI
 login_container = st.empty()
 with login_container.container():
@@ -100,31 +107,11 @@ with login_container.container():
         st.error("No `redirect_uri` found in config.json")
         st.stop()
 
-    # verify if config file should be loaded
-    if not os.path.exists(TOKEN_FILE):
-        # wait for code
-        url, state = login_url(config)
-        if st.button("Reopen Login"):
-            webbrowser.open(url)
-
-        # wait for user to enter the code
-        code = st.text_input("Enter Auth Code from Grant url:")
-        client = login_verify(code)
-    else:
-        # try to load from file, otherwise update
-        try:
-            with st.spinner(text="loading token..."):
-                client = WhoopClient.from_token(
-                    TOKEN_FILE, config["client_id"], config["client_secret"]
-                )
-        except Exception as e:
-            # provide warning to log
-            logging.warning(f"Failed to load token: {e}")
-            logging.warning("Delete token and retry")
-
-            # delete token and re-execute login
-            os.remove(TOKEN_FILE)
-
+    # reuse the client across reruns (each client holds a session and a thread pool)
+    client = st.session_state.get("client")
+    if client is None:
+        # verify if config file should be loaded
+        if not os.path.exists(TOKEN_FILE):
             # wait for code
             url, state = login_url(config)
             if st.button("Reopen Login"):
@@ -133,14 +120,39 @@ with login_container.container():
             # wait for user to enter the code
             code = st.text_input("Enter Auth Code from Grant url:")
             client = login_verify(code)
+        else:
+            # try to load from file, otherwise update
+            try:
+                with st.spinner(text="loading token..."):
+                    client = WhoopClient.from_token(
+                        TOKEN_FILE, config["client_id"], config["client_secret"]
+                    )
+            except Exception as e:
+                # provide warning to log
+                logging.warning(f"Failed to load token: {e}")
+                logging.warning("Delete token and retry")
+
+                # delete token and re-execute login
+                os.remove(TOKEN_FILE)
 
-    # if client setup, store a new token
-    if client:
-        client.store_token(TOKEN_FILE)
+                # wait for code
+                url, state = login_url(config)
+                if st.button("Reopen Login"):
+                    webbrowser.open(url)
+
+                # wait for user to enter the code
+                code = st.text_input("Enter Auth Code from Grant url:")
+                client = login_verify(code)
+
+        # if client setup, store a new token
+        if client:
+            client.store_token(TOKEN_FILE)
 
     if not client:
         st.warning("Waiting for client")
         st.stop()
+    client.cache = response_cache()
+    st.session_state["client"] = client
 
 # retrieve client data
 user = client.user.profile()
@@ -170,13 +182,9 @@ def load_metrics(baseline_days: int, today) -> Dict:
     start = today - timedelta(days=baseline_days + 1)
     today = "2024-05-01"
     start = "2024-04-01"
-    rec, _ = client.recovery.collection_df(start=start, end=today, get_all_pages=True)
-    sleep, _ = client.sleep.collection_df(start=start, end=today, get_all_pages=True)
+    frames = client.fetch_many(["recovery", "sleep", "cycle", "workout"], start=start, end=today)
+    rec, sleep, cycle, workout = frames["recovery"], frames["sleep"], frames["cycle"], frames["workout"]
     print(sleep["start"].head())
-    cycle, _ = client.cycle.collection_df(start=start, end=today, get_all_pages=True)
-    workout, _ = client.workout.collection_df(
-        start=start, end=today, get_all_pages=True
-    )
 
     return rec, sleep, cycle, workout
 
@@ -253,17 +261,9 @@ with tab_report:
         st.header("Recovery")
         st.subheader("Daily recovery scores with weekly averages")
         
-        # Filter out invalid or missing date entries
-        rec = rec.dropna(subset=['start'])
-        cycle = cycle.dropna(subset=['start'])
-
-        # Ensure the 'start' column is datetime type for proper merging and grouping
-        rec['start'] = pd.to_datetime(rec['start'], errors='coerce')
-        cycle['start'] = pd.to_(cycle['start'], errors='coerce')
-
-        # Join recovery with cycle and group recovery by week
-        rec_gp = rec.merge(cycle, left_on="cycle_id", right_on="id", how="inner")
-        rec_gp['week'] = rec_gp['start'].dt.isocalendar().week
+        # Join recovery with the (local) start of its cycle and group recovery by week
+        rec_gp = recovery_by_cycle(rec, cycle)
+        rec_gp['week'] = rec_gp['start'].dt.to_period('W').dt.start_time
         rec_grouped = rec_gp.groupby('week').agg(
             mean_score=('score.recovery_score', 'mean'),
             start=('start', 'min'),
@@ -15,6 +15,7 @@ from whoopy import WhoopClient, SPORT_IDS
 from streamlit_extras.chart_container import chart_container
 from streamlit_extras.metric_cards import style_metric_cards
 from Client import WhoopClientSingleton
+from Helper import recovery_by_cycle
 
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 st.set_page_config(page_title="Whoop", page_icon="🏃‍♂️", layout="wide")
@@ -47,12 +48,10 @@ PERIOD_START,PERIOD_END = pd.to_datetime(st.sidebar.date_input("Select Period",
 @st.cache_data()
 def load_metrics(baseline_days: int, today) -> Dict:
     start = today - timedelta(days=baseline_days + 1)
-    rec, _ = client.recovery.collection_df(start=start, end=today, get_all_pages=True)
-    sleep, _ = client.sleep.collection_df(start=start, end=today, get_all_pages=True)  
-    # cycle, _ = client.cycle.collection_df(start=start, end=today, get_all_pages=True)
-    workout, _ = client.workout.collection_df(
-        start=start, end=today, get_all_pages=True
-    )
+    frames = client.fetch_many(["recovery", "sleep", "cycle", "workout"], start=start, end=today)
+    # date the recoveries by the start of their cycle (as the recovery report)
+    rec = recovery_by_cycle(frames["recovery"], frames["cycle"])
+    sleep, workout = frames["sleep"], frames["workout"]
     return rec, sleep, workout
 
 class CurrentPeriodData:
@@ -69,7 +68,7 @@ current_period_data = CurrentPeriodData()
 
 # display recovery score
 st.subheader("Recovery Score", divider="green")
-fig = px.line(rec[(pd.to_datetime(rec["created_at"]) >= PERIOD_START) & (pd.to_datetime(rec["created_at"]) <= PERIOD_END)], x="updated_at", y="score.recovery_score")
+fig = px.line(rec[(pd.to_datetime(rec["start"]) >= PERIOD_START) & (pd.to_datetime(rec["start"]) <= PERIOD_END)], x="start", y="score.recovery_score")
 fig.update_yaxes(range=[1,100])
 st.plotly_chart(fig,use_container_width=True)
 
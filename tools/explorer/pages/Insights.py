@@ -15,6 +15,7 @@ from whoopy import WhoopClient, SPORT_IDS
 from streamlit_extras.chart_container import chart_container
 from streamlit_extras.metric_cards import style_metric_cards
 from Client import WhoopClientSingleton
+from Helper import preprocess_metrics, recovery_by_cycle
 import logging
 
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -49,35 +50,14 @@ PERIOD_START,PERIOD_END = pd.to_datetime(st.sidebar.date_input("Select Period",
 def load_metrics(baseline_days: int, today) -> Dict:
 
     start = today - timedelta(days=baseline_days + 1)
-    rec, _ = client.recovery.collection_df(start=start, end=today, get_all_pages=True)
-    sleep, _ = client.sleep.collection_df(start=start, end=today, get_all_pages=True)  
-    # cycle, _ = client.cycle.collection_df(start=start, end=today, get_all_pages=True)
-    workout, _ = client.workout.collection_df(
-        start=start, end=today, get_all_pages=True
-    )
+    frames = client.fetch_many(["recovery", "sleep", "cycle", "workout"], start=start, end=today)
+    # date the recoveries by the start of their cycle (as the recovery report)
+    rec = recovery_by_cycle(frames["recovery"], frames["cycle"])
+    sleep, workout = frames["sleep"], frames["workout"]
     return rec, sleep, workout
-# using "end" since sleep cycles can start on the same day they end
 def preprocessing():
     rec, sleep, workout = load_metrics(baseline_days, today)
-    sleep_no_nap = sleep[sleep["nap"] == False]
-    sleep_nap = sleep[sleep["nap"] == True]
-
-    filtered_sleep = sleep_no_nap.copy()
-    filtered_sleep["day_of_week"]=filtered_sleep["end"].dt.weekday
-    filtered_sleep["day_type"]=filtered_sleep["day_of_week"].apply(lambda x: "Weekend" if x>=5 else "Weekday")
-    filtered_sleep["score.stage_summary.time_in_bed_hours"]=filtered_sleep["score.stage_summary.total_in_bed_time_milli"].apply(lambda x: x/1000/60/60)
-    filtered_sleep["score.stage_summary.total_awake_time_hours"]=filtered_sleep["score.stage_summary.total_awake_time_milli"].apply(lambda x: x/1000/60/60)
-    filtered_sleep["score.stage_summary.total_light_sleep_time_minutes"]=filtered_sleep["score.stage_summary.total_light_sleep_time_milli"].apply(lambda x: x/1000/60)
-    filtered_sleep["score.stage_summary.total_slow_wave_sleep_time_minutes"]=filtered_sleep["score.stage_summary.total_slow_wave_sleep_time_milli"].apply(lambda x: x/1000/60)
-    filtered_sleep["score.stage_summary.total_rem_sleep_time_minutes"]=filtered_sleep["score.stage_summary.total_rem_sleep_time_milli"].apply(lambda x: x/1000/60)
-    # st.write(filtered_sleep[0:10])
-    rec_copy = rec.copy()
-    rec_copy["day_of_week"]=rec_copy["created_at"].dt.weekday
-    rec_copy["day_type"]=rec_copy["day_of_week"].apply(lambda x: "Weekend" if x>=5 else "Weekday")
-    workout_copy = workout.copy()
-    workout_copy["day_of_week"]=workout_copy["start"].dt.weekday
-    workout_copy["day_type"]=workout_copy["day_of_week"].apply(lambda x: "Weekend" if x>=5 else "Weekday")
-    return rec_copy, filtered_sleep, workout_copy
+    return preprocess_metrics(rec, sleep, workout)
 
 with st.spinner(text="loading metrics..."):
     rec_copy, filtered_sleep, workout_copy = preprocessing()
@@ -148,7 +128,7 @@ def find_strong_correlations(corr_matrix, threshold=0.5):
     return strong_pairs
 
 
-corr_matrix = filtered_sleep.drop(columns=["id", "nap", "start", "end", "created_at", "updated_at", "score.stage_summary.total_in_bed_time_milli","score.stage_summary.total_rem_sleep_time_milli","score.stage_summary.total_light_sleep_time_milli","score.stage_summary.total_awake_time_milli", "score.stage_summary.total_slow_wave_sleep_time_milli","score.stage_summary.total_no_data_time_milli"]).select_dtypes(include=[np.number]).corr()
+corr_matrix = filtered_sleep.drop(columns=["id", "nap", "start", "end", "created_at", "updated_at", "score.stage_summary.total_in_bed_time_milli","score.stage_summary.total_rem_sleep_time_milli","score.stage_summary.total_light_sleep_time_milli","score.stage_summary.total_awake_time_milli", "score.stage_summary.total_slow_wave_sleep_time_milli","score.stage_summary.total_no_data_time_milli", "score.stage_summary.total_sleep_time_hours"]).select_dtypes(include=[np.number]).corr()
 
 # Allow user to set the correlation threshold
 
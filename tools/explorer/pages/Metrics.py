@@ -16,7 +16,7 @@ from streamlit_extras.chart_container import chart_container
 from streamlit_extras.metric_cards import style_metric_cards        
  
 from Client import WhoopClientSingleton  # Import the WhoopClientSingleton class
-from Helper import helper_milliseconds_to_hours, helper_delta_percentage
+from Helper import helper_milliseconds_to_hours, helper_delta_percentage, recovery_by_cycle
 
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 st.set_page_config(page_title="Whoop", page_icon="🏃‍♂️", layout="wide")
@@ -58,12 +58,10 @@ current_period_data = CurrentPeriodData()
 def load_metrics(baseline_days: int, today) -> Dict:
 
     start = today - timedelta(days=baseline_days + 1)
-    rec, _ = client.recovery.collection_df(start=start, end=today, get_all_pages=True)
-    sleep, _ = client.sleep.collection_df(start=start, end=today, get_all_pages=True)  
-    # cycle, _ = client.cycle.collection_df(start=start, end=today, get_all_pages=True)
-    workout, _ = client.workout.collection_df(
-        start=start, end=today, get_all_pages=True
-    )
+    frames = client.fetch_many(["recovery", "sleep", "cycle", "workout"], start=start, end=today)
+    # date the recoveries by the start of their cycle (as the recovery report)
+    rec = recovery_by_cycle(frames["recovery"], frames["cycle"])
+    sleep, workout = frames["sleep"], frames["workout"]
     return rec, sleep, workout
 
 with st.spinner(text="loading metrics..."):
@@ -105,27 +103,27 @@ def compute_average_respiratory_rate(start, end):
     return avg_respiratory_rate
 
 def compute_average_recovery_score(start, end):
-    rec_copy = rec[(pd.to_datetime(rec["created_at"]) >= start) & (pd.to_datetime(rec["created_at"]) <= end)]
+    rec_copy = rec[(pd.to_datetime(rec["start"]) >= start) & (pd.to_datetime(rec["start"]) <= end)]
     avg_rec_score = rec_copy["score.recovery_score"].mean()
     return avg_rec_score
 
 def compute_average_hrv_rmssd_milli(start, end):
-    rec_copy = rec[(pd.to_datetime(rec["created_at"]) >= start) & (pd.to_datetime(rec["created_at"]) <= end)]
+    rec_copy = rec[(pd.to_datetime(rec["start"]) >= start) & (pd.to_datetime(rec["start"]) <= end)]
     avg_hrv_rmssd_milli = rec_copy["score.hrv_rmssd_milli"].mean()
     return avg_hrv_rmssd_milli
 
 def compute_average_rhr(start, end):
-    rec_copy = rec[(pd.to_datetime(rec["created_at"]) >= start) & (pd.to_datetime(rec["created_at"]) <= end)]
+    rec_copy = rec[(pd.to_datetime(rec["start"]) >= start) & (pd.to_datetime(rec["start"]) <= end)]
     avg_rhr = rec_copy["score.resting_heart_rate"].mean()
     return avg_rhr
 
 def compute_average_spo2(start, end):
-    rec_copy = rec[(pd.to_datetime(rec["created_at"]) >= start) & (pd.to_datetime(rec["created_at"]) <= end)]
+    rec_copy = rec[(pd.to_datetime(rec["start"]) >= start) & (pd.to_datetime(rec["start"]) <= end)]
     avg_spo2 = rec_copy["score.spo2_percentage"].mean()
     return avg_spo2
 
 def compute_average_skin_temp(start, end):
-    rec_copy = rec[(pd.to_datetime(rec["created_at"]) >= start) & (pd.to_datetime(rec["created_at"]) <= end)]
+    rec_copy = rec[(pd.to_datetime(rec["start"]) >= start) & (pd.to_datetime(rec["start"]) <= end)]
     avg_skin_temp = rec_copy["score.skin_temp_celsius"].mean()
     return avg_skin_temp
 
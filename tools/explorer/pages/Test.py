@@ -16,6 +16,7 @@ from whoopy import WhoopClient, SPORT_IDS
 from streamlit_extras.chart_container import chart_container
 from streamlit_extras.metric_cards import style_metric_cards
 from Client import WhoopClientSingleton  # Import the WhoopClientSingleton class
+from Helper import recovery_by_cycle
 
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 st.set_page_config(page_title="Whoop", page_icon="🏃‍♂️", layout="wide")
@@ -68,9 +69,10 @@ baseline_days = st.slider("Days to load", 1, 180, 30, 1)
 @st.cache_data()
 def load_metrics(baseline_days: int, today) -> Dict:
     start = today - timedelta(days=baseline_days + 1)
-    rec, _ = client.recovery.collection_df(start=start, end=today, get_all_pages=True)
-    sleep, _ = client.sleep.collection_df(start=start, end=today, get_all_pages=True)  
-    workout, _ = client.workout.collection_df(start=start, end=today, get_all_pages=True)
+    frames = client.fetch_many(["recovery", "sleep", "cycle", "workout"], start=start, end=today)
+    # date the recoveries by the start of their cycle (as the recovery report)
+    rec = recovery_by_cycle(frames["recovery"], frames["cycle"])
+    sleep, workout = frames["sleep"], frames["workout"]
     return rec, sleep, workout
 
 with st.spinner(text="loading metrics..."):
@@ -81,10 +83,10 @@ with st.spinner(text="loading metrics..."):
 def plot_hrv_trends(rec):
     fig = px.line(
         rec,
-        x=rec['created_at'],
+        x=rec['start'],
         y=rec['score.hrv_rmssd_milli'],
         title="HRV Trends Over Time",
-        labels={"created_at": "Date", "score.hrv_rmssd_milli": "HRV (ms)"},
+        labels={"start": "Date", "score.hrv_rmssd_milli": "HRV (ms)"},
     )
     fig.update_layout(
         xaxis_title="Date",
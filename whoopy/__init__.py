@@ -6,8 +6,14 @@ try:
     # from . import auth
     from . import models
     from . import handlers
+    from . import transport
     from .models.models_v1 import SPORT_IDS
     from .client_v1 import WhoopClient, API_VERSION
+    from .handlers.handler_v1 import ResponseCache, WhoopAPIError
+    from .handlers.scheduler import RequestScheduler
+    from .storage.record_store import RecordStore
+    from .storage.hr_store import HeartRateStore
+    from .storage.hr_pyramid import HeartRatePyramid
 except Exception as ex:
     logging.error(f"Error importing whoopy: {ex}")
 
@@ -17,3 +23,16 @@ try:
     from . import client_v1
 except Exception as ex:
     logging.error(f"Not all dependencies installed: {ex}")
+
+try:
+    # optional asyncio client (requires aiohttp)
+    from . import client_v1_async
+    from .client_v1_async import AsyncWhoopClient
+except ImportError as ex:
+    logging.debug(f"Async client not available: {ex}")
+
+try:
+    # optional columnar archive (requires pyarrow)
+    from .storage.parquet_archive import ParquetArchive
+except ImportError as ex:
+    logging.debug(f"Parquet archive not available: {ex}")
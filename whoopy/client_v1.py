@@ -5,15 +5,26 @@ Generated against version 1.0 of the API.
 Copyright 2022 (C) Felix Geilert
 """
 
+from concurrent.futures import Executor, ThreadPoolExecutor
 import json
+import logging
 import os
-import requests
-from typing import Tuple, List
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, Tuple, List
 from typing_extensions import Self
 import uuid
 import webbrowser
 
+import pandas as pd
+
+from . import transport
 from .handlers import handler_v1 as handlers
+from .handlers.scheduler import RequestScheduler
+from .storage.record_store import RecordStore
+
+if TYPE_CHECKING:
+    from .storage.parquet_archive import ParquetArchive
 
 
 API_VERSION = "1"
@@ -28,6 +39,9 @@ SCOPES = [
     "read:profile",
     "read:body_measurement",
 ]
+RESOURCES = ["recovery", "sleep", "cycle", "workout"]
+# refresh the token this long before it expires (in seconds)
+REFRESH_MARGIN = 300
 
 
 class WhoopClient:
@@ -39,6 +53,14 @@ class WhoopClient:
         refresh_token: str = None,
         client_id: str = None,
         client_secret: str = None,
+        max_workers: int = 4,
+        store: RecordStore = None,
+        cache: handlers.ResponseCache = None,
+        archive: "ParquetArchive" = None,
+        scheduler: RequestScheduler = None,
+        expires_at: float = None,
+        auto_refresh: bool = False,
+        base_url: str = API_BASE,
     ):
         """Creates a new WhoopClient.
 
@@ -51,13 +73,52 @@ class WhoopClient:
             refresh_token (str, optional): The refresh token. Defaults to None.
             client_id (str, optional): The client ID. Defaults to None.
             client_secret (str, optional): The client secret. Defaults to None.
+            max_workers (int, optional): Maximum number of concurrent requests this client sends
+                through `fetch_many`. Defaults to 4.
+            store (RecordStore, optional): Local store that collections are synced into and answered from.
+                Defaults to None (always query the API).
+            cache (handlers.ResponseCache, optional): Cache for the responses of the API. Defaults to None.
+            archive (ParquetArchive, optional): Columnar archive that `collection_df` reads from and
+                writes to (requires pyarrow). Defaults to None.
+            scheduler (RequestScheduler, optional): Schedules the requests within the rate limit of the API
+                and retries throttled or failed requests. Defaults to a new scheduler.
+            expires_at (float, optional): Absolute expiry of the access token (unix time).
+                Defaults to now + `expires_in`.
+            auto_refresh (bool, optional): Refresh the token in a background timer shortly before it expires
+                (requires the refresh token, client ID and secret). The timer runs until `close` is called,
+                requests refresh an expiring token on demand either way. Defaults to False.
+            base_url (str, optional): Base url of the API (e.g. of a `whoopy.mock` server).
+                Defaults to the Whoop production API.
         """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1.")
+
         self.token = access_token
         self.expires_in = expires_in
+        self.expires_at = expires_at if expires_at is not None else time.time() + expires_in
         self.scopes = scopes
         self.refresh_token = refresh_token
         self._client_id = client_id
         self._client_secret = client_secret
+        self.store = store
+        self.cache = cache
+        self.archive = archive
+        self.scheduler = scheduler or RequestScheduler()
+        self.base_url = base_url
+        self._user_id = None
+
+        # token refreshes are serialized (and persisted to the token file if set)
+        self.token_path = None
+        self.auto_refresh = auto_refresh
+        self._refresh_lock = threading.RLock()
+        self._refresh_timer = None
+
+        # bound the concurrency of this client (executor is created lazily)
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._local = threading.local()
 
         # create a session
         self.user_agent = "Python/3.X (X11; Linux x86_64)"
@@ -69,26 +130,122 @@ class WhoopClient:
         self.sleep = handlers.WhoopSleepHandler(self)
         self.workout = handlers.WhoopWorkoutHandler(self)
         self.recovery = handlers.WhoopRecoveryHandler(self)
+        self._schedule_refresh()
 
     @property
     def _token(self):
         return {
             "access_token": self.token,
             "expires_in": self.expires_in,
+            "expires_at": self.expires_at,
             "refresh_token": self.refresh_token,
             "scopes": self.scopes,
         }
 
+    @property
+    def user_id(self) -> int:
+        """The id of the authenticated user (retrieved once from the profile)."""
+        if self._user_id is None:
+            self._user_id = self.user.profile().user_id
+        return self._user_id
+
     def _update_session(self):
-        """Updates the session with the new token."""
-        self._base_path = f"{API_BASE}developer/v1"
-        self.session = requests.Session()
-        self.session.headers.update(
-            {
-                "Authorization": f"Bearer {self.token}",
-                "User-Agent": self.user_agent,
+        """Updates the session with the new token.
+
+        The session (and its pooled connections) is kept, only the authorization header is swapped.
+        """
+        self._base_path = f"{self.base_url}developer/v1"
+        if getattr(self, "session", None) is None:
+            self.session = transport.create_session({"User-Agent": self.user_agent})
+        self.session.headers["Authorization"] = f"Bearer {self.token}"
+
+    def _get_executor(self) -> Executor:
+        """Returns the thread pool of this client (created on first use)."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="whoopy"
+                )
+            return self._executor
+
+    def _run_limited(self, fn, *args, **kwargs):
+        """Runs the function while holding one of the concurrency slots of the client."""
+        with self._slots:
+            self._local.active = True
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._local.active = False
+
+    def fetch_many(
+        self,
+        resources: Iterable[str] = None,
+        start: str = None,
+        end: str = None,
+        executor: Executor = None,
+        **kwargs,
+    ) -> Dict[str, pd.DataFrame]:
+        """Retrieves the collections of multiple resources concurrently.
+
+        All pages of each resource are crawled in parallel, so the total time is bound by the
+        slowest resource rather than the sum of all of them.
+
+        Args:
+            resources (Iterable[str], optional): Names of the resources to load
+                (any of "recovery", "sleep", "cycle", "workout"). Defaults to all of them.
+            start (str, optional): Start of the time window. Defaults to None.
+            end (str, optional): End of the time window. Defaults to None.
+            executor (Executor, optional): Executor to run the crawls on. Defaults to the thread
+                pool of the client. The number of concurrent crawls is capped by `max_workers`
+                in either case. Calls from within a crawl of this client (e.g. a callback) run
+                the crawls one after another on the calling thread instead, as they already hold
+                a slot of the client (and waiting for further slots could deadlock).
+            **kwargs: Additional arguments passed to `collection_df`.
+
+        Returns:
+            Dict[str, pd.DataFrame]: The DataFrames keyed by resource name.
+        """
+        resources = list(resources or RESOURCES)
+        for res in resources:
+            if res not in RESOURCES:
+                raise ValueError(f"Unknown resource: {res} (expected one of {RESOURCES})")
+        kwargs.setdefault("get_all_pages", True)
+
+        # nested calls run inline (the calling thread already holds a slot)
+        if getattr(self._local, "active", False):
+            return {
+                res: getattr(self, res).collection_df(start=start, end=end, **kwargs)[0]
+                for res in resources
             }
-        )
+
+        # submit all crawls
+        executor = executor or self._get_executor()
+        futures = {
+            res: executor.submit(
+                self._run_limited,
+                getattr(self, res).collection_df,
+                start=start,
+                end=end,
+                **kwargs,
+            )
+            for res in resources
+        }
+
+        # wait for the results (keep order of the request)
+        return {res: fut.result()[0] for res, fut in futures.items()}
+
+    def close(self):
+        """Shuts down the thread pool and closes the session of the client."""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+        self.session.close()
+        with self._refresh_lock:
+            self.auto_refresh = False
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+                self._refresh_timer = None
 
     def store_token(self, path: str):
         """Stores the token to a file.
@@ -98,22 +255,90 @@ class WhoopClient:
         """
         # verify that folder exists
         base_dir = os.path.dirname(path)
-        os.makedirs(base_dir, exist_ok=True)
+        if base_dir:
+            os.makedirs(base_dir, exist_ok=True)
 
-        # store the token
-        with open(path, "w") as f:
+        # store the token (replaced atomically as other processes might read it)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w") as f:
             json.dump(self._token, f)
+        os.replace(tmp, path)
+
+    def token_valid(self, margin: float = REFRESH_MARGIN) -> bool:
+        """Checks if the access token is valid for at least `margin` seconds."""
+        return self.expires_at - time.time() > margin
+
+    def ensure_token(self, margin: float = REFRESH_MARGIN):
+        """Refreshes the token if it expires within `margin` seconds (and can be refreshed)."""
+        if self.token_valid(margin) or not self._can_refresh():
+            return
+        with self._refresh_lock:
+            # another thread (or process sharing the token file) might have refreshed in the meantime
+            if not self.token_valid(margin):
+                self._load_stored_token()
+            if not self.token_valid(margin):
+                self.refresh()
+
+    def _load_stored_token(self):
+        """Adopts the token of the token file if it is newer than the token of the client."""
+        if self.token_path is None or not os.path.exists(self.token_path):
+            return
+        try:
+            with open(self.token_path, "r") as f:
+                token = json.load(f)
+        except (OSError, ValueError):
+            return
+        if token.get("expires_at", 0) > self.expires_at:
+            self.token = token["access_token"]
+            self.expires_in = token["expires_in"]
+            self.expires_at = token["expires_at"]
+            self.refresh_token = token["refresh_token"]
+            self._update_session()
+
+    def _can_refresh(self) -> bool:
+        return None not in (self.refresh_token, self._client_id, self._client_secret)
+
+    def _schedule_refresh(self):
+        """Schedules the background refresh shortly before the token expires."""
+        if not self.auto_refresh or not self._can_refresh():
+            return
+        with self._refresh_lock:
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+            delay = max(0.0, self.expires_at - time.time() - REFRESH_MARGIN)
+            self._refresh_timer = threading.Timer(delay, self._background_refresh)
+            self._refresh_timer.daemon = True
+            self._refresh_timer.start()
+
+    def _background_refresh(self):
+        try:
+            self.ensure_token()
+        except Exception as ex:
+            # requests still refresh on demand through `ensure_token`
+            logging.warning(f"Background token refresh failed: {ex}")
+            return
+        self._schedule_refresh()
 
     @classmethod
     def from_token(
-        cls, path: str, client_id: str, client_secret: str, overwrite_token: bool = True
+        cls,
+        path: str,
+        client_id: str,
+        client_secret: str,
+        overwrite_token: bool = True,
+        **kwargs,
     ) -> Self:
         """Loads a token from a file.
 
+        The token is only refreshed if it expires soon (or the file holds no expiry). Without a refresh
+        no request is sent to the API.
+
         Args:
             path (str): The path to the file (e.g. ".tokens/token.json").
             client_id (str): The client ID.
             client_secret (str): The client secret.
+            overwrite_token (bool, optional): Store refreshed tokens to the file. Defaults to True.
+            **kwargs: Additional arguments passed to the constructor.
         """
         with open(path, "r") as f:
             token = json.load(f)
@@ -124,12 +349,15 @@ class WhoopClient:
             token["refresh_token"],
             client_id,
             client_secret,
+            # older token files hold no expiry (treated as expired)
+            expires_at=token.get("expires_at", 0),
+            **kwargs,
         )
-        client.refresh()
 
         # check if token should be updated
         if overwrite_token is True:
-            client.store_token(path)
+            client.token_path = path
+        client.ensure_token()
 
         return client
 
@@ -168,11 +396,12 @@ class WhoopClient:
         return res, state
 
     @classmethod
-    def _parse_token(cls, payload, scopes):
-        url = f"{API_AUTH}/token"
+    def _parse_token(cls, payload, scopes, base_url: str = API_BASE):
+        url = f"{base_url}oauth/oauth2/token"
 
         # retrieve the codes
-        res = requests.post(url, data=payload)
+        with transport.create_session() as session:
+            res = session.post(url, data=payload)
         if res.status_code != 200:
             raise RuntimeError(f"Authorization failed with code {res.status_code}")
         codes = res.json()
@@ -194,6 +423,7 @@ class WhoopClient:
         client_secret: str,
         redirect_url: str = "https://jwt.ms/",
         scopes: List[str] = None,
+        base_url: str = API_BASE,
     ) -> Self:
         """Authorize the client with the given code."""
         # generate request using the code
@@ -204,7 +434,7 @@ class WhoopClient:
             "code": code,
             "redirect_uri": redirect_url,
         }
-        codes, token_scopes = cls._parse_token(payload, scopes)
+        codes, token_scopes = cls._parse_token(payload, scopes, base_url)
 
         # generate the client
         return cls(
@@ -214,6 +444,7 @@ class WhoopClient:
             codes.get("refresh_token", None),
             client_id=client_id,
             client_secret=client_secret,
+            base_url=base_url,
         )
 
     @classmethod
@@ -254,31 +485,36 @@ class WhoopClient:
         return client
 
     def refresh(self):
-        """Refreshes the token provided."""
-        # verify client is setup correctly
-        if self.refresh_token is None:
-            raise ValueError("No refresh token provided")
-        if self._client_id is None or self._client_secret is None:
-            raise ValueError("No client id or secret provided")
-
-        # generate request using the code
-        payload = {
-            "client_id": self._client_id,
-            "client_secret": self._client_secret,
-            "grant_type": "refresh_token",
-            "refresh_token": self.refresh_token,
-        }
+        """Refreshes the token provided (concurrent refreshes are serialized)."""
+        with self._refresh_lock:
+            # verify client is setup correctly
+            if self.refresh_token is None:
+                raise ValueError("No refresh token provided")
+            if self._client_id is None or self._client_secret is None:
+                raise ValueError("No client id or secret provided")
+
+            # generate request using the code
+            payload = {
+                "client_id": self._client_id,
+                "client_secret": self._client_secret,
+                "grant_type": "refresh_token",
+                "refresh_token": self.refresh_token,
+            }
 
-        # retrieve the codes
-        codes, _ = self._parse_token(payload, self.scopes)
+            # retrieve the codes
+            codes, _ = self._parse_token(payload, self.scopes, self.base_url)
 
-        # update data
-        self.token = codes["access_token"]
-        self.expires_in = codes["expires_in"]
-        self.refresh_token = codes.get("refresh_token", None)
+            # update data
+            self.token = codes["access_token"]
+            self.expires_in = codes["expires_in"]
+            self.expires_at = time.time() + codes["expires_in"]
+            self.refresh_token = codes.get("refresh_token", None)
 
-        # update sess
-        self._update_session()
+            # update sess
+            self._update_session()
+            if self.token_path is not None:
+                self.store_token(self.token_path)
+        self._schedule_refresh()
 
     @classmethod
     def from_token_or_flow(
@@ -0,0 +1,192 @@
+"""Asyncio version of the official Whoop API client.
+
+Requires `aiohttp` (install with `pip install whoopy[async]`).
+
+Copyright 2022 (C) Felix Geilert
+"""
+
+import asyncio
+import json
+from typing import Dict, Iterable, List
+
+import aiohttp
+import pandas as pd
+from typing_extensions import Self
+
+from .client_v1 import API_BASE, RESOURCES
+from .handlers import handler_v1_async as handlers
+from .handlers.scheduler import RequestScheduler
+
+
+class AsyncWhoopClient:
+    def __init__(
+        self,
+        access_token: str,
+        expires_in: int,
+        scopes: List[str],
+        refresh_token: str = None,
+        client_id: str = None,
+        client_secret: str = None,
+        max_concurrency: int = 4,
+        connector: aiohttp.BaseConnector = None,
+        semaphore: asyncio.Semaphore = None,
+        base_url: str = API_BASE,
+        scheduler: RequestScheduler = None,
+    ):
+        """Creates a new AsyncWhoopClient.
+
+        The client has to be closed after use (or used as async context manager).
+        To drive many accounts, pass the same `connector` to all clients so they share one connection pool
+        and optionally a shared `semaphore` to cap the requests in flight across all of them.
+
+        Args:
+            access_token (str): The access token.
+            expires_in (int): The time until the token expires (in seconds).
+            scopes (List[str]): The scopes that the token has.
+            refresh_token (str, optional): The refresh token. Defaults to None.
+            client_id (str, optional): The client ID. Defaults to None.
+            client_secret (str, optional): The client secret. Defaults to None.
+            max_concurrency (int, optional): Maximum number of requests in flight for this client.
+                Ignored if `semaphore` is provided. Defaults to 4.
+            connector (aiohttp.BaseConnector, optional): Shared connection pool. Defaults to None
+                (the client creates and owns its own pool).
+            semaphore (asyncio.Semaphore, optional): Shared concurrency limit. Defaults to None.
+            base_url (str, optional): Base url of the API. Defaults to the Whoop production API.
+            scheduler (RequestScheduler, optional): Schedules the requests within the rate limit of the API
+                and retries throttled or failed requests (the same policy as the synchronous client).
+                Can be shared between clients of the same app. Defaults to a new scheduler.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+
+        self.token = access_token
+        self.expires_in = expires_in
+        self.scopes = scopes
+        self.refresh_token = refresh_token
+        self._client_id = client_id
+        self._client_secret = client_secret
+        self._base_path = f"{base_url}developer/v1"
+        self._auth_path = f"{base_url}oauth/oauth2"
+        self.scheduler = scheduler or RequestScheduler()
+
+        # create the session (pool is only closed with the session if the client owns it)
+        self.user_agent = "Python/3.X (X11; Linux x86_64)"
+        self._semaphore = semaphore or asyncio.Semaphore(max_concurrency)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            connector_owner=connector is None,
+            headers=self._headers(),
+        )
+
+        # create a bunch of handlers
+        self.user = handlers.AsyncWhoopUserHandler(self)
+        self.cycle = handlers.AsyncWhoopCycleHandler(self)
+        self.sleep = handlers.AsyncWhoopSleepHandler(self)
+        self.workout = handlers.AsyncWhoopWorkoutHandler(self)
+        self.recovery = handlers.AsyncWhoopRecoveryHandler(self)
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.token}",
+            "User-Agent": self.user_agent,
+        }
+
+    @property
+    def _token(self):
+        return {
+            "access_token": self.token,
+            "expires_in": self.expires_in,
+            "refresh_token": self.refresh_token,
+            "scopes": self.scopes,
+        }
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        """Closes the session (and the connection pool if owned by the client)."""
+        await self.session.close()
+
+    @classmethod
+    def from_token(cls, path: str, client_id: str, client_secret: str, **kwargs) -> Self:
+        """Loads a token from a file (use `refresh` to renew it).
+
+        Note: Must be called from within a running event loop.
+
+        Args:
+            path (str): The path to the file (e.g. ".tokens/token.json").
+            client_id (str): The client ID.
+            client_secret (str): The client secret.
+            **kwargs: Additional arguments passed to the constructor.
+        """
+        with open(path, "r") as f:
+            token = json.load(f)
+        return cls(
+            token["access_token"],
+            token["expires_in"],
+            token["scopes"],
+            token["refresh_token"],
+            client_id,
+            client_secret,
+            **kwargs,
+        )
+
+    async def refresh(self):
+        """Refreshes the token provided."""
+        # verify client is setup correctly
+        if self.refresh_token is None:
+            raise ValueError("No refresh token provided")
+        if self._client_id is None or self._client_secret is None:
+            raise ValueError("No client id or secret provided")
+
+        # generate request using the code
+        payload = {
+            "client_id": self._client_id,
+            "client_secret": self._client_secret,
+            "grant_type": "refresh_token",
+            "refresh_token": self.refresh_token,
+        }
+
+        # retrieve the codes
+        async with self.session.post(f"{self._auth_path}/token", data=payload) as res:
+            if res.status != 200:
+                raise RuntimeError(f"Authorization failed with code {res.status}")
+            codes = await res.json()
+
+        # update data (only the auth header changes, the pool is kept)
+        self.token = codes["access_token"]
+        self.expires_in = codes["expires_in"]
+        self.refresh_token = codes.get("refresh_token", None)
+        self.session.headers.update(self._headers())
+
+    async def fetch_many(
+        self,
+        resources: Iterable[str] = None,
+        start: str = None,
+        end: str = None,
+        **kwargs,
+    ) -> Dict[str, pd.DataFrame]:
+        """Retrieves the collections of multiple resources concurrently.
+
+        Args:
+            resources (Iterable[str], optional): Names of the resources to load
+                (any of "recovery", "sleep", "cycle", "workout"). Defaults to all of them.
+            start (str, optional): Start of the time window. Defaults to None.
+            end (str, optional): End of the time window. Defaults to None.
+            **kwargs: Additional arguments passed to `collection_df`.
+
+        Returns:
+            Dict[str, pd.DataFrame]: The DataFrames keyed by resource name.
+        """
+        resources = list(resources or RESOURCES)
+        for res in resources:
+            if res not in RESOURCES:
+                raise ValueError(f"Unknown resource: {res} (expected one of {RESOURCES})")
+
+        results = await asyncio.gather(
+            *[getattr(self, res).collection_df(start=start, end=end, **kwargs) for res in resources]
+        )
+        return {res: df for res, (df, _) in zip(resources, results)}
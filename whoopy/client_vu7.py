@@ -4,8 +4,11 @@ This contains information for the unofficial version 7 of the Whoop API.
 
 Copyright (C) 2022 Felix Geilert
 """
-import json
-from typing import Dict, Union
+import ast
+from collections import OrderedDict
+from operator import itemgetter
+import threading
+from typing import Union
 
 import requests
 import configparser
@@ -17,6 +20,17 @@ import pandas as pd
 import numpy as np
 from time_helper import create_intervals, localize_datetime
 
+from whoopy import transport
+from whoopy.crawler import iter_crawl
+from whoopy.heart_rate import HeartRateBuffer, decode_samples
+from whoopy.handlers.timestamps import (
+    NAT,
+    OFFSET_COLUMN,
+    local_day,
+    local_time,
+    normalize_frame,
+)
+
 
 # define default whoop date format
 DATE_FORMAT = "%Y-%m-%d"
@@ -25,8 +39,17 @@ DATE_FORMAT = "%Y-%m-%d"
 API_VERSION = "7"
 API_URL = f"https://api-{API_VERSION}.whoop.com"
 
-# columns that should be converted
-STR_COLS = ["strain.workouts"]
+# list columns that are split into child tables (column -> name of the table)
+CHILD_COLS = {"strain.workouts": "workouts", "sleep.naps": "naps"}
+
+# number of raw cycles that are flattened at once
+KEYDATA_BATCH = 1024
+
+# number of heart rate zones of the workouts
+ZONES = 6
+
+# number of raw sleep payloads kept for reuse beyond the latest bulk pull (least recently used ones are dropped)
+SLEEP_CACHE_SIZE = 512
 
 
 class AuthenticationError(Exception):
@@ -41,6 +64,127 @@ def whoop_time_str(dt: Union[datetime, str]):
     return f"{dt_utc.strftime(DATE_FORMAT)}T{dt_utc.strftime('%H:%M:%S')}.{ms:03}Z"
 
 
+def _normalize_during(
+    df: pd.DataFrame, epoch_times: bool = False, day: bool = False
+) -> pd.DataFrame:
+    """Parses the `during` ranges of the frame in one pass and adds their duration in minutes.
+
+    Args:
+        df: Frame with the `during.lower` and `during.upper` columns
+        epoch_times: Keep the times as UTC epoch milliseconds (otherwise UTC datetimes)
+        day: Add the UTC day of the start as `day` and its local day as `local_day` column
+    """
+    cols = ["during.lower", "during.upper"]
+    normalize_frame(df, cols, "timezoneOffset")
+    lower, upper = df["during.lower"].values, df["during.upper"].values
+    valid = (lower != NAT) & (upper != NAT)
+    df["total_minutes"] = np.where(valid, (upper - lower) / 60000.0, np.nan)
+    if day:
+        offsets = df[OFFSET_COLUMN].values if OFFSET_COLUMN in df.columns else None
+        df["day"] = np.datetime_as_string(local_day(lower), unit="D")
+        df["local_day"] = np.datetime_as_string(local_day(lower, offsets), unit="D")
+    if not epoch_times:
+        for col in cols:
+            df[col] = pd.DatetimeIndex(local_time(df[col].values)).tz_localize("UTC")
+    return df
+
+
+def _nap_minutes(naps: pd.Series) -> np.ndarray:
+    """Sums the quality duration of the naps of each row (in minutes).
+
+    The nap lists are exploded into flat arrays once and summed per row.
+    """
+    lists = [x if isinstance(x, list) else [] for x in naps]
+    lengths = np.fromiter((len(x) for x in lists), dtype=np.int64, count=len(lists))
+    durations = np.array(
+        [nap.get("qualityDuration") for x in lists for nap in x], dtype=float
+    )
+    owners = np.repeat(np.arange(len(lists)), lengths)
+    totals = np.bincount(owners, weights=np.nan_to_num(durations), minlength=len(lists))
+    return totals / 60000
+
+
+def _keydata_frame(raw) -> pd.DataFrame:
+    """Flattens a batch of raw cycles (list columns are resolved here)."""
+    df = pd.json_normalize(raw)
+
+    # fixing the day column so it's not a list
+    df["days"] = df["days"].map(itemgetter(0))
+    df.rename(columns={"days": r"day"}, inplace=True)
+
+    # Making nap variable
+    if "sleep.naps" in df.columns:
+        df["nap_duration"] = _nap_minutes(df["sleep.naps"])
+        df.drop(["sleep.naps"], axis=1, inplace=True)
+    else:
+        df["nap_duration"] = 0.0
+    return df
+
+
+def flatten_children(df: pd.DataFrame, children=True, parent_key: str = None):
+    """Splits list columns of the frame into child tables.
+
+    The records of each list column are decoded in a single pass into a flat table that holds the
+    `parent_key` column of their row (or the row index as `parent_index`).
+
+    Args:
+        df: Frame with list columns (e.g. from `pd.json_normalize`)
+        children: Dict of column to table name, list of columns or True for the default `CHILD_COLS`
+        parent_key: Column of the frame that links the child records to their parent
+
+    Returns:
+        Tuple of the frame (without the list columns) and a dict of the child tables
+    """
+    if children is True:
+        children = CHILD_COLS
+    elif not isinstance(children, dict):
+        children = {col: col.split(".")[-1] for col in children}
+    if parent_key is not None:
+        keys, key_name = df[parent_key].values, parent_key
+    else:
+        keys, key_name = df.index.values, "parent_index"
+
+    tables = {}
+    for col, name in children.items():
+        if col not in df.columns:
+            continue
+        lists = [x if isinstance(x, list) else [] for x in df[col]]
+        lengths = np.fromiter((len(x) for x in lists), dtype=np.int64, count=len(lists))
+        child = pd.json_normalize([item for x in lists for item in x])
+        child.insert(0, key_name, np.repeat(keys, lengths))
+        tables[name] = child
+    return df.drop(columns=[c for c in children if c in df.columns]), tables
+
+
+def _flatten_workouts(cells) -> list:
+    """Flattens the workout lists of all days into a single list of workouts.
+
+    Cells that hold the workouts as string (e.g. when loaded from a csv) are parsed as literals.
+    """
+    workouts = []
+    for cell in cells:
+        if isinstance(cell, str):
+            cell = ast.literal_eval(cell)
+        if isinstance(cell, (list, tuple)):
+            workouts.extend(cell)
+    return workouts
+
+
+def _zone_minutes(zones: pd.Series) -> np.ndarray:
+    """Converts the heart rate zones (milliseconds per zone) into a `(n, ZONES)` array of minutes."""
+    out = np.full((len(zones), ZONES), np.nan)
+    rows, values = [], []
+    for i, item in enumerate(zones):
+        if isinstance(item, dict):
+            item = [item.get(z) for z in range(ZONES)]
+        if isinstance(item, (list, tuple)) and len(item) >= ZONES:
+            rows.append(i)
+            values.append(item[:ZONES])
+    if rows:
+        out[rows] = np.array(values, dtype=float)
+    return out / 60000.0
+
+
 class WhoopClient:
     """
     A class object to allow a user to login and store their authorization code,
@@ -49,6 +193,11 @@ class WhoopClient:
     Args:
         auth_code (str): Authorization Code for whoop login
         whoop_id (str): Username
+        session (requests.Session): Session to send requests with (defaults to the shared pool)
+        max_workers (int): Number of concurrent requests of the bulk pulls (windows and sleeps)
+        retries (int): Retries of a failed request in the bulk pulls
+        sleep_cache_size (int): Number of raw sleep payloads kept for reuse. The cache always holds all sleeps
+            of the latest bulk pull, so `get_sleep` and `get_sleep_events_all` download each sleep once.
     """
 
     def __init__(
@@ -57,8 +206,14 @@ class WhoopClient:
         whoop_id=None,
         refresh_token=None,
         current_datetime=datetime.utcnow(),
+        session=None,
+        max_workers=4,
+        retries=2,
+        base_url=API_URL,
+        sleep_cache_size=SLEEP_CACHE_SIZE,
     ):
         # create some general params
+        self.base_url = base_url
         self.auth_token = auth_token
         self.refresh_token = refresh_token
         self.whoop_id = whoop_id
@@ -68,13 +223,24 @@ class WhoopClient:
         self.sport_dict = None
         self.all_sleep_events = None
 
+        # reuse pooled keep-alive connections for all requests
+        self.session = session or transport.create_session()
+        self.max_workers = max_workers
+        self.retries = retries
+
+        # raw sleep payloads (shared by the sleep and the sleep events frames, least recently used first)
+        self.sleep_cache_size = sleep_cache_size
+        self._sleep_payloads = OrderedDict()
+        self._sleep_batch = 0
+        self._sleep_lock = threading.Lock()
+
         # check if whoop id should be pulled
         if self.auth_token and not self.start_datetime:
             self.pull_userinfo()
 
     def _create_url(self, postfix="", auth=False, user=True):
         """Generates the URL of the whoop endpoints"""
-        base_url = API_URL
+        base_url = self.base_url
 
         # check for auth
         if auth:
@@ -84,18 +250,24 @@ class WhoopClient:
         if user:
             if not self.whoop_id:
                 raise ValueError("No whoop user has been authenticated!")
-            base_url = f"{API_URL}/users/{self.whoop_id}"
+            base_url = f"{self.base_url}/users/{self.whoop_id}"
 
         # generate url
         return f"{base_url}/{postfix}"
 
-    def pull_api(self, url, params=None, df=False):
+    def pull_api(self, url, params=None, df=False, children=None, parent_key=None):
         """Generalized function to retrieve data from the API.
 
+        Nested lists (e.g. the workouts of a cycle) are kept as python lists in the data frame.
+
         Args:
             url: Path that should be pulled
             params: Query Parameters to be passed
             df: Defines if the output data should be parsed as dataframe
+            children: List columns that are split into child tables (implies `df`). Either a dict of
+                column to table name, a list of columns or True for the default `CHILD_COLS`.
+                Returns a tuple of the data frame and a dict of the child tables.
+            parent_key: Column of the data frame that is added to the child tables (defaults to the row index)
         """
         # provides the authorization code for the header (if provided)
         headers = {}
@@ -103,28 +275,14 @@ class WhoopClient:
             headers["authorization"] = f"Bearer {self.auth_token}"
 
         # send the request
-        pull = requests.get(url, params=params, headers=headers)
+        pull = self.session.get(url, params=params, headers=headers)
 
         # retrieve json data from the API
         if pull.status_code == 200 and len(pull.content) > 1:
+            if children:
+                return flatten_children(pd.json_normalize(pull.json()), children, parent_key)
             if df:
-                d = pd.json_normalize(pull.json())
-
-                # convert potential str columns
-                for col in STR_COLS:
-                    # make sure column exists
-                    if col not in d.columns:
-                        continue
-
-                    # check for type
-                    if d[col].dtype == "object":
-                        d[col] = d[col].apply(
-                            lambda x: json.loads(
-                                str(x).replace("'", '"').replace('u"', '"')
-                            )
-                        )
-
-                return d
+                return pd.json_normalize(pull.json())
             else:
                 return pull.json()
         elif pull.status_code == 401 and self.auth_refresh < 3:
@@ -167,7 +325,7 @@ class WhoopClient:
         }
 
         # send request
-        auth = requests.post(self._create_url(auth=True), json=headers)
+        auth = self.session.post(self._create_url(auth=True), json=headers)
 
         # check for errors
         if auth.status_code != 200:
@@ -218,98 +376,146 @@ class WhoopClient:
         self.start_datetime = parser.isoparse(start_time)
         return data
 
+    def pull_sleep(self, sleep_id):
+        """Retrieves the raw payload of a sleep (recently used sleeps are not downloaded again)."""
+        with self._sleep_lock:
+            sleep = self._sleep_payloads.get(sleep_id)
+            if sleep is not None:
+                self._sleep_payloads.move_to_end(sleep_id)
+        if sleep is None:
+            sleep = self.pull_api(self._create_url(f"sleeps/{sleep_id}"))
+            with self._sleep_lock:
+                self._sleep_payloads[sleep_id] = sleep
+                # drop the least recently used payloads beyond the size of the cache (or the latest pull)
+                while len(self._sleep_payloads) > max(self.sleep_cache_size, self._sleep_batch):
+                    self._sleep_payloads.popitem(last=False)
+        return sleep
+
+    def clear_sleep_cache(self):
+        """Drops all cached sleep payloads (e.g. to re-download scored sleeps)."""
+        with self._sleep_lock:
+            self._sleep_payloads.clear()
+            self._sleep_batch = 0
+
     def pull_sleep_main(self, sleep_id):
-        sleep = self.pull_api(self._create_url(f"sleeps/{sleep_id}"))
+        sleep = self.pull_sleep(sleep_id)
 
         # retrieve the data
         main_df = pd.json_normalize(sleep)
         return main_df
 
     def pull_sleep_events(self, sleep_id):
-        sleep = self.pull_api(self._create_url(f"sleeps/{sleep_id}"))
+        sleep = self.pull_sleep(sleep_id)
 
         # retrieve the data
         events_df = pd.json_normalize(sleep["events"])
         events_df["id"] = sleep_id
         return events_df
 
-    def get_keydata_raw(self, start=None, end=None):
-        """Retrieves all data as array of raw jsons from the creation time of the user."""
-        # store all results
-        results = []
+    def _iter_sleeps(self, sleep_ids, progress=None):
+        """Iterates the payloads of the sleeps in order, while the next sleeps are still downloading.
 
+        Only a bounded number of sleeps is in flight, so the caller can parse each payload as it arrives.
+        The cache keeps all payloads of the pull (a scan of more sleeps than the cache holds would
+        otherwise evict each payload before the next pull of the same sleeps).
+        """
+        with self._sleep_lock:
+            self._sleep_batch = len(set(sleep_ids))
+        for sleep_id, sleep, error in self._iter_crawl(self.pull_sleep, sleep_ids, progress):
+            if error is not None:
+                raise error
+            yield sleep_id, sleep
+
+    def _iter_crawl(self, fetch, items, progress=None):
+        """Fetches the items concurrently and iterates `(item, result, error)` in the order of the items."""
+        return iter_crawl(
+            fetch, items, workers=self.max_workers, retries=self.retries, progress=progress
+        )
+
+    def iter_keydata_raw(self, start=None, end=None, progress=None):
+        """Iterates the raw jsons of the 7 day windows from the creation time of the user.
+
+        The windows are retrieved concurrently but yielded in order (see `get_keydata_raw`), so each
+        window can be processed while the next ones are still downloading.
+        """
         # starts crawling from user creation-time
-        if self.start_datetime:
-            # parse the data
-            if start is not None:
-                if isinstance(start, str):
-                    start_date = parser.parse(start)
-                elif isinstance(start, datetime):
-                    start_date = start
-                else:
-                    raise ValueError(
-                        f"Start argument ({start}) is not a valid datetime ({type(start)})"
-                    )
-                start_date = start_date.replace(tzinfo=None, hour=0, minute=0, second=0)
-            # otherwise use default data
+        if not self.start_datetime:
+            raise RuntimeError("Please run the authorization function first")
+
+        # parse the data
+        if start is not None:
+            if isinstance(start, str):
+                start_date = parser.parse(start)
+            elif isinstance(start, datetime):
+                start_date = start
             else:
-                start_date = self.start_datetime.replace(tzinfo=None)
-            if end is not None:
-                if isinstance(end, str):
-                    end_date = parser.parse(end)
-                elif isinstance(end, datetime):
-                    end_date = end
-                else:
-                    raise ValueError(
-                        f"End argument ({end}) is not a valid datetime ({type(end)})"
-                    )
-                end_date = end_date.replace(tzinfo=None)
+                raise ValueError(
+                    f"Start argument ({start}) is not a valid datetime ({type(start)})"
+                )
+            start_date = start_date.replace(tzinfo=None, hour=0, minute=0, second=0)
+        # otherwise use default data
+        else:
+            start_date = self.start_datetime.replace(tzinfo=None)
+        if end is not None:
+            if isinstance(end, str):
+                end_date = parser.parse(end)
+            elif isinstance(end, datetime):
+                end_date = end
             else:
-                end_date = datetime.utcnow()
+                raise ValueError(
+                    f"End argument ({end}) is not a valid datetime ({type(end)})"
+                )
+            end_date = end_date.replace(tzinfo=None)
+        else:
+            end_date = datetime.utcnow()
 
-            # generate range
-            date_range = create_intervals(
-                start_date, end_date, interval=7, round_days=True
-            )
+        # generate range
+        date_range = create_intervals(start_date, end_date, interval=7, round_days=True)
 
-            # retrieve data accordingly
-            for dates in date_range:
-                cycle_params = {
-                    "start": whoop_time_str(dates[0]),
-                    "end": whoop_time_str(dates[1]),
-                }
-                json_data = self.pull_api(
-                    self._create_url("cycles"), params=cycle_params
-                )
+        # retrieve data accordingly
+        def pull_window(dates):
+            cycle_params = {
+                "start": whoop_time_str(dates[0]),
+                "end": whoop_time_str(dates[1]),
+            }
+            return self.pull_api(self._create_url("cycles"), params=cycle_params)
 
-                results.append(json_data)
-        else:
-            raise RuntimeError("Please run the authorization function first")
+        for _, result, error in self._iter_crawl(pull_window, date_range, progress):
+            if error is not None:
+                raise error
+            yield result
 
-        # return all data
-        return results
+    def get_keydata_raw(self, start=None, end=None, progress=None):
+        """Retrieves all data as array of raw jsons from the creation time of the user.
+
+        The 7 day windows are retrieved concurrently, `progress` is called with the number of
+        finished and total windows.
+        """
+        return list(self.iter_keydata_raw(start, end, progress))
 
-    def get_keydata(self, raw_data=None, start=None, end=None):
+    def get_keydata(self, raw_data=None, start=None, end=None, progress=None):
         """
         This function returns a dataframe of WHOOP metrics for each day of WHOOP membership.
         In the resulting dataframe, each day is a row and contains strain, recovery, and sleep information
+
+        The windows are flattened in batches as they arrive, so only the flat frames are kept in memory.
         """
-        # retrieve all raw data and convert to dataframes
+        # retrieve all raw data and convert it batch by batch to flat frames
         if raw_data is None:
-            raw_data = self.get_keydata_raw(start, end)
-        df_data = [pd.json_normalize(data) for data in raw_data]
-        all_data = pd.concat(df_data)
+            raw_data = self.iter_keydata_raw(start, end, progress)
+        frames, batch = [], []
+        for data in raw_data:
+            batch.extend(data)
+            if len(batch) >= KEYDATA_BATCH:
+                frames.append(_keydata_frame(batch))
+                batch = []
+        if batch:
+            frames.append(_keydata_frame(batch))
 
         # check length
-        if len(all_data) == 0:
+        if len(frames) == 0:
             return None
-
-        # update the dataframe
-        all_data.reset_index(drop=True, inplace=True)
-
-        # fixing the day column so it's not a list
-        all_data["days"] = all_data["days"].map(lambda d: d[0])
-        all_data.rename(columns={"days": r"day"}, inplace=True)
+        all_data = pd.concat(frames, ignore_index=True)
 
         # Putting all time into minutes instead of milliseconds
         sleep_cols = [
@@ -321,33 +527,11 @@ class WhoopClient:
             "needBreakdown.total",
         ]
         for sleep_col in sleep_cols:
-            if sleep_col in all_data.columns:
-                all_data["sleep." + sleep_col] = (
-                    all_data["sleep." + sleep_col]
-                    .astype(float)
-                    .apply(lambda x: np.nan if np.isnan(x) else x / 60000)
-                )
+            col = "sleep." + sleep_col
+            if col in all_data.columns:
+                all_data[col] = pd.to_numeric(all_data[col], errors="coerce") / 60000
             else:
-                all_data["sleep." + sleep_col] = np.nan
-
-        # Making nap variable
-        all_data["nap_duration"] = all_data["sleep.naps"].apply(
-            lambda x: x[0]["qualityDuration"] / 60000
-            if len(x) == 1
-            else (
-                sum(
-                    [
-                        y["qualityDuration"]
-                        for y in x
-                        if y["qualityDuration"] is not None
-                    ]
-                )
-                / 60000
-                if len(x) > 1
-                else 0
-            )
-        )
-        all_data.drop(["sleep.naps"], axis=1, inplace=True)
+                all_data[col] = np.nan
 
         # dropping duplicates subsetting because of list columns
         all_data.drop_duplicates(subset=["day", "sleep.id"], inplace=True)
@@ -358,21 +542,19 @@ class WhoopClient:
         """Retrieve a list of all sports"""
         sports = self.pull_api(self._create_url("sports", user=False))
         sport_dict = {sport["id"]: sport["name"] for sport in sports}
-        self.sport_dict = self.sport_dict
+        self.sport_dict = sport_dict
         return sport_dict
 
-    def _apply_zone(self, item: Dict[str, float], zone: int):
-        if item is None or zone not in item:
-            return None
-        return item[zone] / 60000.0
-
     def get_activities(
-        self, all_data=None, update_sport_dict=False, start=None, end=None
+        self, all_data=None, update_sport_dict=False, start=None, end=None, epoch_times=False
     ):
         """
         Activity data is pulled through the get_keydata functions so if the data pull is present, this function
         just transforms the activity column into a dataframe of activities, where each activity is a row.
         If it has not been pulled, this function runs the key data function then returns the activity dataframe
+
+        If `epoch_times` is set, the `during` columns are kept as int64 UTC epoch milliseconds.
+        `day` is the UTC date of the start (as before), `local_day` the date in the timezone of the activity.
         """
         # pull data from all activities that have been logged so far
         if self.sport_dict and update_sport_dict is False:
@@ -388,48 +570,32 @@ class WhoopClient:
             else:
                 data = self.get_keydata(start=start, end=end)
 
-            # ensure data has the right format
-            if data["strain.workouts"].dtype == "object":
-                data["strain.workouts"] = data["strain.workouts"].apply(
-                    lambda x: eval(str(x))
-                )
-
-            # retrieve the data
-            data = data[data["strain.workouts"].apply(len) > 0]
-            data = data.explode("strain.workouts")
-            # data["strain.workouts"] = pd.json_normalize(data["strain.workouts"])
-            # act_data = data["strain.workouts"].apply(pd.Series)
-            act_data = pd.json_normalize(data["strain.workouts"])
-            # act_data["day"] = data["day"]
+            # flatten the workouts of all days once
+            workouts = _flatten_workouts(data["strain.workouts"])
 
             # check if there is data
-            if len(data) == 0:
+            if len(workouts) == 0:
                 return None
-
-            # update the data
-            act_data[["during.upper", "during.lower"]] = act_data[
-                ["during.upper", "during.lower"]
-            ].apply(pd.to_datetime)
-            act_data["total_minutes"] = act_data.apply(
-                lambda x: (x["during.upper"] - x["during.lower"]).total_seconds()
-                / 60.0,
-                axis=1,
+            act_data = pd.json_normalize(workouts)
+
+            # update the data (times of all activities are parsed at once)
+            act_data = _normalize_during(act_data, epoch_times, day=True)
+            zones = _zone_minutes(act_data["zones"]) if "zones" in act_data else None
+            for z in range(ZONES):
+                act_data[f"zone{z + 1}_minutes"] = zones[:, z] if zones is not None else np.nan
+            act_data["sport_name"] = pd.Categorical(
+                act_data["sportId"].map(sport_dict),
+                categories=pd.unique(pd.Series(list(sport_dict.values()), dtype=object)),
             )
-            for z in range(0, 6):
-                act_data["zone{}_minutes".format(z + 1)] = act_data["zones"].apply(
-                    lambda x: self._apply_zone(x, z)
-                )
-            act_data["sport_name"] = act_data.sportId.apply(lambda x: sport_dict[x])
 
-            act_data["day"] = act_data["during.lower"].dt.strftime(DATE_FORMAT)
-            act_data.drop(["zones", "during.bounds"], axis=1, inplace=True)
+            act_data.drop(["zones", "during.bounds"], axis=1, inplace=True, errors="ignore")
             act_data.drop_duplicates(inplace=True)
             self.all_activities = act_data
             return act_data
         else:
             raise RuntimeError("Please run the authorization function first")
 
-    def get_sleep(self, all_data=None, start=None, end=None):
+    def get_sleep(self, all_data=None, start=None, end=None, progress=None):
         """
         This function returns all sleep metrics in a data frame, for the duration of user's WHOOP membership.
         Each row in the data frame represents one night of sleep
@@ -444,13 +610,10 @@ class WhoopClient:
             # getting all the sleep ids
             sleep_ids = data["sleep.id"].values.tolist()
             sleep_list = [int(x) for x in sleep_ids if pd.isna(x) is False]
-            all_sleep = pd.DataFrame()
-            for s in sleep_list:
-                m = self.pull_sleep_main(s)
-                all_sleep = pd.concat([all_sleep, m])
-
-            if len(all_sleep) == 0:
+            sleeps = [sleep for _, sleep in self._iter_sleeps(sleep_list, progress)]
+            if len(sleeps) == 0:
                 return None
+            all_sleep = pd.json_normalize(sleeps)
 
             # Cleaning sleep data
             sleep_update = [
@@ -474,13 +637,9 @@ class WhoopClient:
 
             for col in sleep_update:
                 if col in all_sleep.columns:
-                    all_sleep[col] = (
-                        all_sleep[col]
-                        .astype(float)
-                        .apply(lambda x: np.nan if np.isnan(x) else x / 60000)
-                    )
+                    all_sleep[col] = all_sleep[col].astype(float) / 60000
                 else:
-                    all_data[col] = np.nan
+                    all_sleep[col] = np.nan
 
             for col in ["during.bounds", "events"]:
                 if col in all_sleep:
@@ -489,12 +648,22 @@ class WhoopClient:
         else:
             raise RuntimeError("Please run the authorization function first")
 
-    def get_sleep_events_all(self, all_data=None, all_sleep=None, start=None, end=None):
+    def get_sleep_events_all(
+        self,
+        all_data=None,
+        all_sleep=None,
+        start=None,
+        end=None,
+        epoch_times=False,
+        progress=None,
+    ):
         """
         This function returns all sleep events in a data frame, for the duration of user's WHOOP membership.
         Each row in the data frame represents an individual sleep event within an individual night of sleep.
         Sleep events can be joined against the sleep or main datasets by sleep id.
         All sleep times are returned in minutes.
+
+        If `epoch_times` is set, the `during` columns are kept as int64 UTC epoch milliseconds.
         """
         if self.auth_token:
             # check for previous data
@@ -523,30 +692,22 @@ class WhoopClient:
             else:
                 sleep_ids = data["sleep.id"].values.tolist()
                 sleep_list = [int(x) for x in sleep_ids if pd.isna(x) == False]
-                all_sleep_events = pd.DataFrame()
-                for s in sleep_list:
-                    events = self.pull_sleep_events(s)
-                    all_sleep_events = pd.concat([all_sleep_events, events])
-
-            # Cleaning sleep events data
-            all_sleep_events["during.lower"] = pd.to_datetime(
-                all_sleep_events["during.lower"]
-            )
-            all_sleep_events["during.upper"] = pd.to_datetime(
-                all_sleep_events["during.upper"]
-            )
+
+                # collect the events of each sleep as it arrives and parse them at once
+                events = []
+                for sleep_id, sleep in self._iter_sleeps(sleep_list, progress):
+                    events.extend(dict(event, id=sleep_id) for event in sleep["events"])
+                all_sleep_events = pd.json_normalize(events)
+
+            # Cleaning sleep events data (times of all events are parsed at once)
             all_sleep_events.drop(["during.bounds"], axis=1, inplace=True)
-            all_sleep_events["total_minutes"] = all_sleep_events.apply(
-                lambda x: (x["during.upper"] - x["during.lower"]).total_seconds()
-                / 60.0,
-                axis=1,
-            )
+            all_sleep_events = _normalize_during(all_sleep_events, epoch_times)
 
             return all_sleep_events
         else:
             raise RuntimeError("Please run the authorization function first")
 
-    def get_hr(self, df=False, start=None, end=None):
+    def get_hr(self, df=False, start=None, end=None, progress=None, compact=False):
         """
         This function will pull every heart rate measurement recorded for the life of WHOOP membership.
         The default return for this function is a list of lists, where each "row" contains the date, time, and hr value.
@@ -554,53 +715,55 @@ class WhoopClient:
 
         To return a dataframe, set df=True. This will take a bit longer, but will return a data frame.
 
+        With `compact=True` the samples are kept as int64 epoch milliseconds and uint8 bpm (see
+        `whoopy.heart_rate`), returned as structured array or (with df=True) as frame with a
+        DatetimeIndex. This needs less than 10 bytes per sample instead of a python row each.
+
         NOTE: This api pull takes about 6 seconds per week of data ... or 1 minutes for 10 weeks of data,
-        so be careful when you pull, it may take a while.
+        so be careful when you pull, it may take a while. The windows are pulled concurrently
+        (see `max_workers`), `progress` is called with the number of finished and total windows.
         """
         if self.start_datetime:
             # generate date range
             date_range = create_intervals(start, end, interval=6, round_days=True)
 
-            # create request for date range
-            hr_list = []
-            for dates in date_range:
+            # create request for date range (decoded in the worker to drop the json early)
+            def pull_window(dates):
                 params = {
                     "start": whoop_time_str(dates[0]),
                     "end": whoop_time_str(dates[1]),
                     "order": "t",
                     "step": 6,
                 }
-                try:
-                    hr_vals = self.pull_api(
-                        self._create_url("metrics/heart_rate"), params=params
-                    )["values"]
-                except IOError:
+                return decode_samples(
+                    self.pull_api(self._create_url("metrics/heart_rate"), params=params)[
+                        "values"
+                    ]
+                )
+
+            hr = HeartRateBuffer()
+            for dates, samples, error in self._iter_crawl(pull_window, date_range, progress):
+                if error is not None:
                     print(f"Unable to pull data from {dates[0]} to {dates[1]}")
                     logging.warning(
                         f"Unable to pull data from {dates[0]} to {dates[1]}"
                     )
                     continue
-                hr_values = [
-                    [
-                        datetime.utcfromtimestamp(h["time"] / 1e3).date(),
-                        datetime.utcfromtimestamp(h["time"] / 1e3).time(),
-                        h["data"],
-                    ]
-                    for h in hr_vals
-                ]
-                hr_list.extend(hr_values)
+                hr.append(*samples)
 
             # check length
-            if len(hr_list) == 0:
+            if len(hr) == 0:
                 return None
 
             # check conversion
+            if compact:
+                return hr.to_frame() if df else hr.to_records()
+            times = hr.times.astype("datetime64[ms]").astype(datetime)
+            dates = [t.date() for t in times]
+            clock = [t.time() for t in times]
             if df:
-                hr_df = pd.DataFrame(hr_list)
-                hr_df.columns = ["date", "time", "hr"]
-                hr_df = hr_df.reset_index()[["date", "time", "hr"]]
-                return hr_df
+                return pd.DataFrame({"date": dates, "time": clock, "hr": hr.bpm.astype(np.int64)})
             else:
-                return hr_list
+                return [list(row) for row in zip(dates, clock, hr.bpm.tolist())]
         else:
             raise RuntimeError("Please run the authorization function first")
@@ -0,0 +1,114 @@
+"""Concurrent crawling of many small requests (e.g. time windows or ids).
+
+Items are fetched on a thread pool with retries, while the results are returned in the order of
+the items. Only a bounded number of items is in flight, so results can be consumed (e.g. parsed)
+while the remaining items are still downloading.
+
+Copyright (c) 2022 Felix Geilert
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import random
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def _attempt(fetch: Callable[[T], R], item: T, retries: int, backoff: float) -> R:
+    """Fetches the item and retries it with jittered exponential backoff."""
+    attempt = 0
+    while True:
+        try:
+            return fetch(item)
+        except Exception as ex:
+            if attempt >= retries:
+                raise
+            delay = random.uniform(0, backoff * 2**attempt)
+            logging.warning(f"Fetching {item} failed ({ex}), retrying in {delay:.2f}s")
+            attempt += 1
+            time.sleep(delay)
+
+
+def iter_crawl(
+    fetch: Callable[[T], R],
+    items: Iterable[T],
+    workers: int = 4,
+    retries: int = 2,
+    backoff: float = 0.5,
+    progress: Callable[[int, int], None] = None,
+    prefetch: int = None,
+) -> Iterator[Tuple[T, Optional[R], Optional[Exception]]]:
+    """Fetches the items concurrently and iterates the results in the order of the items.
+
+    Args:
+        fetch (Callable[[T], R]): Function that fetches a single item.
+        items (Iterable[T]): The items to fetch.
+        workers (int, optional): Number of concurrent fetches. Defaults to 4.
+        retries (int, optional): Retries of a failing item. Defaults to 2.
+        backoff (float, optional): Base delay of the retries in seconds. Defaults to 0.5.
+        progress (Callable[[int, int], None], optional): Called with the number of finished and total items.
+        prefetch (int, optional): Maximum number of items in flight. Defaults to twice the workers.
+
+    Yields:
+        Tuple[T, Optional[R], Optional[Exception]]: The item, its result and the error (if it failed).
+    """
+    if workers < 1:
+        raise ValueError("workers must be at least 1.")
+    items = list(items)
+    prefetch = max(prefetch or 2 * workers, 1)
+    total, done = len(items), 0
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="whoopy-crawl") as executor:
+        pending = deque()
+        queued = iter(items)
+
+        def submit():
+            for item in queued:
+                pending.append((item, executor.submit(_attempt, fetch, item, retries, backoff)))
+                return
+
+        # fill the queue of items in flight
+        for _ in range(prefetch):
+            submit()
+
+        while pending:
+            item, fut = pending.popleft()
+            try:
+                result, error = fut.result(), None
+            except Exception as ex:
+                result, error = None, ex
+            submit()
+
+            done += 1
+            if progress is not None:
+                progress(done, total)
+            yield item, result, error
+
+
+def crawl(
+    fetch: Callable[[T], R],
+    items: Iterable[T],
+    workers: int = 4,
+    retries: int = 2,
+    backoff: float = 0.5,
+    progress: Callable[[int, int], None] = None,
+) -> Tuple[List[Optional[R]], Dict[int, Exception]]:
+    """Fetches the items concurrently (see `iter_crawl`).
+
+    Returns:
+        Tuple[List[Optional[R]], Dict[int, Exception]]: The results in the order of the items
+            (None where an item failed) and the errors keyed by the position of the item.
+    """
+    results, errors = [], {}
+    for i, (_, result, error) in enumerate(
+        iter_crawl(fetch, items, workers, retries, backoff, progress)
+    ):
+        if error is not None:
+            errors[i] = error
+        results.append(result)
+    return results, errors
@@ -0,0 +1,117 @@
+"""Builds DataFrames directly from the raw record pages of the Whoop API.
+
+Instead of parsing every record into a pydantic model, dumping it back into a dict and flattening it
+with `pd.json_normalize`, the values are written straight into preallocated typed column arrays using
+the static flattened schema of the model (see `models_v1.flatten_fields`).
+
+Copyright (c) 2022 Felix Geilert
+"""
+
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Tuple, Type
+
+import numpy as np
+import pandas as pd
+
+from whoopy.models import models_v1 as models
+from whoopy.handlers.timestamps import OFFSET_COLUMN, local_time, normalize_page
+
+
+EMPTY: Dict = {}
+
+
+@lru_cache(maxsize=None)
+def column_schema(
+    model: Type[models.UserData],
+) -> Tuple[Tuple[str, ...], Tuple[Tuple[int, str, str, type], ...]]:
+    """Generates the column plan of the model.
+
+    Returns:
+        The nested paths of the model (parents before children, e.g. `score` and `score.stage_summary`)
+        and for every column the index of its parent path, its key in the parent, its name and its type.
+    """
+    parents, columns = [""], []
+    for name, tp in models.flatten_fields(model):
+        parent, _, key = name.rpartition(".")
+        # register the parent paths top down
+        parts = parent.split(".") if parent else []
+        for i in range(1, len(parts) + 1):
+            path = ".".join(parts[:i])
+            if path not in parents:
+                parents.append(path)
+        columns.append((parents.index(parent), key, name, tp))
+    return tuple(parents), tuple(columns)
+
+
+def records_to_df(
+    records: List[Dict],
+    model: Type[models.UserData],
+    correct_offset: bool = True,
+    time_key: str = None,
+    time_index: bool = False,
+    epoch_times: bool = False,
+) -> pd.DataFrame:
+    """Converts the raw records of the API into a DataFrame with the flattened columns of the model.
+
+    Args:
+        records (List[Dict]): The raw records (as returned by the API).
+        model (Type[models.UserData]): The model of the records.
+        correct_offset (bool, optional): Shift the times into the local time of each record. Defaults to True.
+        time_key (str, optional): Column to sort the frame by (ascending). Defaults to None (API order).
+        time_index (bool, optional): Use the (sorted) `time_key` column as DatetimeIndex. Defaults to False.
+        epoch_times (bool, optional): Keep the times as int64 UTC epoch milliseconds and add the int16
+            offset minutes (see `timestamps.with_local_times` to derive local times). Defaults to False.
+
+    Returns:
+        pd.DataFrame: The frame (columns named like `score.stage_summary.total_in_bed_time_milli`).
+    """
+    parents, columns = column_schema(model)
+    n = len(records)
+
+    # resolve the nested dicts of all records once per path (empty if missing)
+    nodes = {"": records}
+    for parent in parents[1:]:
+        base, _, key = parent.rpartition(".")
+        nodes[parent] = [d.get(key) or EMPTY for d in nodes[base]]
+    nodes = [nodes[p] for p in parents]
+
+    # fill the preallocated typed columns (missing values become nan/None)
+    data = {}
+    for parent, key, name, tp in columns:
+        values = [d.get(key) for d in nodes[parent]]
+        if tp is int or tp is float:
+            # integer columns with missing values are stored as floats (like pandas does)
+            exact = tp is int and None not in values
+            arr = np.empty(n, dtype=np.int64 if exact else np.float64)
+            arr[:] = values
+        elif tp is datetime:
+            # parsed for the whole page below
+            continue
+        else:
+            arr = np.empty(n, dtype=object)
+            arr[:] = values
+            if tp is bool and None not in values:
+                arr = arr.astype(bool)
+        data[name] = arr
+
+    # normalize all times of the page in one pass (and shift them into local time)
+    time_cols = [name for _, _, name, tp in columns if tp is datetime]
+    times = normalize_page(records, time_cols)
+    offsets = times[OFFSET_COLUMN] if correct_offset else None
+    for name in time_cols:
+        if epoch_times:
+            data[name] = times[name]
+        else:
+            data[name] = local_time(times[name], offsets).astype("datetime64[us]")
+
+    # keep the column order of the schema
+    data = {name: data[name] for _, _, name, _ in columns}
+    if epoch_times:
+        data[OFFSET_COLUMN] = times[OFFSET_COLUMN]
+    df = pd.DataFrame(data, copy=False)
+    if time_key is not None:
+        df = df.sort_values(time_key, kind="stable", ignore_index=True)
+        if time_index:
+            df.index = pd.DatetimeIndex(df[time_key].values.astype("datetime64[ms]"))
+    return df
@@ -3,13 +3,226 @@
 Copyright (c) 2022 Felix Geilert
 """
 
-from typing import Any, Dict, List, Tuple, Type
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import hashlib
+import heapq
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Type
 
 import pandas as pd
 import requests
 import time_helper as th
 
 from whoopy.models import models_v1 as models
+from whoopy.handlers.frames_v1 import records_to_df
+from whoopy.handlers.timestamps import (  # noqa: F401 (re-exported)
+    OFFSET_COLUMN,
+    local_day,
+    local_time,
+    normalize_frame,
+    normalize_page,
+    with_local_times,
+)
+
+
+def _utc_naive(date: Any) -> datetime:
+    """Converts the given date into a naive datetime in UTC."""
+    date = th.any_to_datetime(date)
+    if date is None:
+        raise ValueError("Invalid Date provided")
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    return date
+
+
+class ResponseCache:
+    """Cache for GET responses of the Whoop API.
+
+    Responses are kept in an in-memory LRU that is bounded by the size of the bodies and optionally
+    in an on-disk tier that survives restarts. Each endpoint has its own time to live (matched by the
+    longest path prefix). Once an entry is stale it is revalidated with `ETag`/`Last-Modified` if the
+    server provided them, otherwise it is fetched again.
+
+    Note: Entries are keyed by url and params only, so a cache should not be shared between users
+    (unless a distinct `namespace` is used per user).
+    """
+
+    # default time to live (in seconds) per endpoint prefix
+    DEFAULT_TTLS = {
+        "user/profile/basic": 3600,
+        "user/body_measurements": 3600,
+        "": 300,
+    }
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttls: Dict[str, float] = None,
+        disk_path: str = None,
+        namespace: str = "",
+    ):
+        """Creates a new response cache.
+
+        Args:
+            max_bytes (int, optional): Maximum size of the cached bodies held in memory. Defaults to 32 MiB.
+            ttls (Dict[str, float], optional): Time to live (in seconds) per endpoint prefix
+                (e.g. `{"cycle": 60}`). Updates the `DEFAULT_TTLS`. Defaults to None.
+            disk_path (str, optional): Directory of the on-disk tier. Defaults to None (memory only).
+            namespace (str, optional): Prefix of all keys (e.g. the user id). Defaults to "".
+        """
+        self.max_bytes = max_bytes
+        self.ttls = {**self.DEFAULT_TTLS, **(ttls or {})}
+        self.disk_path = disk_path
+        self.namespace = namespace
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "disk_hits": 0, "evictions": 0}
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if disk_path:
+            os.makedirs(disk_path, exist_ok=True)
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def ttl(self, path: str) -> float:
+        """Returns the time to live of the endpoint (longest matching prefix)."""
+        prefix = max((p for p in self.ttls if path.startswith(p)), key=len, default="")
+        return self.ttls.get(prefix, 0)
+
+    def _key(self, url: str, params: Optional[dict]) -> str:
+        params = sorted((params or {}).items())
+        return hashlib.sha1(f"{self.namespace}|{url}|{params}".encode("utf-8")).hexdigest()
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        if not self.disk_path:
+            return None
+
+        # check the disk tier
+        try:
+            with open(os.path.join(self.disk_path, key + ".json"), "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        entry["content"] = entry["content"].encode("latin-1")
+        self._count("disk_hits")
+        self._store(key, entry, write_disk=False)
+        return entry
+
+    def _store(self, key: str, entry: Dict[str, Any], write_disk: bool = True):
+        size = len(entry["content"])
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old["content"])
+
+            # only keep the entry in memory if it fits
+            if size <= self.max_bytes:
+                self._entries[key] = entry
+                self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, old = self._entries.popitem(last=False)
+                self._bytes -= len(old["content"])
+                self.stats["evictions"] += 1
+
+        if write_disk and self.disk_path:
+            tmp = os.path.join(self.disk_path, f"{key}.{threading.get_ident()}.tmp")
+            with open(tmp, "w") as f:
+                json.dump({**entry, "content": entry["content"].decode("latin-1")}, f)
+            os.replace(tmp, os.path.join(self.disk_path, key + ".json"))
+
+    @staticmethod
+    def _response(entry: Dict[str, Any], url: str) -> requests.Response:
+        res = requests.Response()
+        res.status_code = entry["status"]
+        res.headers.update(entry["headers"])
+        res._content = entry["content"]
+        res.url = url
+        return res
+
+    def get(
+        self,
+        path: str,
+        url: str,
+        params: Optional[dict],
+        send: Callable[[Dict[str, str]], requests.Response],
+    ) -> requests.Response:
+        """Returns the cached response for the request or sends it through `send(headers)`.
+
+        Args:
+            path (str): Endpoint path relative to the API base (used to select the TTL).
+            url (str): Full url of the request.
+            params (dict, optional): Query parameters of the request.
+            send (Callable): Sends the request with the given additional headers.
+        """
+        key = self._key(url, params)
+        entry = self._load(key)
+        now = time.time()
+        if entry is not None and entry["expires"] > now:
+            self._count("hits")
+            return self._response(entry, url)
+
+        # revalidate stale entries (if the server provided validators)
+        headers = {}
+        if entry is not None:
+            if "ETag" in entry["headers"]:
+                headers["If-None-Match"] = entry["headers"]["ETag"]
+            if "Last-Modified" in entry["headers"]:
+                headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+        res = send(headers)
+        expires = now + self.ttl(path)
+        if res.status_code == 304 and entry is not None:
+            self._count("revalidated")
+            self._store(key, {**entry, "expires": expires})
+            return self._response(entry, url)
+
+        # store successful responses
+        self._count("misses")
+        if res.status_code == 200 and self.ttl(path) > 0:
+            validators = {
+                k: res.headers[k] for k in ("ETag", "Last-Modified", "Content-Type") if k in res.headers
+            }
+            self._store(
+                key,
+                {"status": 200, "headers": validators, "content": res.content, "expires": expires},
+            )
+        return res
+
+    def clear(self):
+        """Removes all entries from memory (the disk tier is kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+class WhoopAPIError(Exception):
+    """Raised when the Whoop API answers with an error (after all retries).
+
+    Attributes:
+        status_code (int): The status code of the response.
+        response (requests.Response): The failed response.
+        next_token (str): Token of the page that failed (pass as `next` to resume the collection).
+        partial (list): The records of the collection that were retrieved before the error.
+    """
+
+    def __init__(
+        self, message: str, status_code: int = None, response: requests.Response = None, next_token: str = None
+    ):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = response
+        self.next_token = next_token
+        self.partial = None
 
 
 class WhoopHandler:
@@ -26,9 +239,26 @@ class WhoopHandler:
         return new_date.isoformat() + "Z"
 
     def _get(self, path: str, params: dict = None, **kwargs) -> requests.Response:
-        """Sends a GET request to the Whoop API."""
-        path = f"{self.client._base_path}/{path}"
-        return self.client.session.get(path, params=params, **kwargs)
+        """Sends a GET request to the Whoop API (through the response cache of the client if set)."""
+        url = f"{self.client._base_path}/{path}"
+        scheduler = getattr(self.client, "scheduler", None)
+
+        # renew the token if it is about to expire
+        ensure_token = getattr(self.client, "ensure_token", None)
+        if ensure_token is not None:
+            ensure_token()
+
+        def send(headers: Dict[str, str] = None) -> requests.Response:
+            def request() -> requests.Response:
+                return self.client.session.get(url, params=params, headers=headers, **kwargs)
+
+            # queue the request within the rate limit of the client (with retries)
+            return scheduler.send(request) if scheduler is not None else request()
+
+        cache = getattr(self.client, "cache", None)
+        if cache is None:
+            return send()
+        return cache.get(path, url, params, send)
 
     def _post(self, path: str, data: dict = None, **kwargs) -> requests.Response:
         """Sends a POST request to the Whoop API."""
@@ -38,7 +268,9 @@ class WhoopHandler:
     def _verify(self, res: requests.Response) -> Dict[str, Any]:
         """Verifies the response from the Whoop API."""
         if res.status_code != 200:
-            raise Exception(f"Whoop API returned status code {res.status_code}.")
+            raise WhoopAPIError(
+                f"Whoop API returned status code {res.status_code}.", res.status_code, res
+            )
         return res.json()
 
 
@@ -65,17 +297,39 @@ class WhoopDataHandler(WhoopHandler):
     Note: '@' symbol is used in the paths to indicate split point for id
     """
 
+    # number of pages a shard should roughly hold before it is split further
+    SHARD_PAGES = 4
+    # maximum number of sub-windows a shard is split into at once (the estimate of sparse pages is rough)
+    SHARD_SPLIT = 8
+
     def __init__(
         self,
         client: Any,
         path: str,
         model: Type[models.UserData],
         path_single: str = None,
+        id_key: str = "id",
+        time_key: str = "start",
+        validate: bool = True,
     ) -> None:
+        """Creates the handler.
+
+        Args:
+            validate (bool, optional): Validate the API payloads through pydantic. Set to False to trust the
+                payloads of the API and build the models without validation (faster on pydantic v1, but
+                malformed payloads are not detected). Defaults to True.
+        """
         super().__init__(client)
         self._path = path
         self._path_single = path_single or path + "/@"
         self._model = model
+        self._id_key = id_key
+        self._time_key = time_key
+        self.validate = validate
+
+    def _parse(self, data: Dict, correct_offset: bool = True) -> models.UserData:
+        """Parses a single record of the API into the model of the handler."""
+        return self._model.from_dict(data, correct_offset=correct_offset, validate=self.validate)
 
     def _get_data(
         self,
@@ -113,13 +367,307 @@ class WhoopDataHandler(WhoopHandler):
 
         return params
 
+    def _single_path(self, id: int) -> str:
+        """Generates the path of a single record."""
+        path = self._path_single.split("@", 1)
+        return f"{path[0]}{id}{path[1] if len(path) > 1 else ''}"
+
     def single(self, id: int, correct_offset: bool = True) -> models.UserData:
         """Gets a single data object from the Whoop API."""
-        path = self._path_single.split("@", 1)
-        path = f"{path[0]}{id}{path[1] if len(path) > 1 else ''}"
-        res = self._get(path)
+        res = self._get(self._single_path(id))
         data = self._verify(res)
-        return self._model.from_dict(data, correct_offset=correct_offset)
+        return self._parse(data, correct_offset)
+
+    def single_many(
+        self, ids: Iterable[int], correct_offset: bool = True, max_concurrency: int = None
+    ) -> Tuple[List[Optional[models.UserData]], Dict[int, Exception]]:
+        """Gets multiple single data objects from the Whoop API concurrently.
+
+        Requests go through the rate limit and response cache of the client. A failing id does not
+        abort the others. Ids are not deduplicated (each position of `ids` is requested and reported).
+
+        Args:
+            ids (Iterable[int]): The ids of the records (cycle ids for recoveries).
+            correct_offset (bool, optional): Shift the times into the local time of the record. Defaults to True.
+            max_concurrency (int, optional): Maximum number of concurrent requests.
+                Defaults to `max_workers` of the client.
+
+        Returns:
+            Tuple[List[Optional[models.UserData]], Dict[int, Exception]]: The records in the order of `ids`
+                (None where the request failed) and the errors keyed by the position in `ids`.
+        """
+        ids = list(ids)
+        max_concurrency = max_concurrency or getattr(self.client, "max_workers", 4)
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+        if not ids:
+            return [], {}
+
+        results, errors = [None] * len(ids), {}
+        workers = min(max_concurrency, len(ids))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="whoopy-single") as executor:
+            futures = [executor.submit(self.single, id, correct_offset) for id in ids]
+            for i, fut in enumerate(futures):
+                try:
+                    results[i] = fut.result()
+                except Exception as ex:
+                    errors[i] = ex
+        return results, errors
+
+    def _iter_raw(
+        self,
+        start: str = None,
+        end: str = None,
+        next: str = None,
+        limit: int = 25,
+        get_all_pages: bool = True,
+    ) -> Iterator[Tuple[List[Dict], str]]:
+        """Iterates the raw record pages of the collection and the token that follows each page.
+
+        Raises:
+            WhoopAPIError: If a page fails (its `next_token` allows to resume the chain at that page).
+        """
+        while True:
+            try:
+                recs, next = self._get_data(self._path, start, end, next, limit)
+            except WhoopAPIError as err:
+                err.next_token = next
+                raise
+            yield recs, next
+
+            # stop after the first page or when the chain is exhausted
+            if not get_all_pages or not next:
+                return
+
+    def iter_pages(
+        self,
+        start: str = None,
+        end: str = None,
+        next: str = None,
+        limit: int = 25,
+        get_all_pages: bool = True,
+        correct_offset: bool = True,
+    ) -> Iterator[Tuple[List[models.UserData], str]]:
+        """Iterates the collection page by page.
+
+        Yields:
+            Tuple[List[models.UserData], str]: The records of the page and the token of the next page
+                (which can be passed as `next` to resume the iteration).
+        """
+        for recs, token in self._iter_raw(start, end, next, limit, get_all_pages):
+            yield [self._parse(c, correct_offset) for c in recs], token
+
+    def iter_records(
+        self,
+        start: str = None,
+        end: str = None,
+        next: str = None,
+        limit: int = 25,
+        get_all_pages: bool = True,
+        correct_offset: bool = True,
+    ) -> Iterator[models.UserData]:
+        """Iterates the collection record by record (only one page is held in memory)."""
+        for items, _ in self.iter_pages(start, end, next, limit, get_all_pages, correct_offset):
+            yield from items
+
+    def iter_df(
+        self,
+        start: str = None,
+        end: str = None,
+        next: str = None,
+        limit: int = 25,
+        get_all_pages: bool = True,
+        correct_offset: bool = True,
+        chunk_rows: int = 1000,
+    ) -> Iterator[pd.DataFrame]:
+        """Iterates the collection as DataFrames of at most `chunk_rows` rows."""
+        if chunk_rows < 1:
+            raise ValueError("chunk_rows must be at least 1.")
+
+        chunk = []
+        for item in self.iter_records(start, end, next, limit, get_all_pages, correct_offset):
+            chunk.append(item)
+            if len(chunk) >= chunk_rows:
+                yield self._to_df(chunk)
+                chunk = []
+        if chunk:
+            yield self._to_df(chunk)
+
+    def _check_sharding(self, next: str, get_all_pages: bool):
+        if next is not None or not get_all_pages:
+            raise ValueError("Sharded crawling does not support `next` or single pages.")
+
+    def _crawl_shard(
+        self, start: datetime, end: datetime, limit: int, executor: Executor
+    ) -> Tuple[List[Dict], List[Future]]:
+        """Crawls a single time window of the collection.
+
+        The first page is used to estimate the record density of the window. If the rest of the window
+        is expected to hold more than `SHARD_PAGES` pages, it is split into (at most `SHARD_SPLIT`)
+        sub-windows that are submitted to the executor instead of following the (serial) page chain.
+
+        Returns:
+            Tuple[List[Dict], List[Future]]: The raw records (newest first) and the futures of the sub-windows.
+        """
+        recs, token = self._get_data(self._path, start, end, None, limit)
+        if not token or not recs:
+            return recs, []
+
+        # estimate how many pages remain in the window
+        oldest = models.parse_time(recs[-1][self._time_key])
+        covered = (end - oldest).total_seconds()
+        remaining = (oldest - start).total_seconds()
+        if covered > 0 and remaining > 0:
+            pages = remaining * len(recs) / covered / limit
+            parts = min(int(pages // self.SHARD_PAGES), self.SHARD_SPLIT)
+
+            # split the remainder (include the oldest timestamp, duplicates are removed on merge)
+            if parts >= 2:
+                split_end = oldest + timedelta(milliseconds=1)
+                step = (split_end - start) / parts
+                bounds = [start + step * i for i in range(parts)] + [split_end]
+                children = [
+                    executor.submit(self._crawl_shard, s, e, limit, executor)
+                    for s, e in zip(bounds[:-1], bounds[1:])
+                ]
+                return recs, children
+
+        # follow the page chain of this window
+        for page, _ in self._iter_raw(start, end, token, limit):
+            recs.extend(page)
+        return recs, []
+
+    def _iter_sharded(
+        self, start: str, end: str = None, limit: int = 25, shards: int = 8
+    ) -> Iterator[Dict]:
+        """Crawls the time window in concurrent shards and iterates the raw records (newest first).
+
+        The results of all shards are k-way merged by time and de-duplicated by id.
+        """
+        if shards < 1:
+            raise ValueError("shards must be at least 1.")
+        if start is None:
+            raise ValueError("Sharded crawling requires a start date.")
+        start = _utc_naive(start)
+        end = _utc_naive(end) if end is not None else datetime.utcnow()
+        if end <= start:
+            return
+
+        with ThreadPoolExecutor(max_workers=shards, thread_name_prefix="whoopy-shard") as executor:
+            # split window into equally sized shards (which split further based on density)
+            step = (end - start) / shards
+            bounds = [start + step * i for i in range(shards)] + [end]
+            pending = deque(
+                executor.submit(self._crawl_shard, s, e, limit, executor)
+                for s, e in zip(bounds[:-1], bounds[1:])
+            )
+
+            # wait for all shards (including the ones they spawn)
+            results = []
+            while pending:
+                recs, children = pending.popleft().result()
+                results.append(recs)
+                pending.extend(children)
+
+        # merge all shards by time and drop records returned by multiple shards
+        seen = set()
+        for rec in heapq.merge(*results, key=lambda r: r[self._time_key], reverse=True):
+            if rec[self._id_key] in seen:
+                continue
+            seen.add(rec[self._id_key])
+            yield rec
+
+    def _use_store(self, next: str, get_all_pages: bool) -> bool:
+        """Checks if the request can be answered through the record store of the client."""
+        return getattr(self.client, "store", None) is not None and next is None and get_all_pages
+
+    def _sync_store(
+        self, start: str = None, end: str = None, limit: int = 25, shards: int = None
+    ) -> List[Dict]:
+        """Fetches the missing and newer records of the window into the store and reads it from there."""
+        store = self.client.store
+        user_id = self.client.user_id
+        now = datetime.utcnow()
+        start = _utc_naive(start) if start is not None else datetime(2000, 1, 1)
+        end = _utc_naive(end) if end is not None else now
+
+        # fetch the missing parts from the api
+        for window in store.missing_windows(user_id, self._path, start, end):
+            if shards:
+                recs = self._iter_sharded(window["start"], window["end"], limit, shards)
+            else:
+                recs = (
+                    r for page, _ in self._iter_raw(window["start"], window["end"], None, limit) for r in page
+                )
+            store.upsert(user_id, self._path, recs, self._id_key, self._time_key)
+            store.mark_synced(user_id, self._path, window["start"], min(window["end"], now))
+
+        return store.query(user_id, self._path, start, end)
+
+    def _use_archive(self, next: str, get_all_pages: bool) -> bool:
+        """Checks if the request can be answered through the columnar archive of the client."""
+        return getattr(self.client, "archive", None) is not None and next is None and get_all_pages
+
+    def _archive_df(
+        self,
+        start: str = None,
+        end: str = None,
+        limit: int = 25,
+        correct_offset: bool = True,
+        shards: int = None,
+        columns: List[str] = None,
+    ) -> pd.DataFrame:
+        """Loads the missing parts of the window into the archive and reads the window from it."""
+        from whoopy.storage.parquet_archive import apply_offset
+
+        archive = self.client.archive
+        user_id = self.client.user_id
+        start = _utc_naive(start) if start is not None else datetime(2000, 1, 1)
+        end = _utc_naive(end) if end is not None else datetime.utcnow()
+
+        # archive the missing windows (in UTC)
+        for w_start, w_end in archive.missing_windows(self._path, user_id, start, end):
+            recs, _ = self._raw_collection(w_start, w_end, limit=limit, shards=shards)
+            df = records_to_df(recs, self._model, correct_offset=False)
+            archive.store_window(self._path, user_id, df, self._model, w_start, w_end, self._time_key)
+
+        # read the window (offset is applied on the projected columns)
+        read_cols = columns
+        if columns is not None and correct_offset:
+            read_cols = list(dict.fromkeys(list(columns) + ["timezone_offset"]))
+        df = archive.read(
+            self._path, user_id, start, end, read_cols, self._time_key, self._id_key, self._model
+        )
+        if correct_offset:
+            df = apply_offset(df, ["created_at", "updated_at", "start", "end"])
+        if columns is not None:
+            df = df[list(columns)]
+        return df
+
+    def _raw_collection(
+        self,
+        start: str = None,
+        end: str = None,
+        next: str = None,
+        limit: int = 25,
+        get_all_pages: bool = True,
+        shards: int = None,
+    ) -> Tuple[List[Dict], str]:
+        """Gets the raw records of the collection (through the store or the shards if configured)."""
+        if self._use_store(next, get_all_pages):
+            return self._sync_store(start, end, limit, shards), None
+        if shards:
+            self._check_sharding(next, get_all_pages)
+            return list(self._iter_sharded(start, end, limit, shards)), None
+
+        recs, token = [], None
+        try:
+            for page, token in self._iter_raw(start, end, next, limit, get_all_pages):
+                recs.extend(page)
+        except WhoopAPIError as err:
+            err.partial = recs
+            raise
+        return recs, token
 
     def collection(
         self,
@@ -129,18 +677,29 @@ class WhoopDataHandler(WhoopHandler):
         limit: int = 25,
         get_all_pages: bool = True,
         correct_offset: bool = True,
+        shards: int = None,
     ) -> Tuple[List[models.UserData], str]:
-        """Gets a collection of data from the Whoop API."""
-        recs, token = self._get_data(self._path, start, end, next, limit)
-        items = [self._model.from_dict(c, correct_offset=correct_offset) for c in recs]
-
-        # get more data if there is a next token
-        if get_all_pages:
-            while token:
-                data, token = self.collection(
-                    start=start, end=end, next=token, limit=limit, get_all_pages=False
-                )
-                items.extend(data)
+        """Gets a collection of data from the Whoop API.
+
+        If `shards` is provided, the time window is split into that many sub-windows that are crawled
+        concurrently (requires `start` and all pages).
+
+        If the client has a record store, the records are answered from the store and only the missing
+        or newer part of the window is fetched from the API.
+        """
+        if shards or self._use_store(next, get_all_pages):
+            recs, token = self._raw_collection(start, end, next, limit, get_all_pages, shards)
+            return [self._parse(c, correct_offset) for c in recs], token
+
+        items, token = [], None
+        try:
+            for page, token in self.iter_pages(
+                start, end, next, limit, get_all_pages, correct_offset
+            ):
+                items.extend(page)
+        except WhoopAPIError as err:
+            err.partial = items
+            raise
 
         return items, token
 
@@ -152,12 +711,70 @@ class WhoopDataHandler(WhoopHandler):
         limit: int = 25,
         get_all_pages: bool = True,
         correct_offset: bool = True,
+        shards: int = None,
+        columns: List[str] = None,
+        columnar: bool = False,
+        time_index: bool = False,
+        epoch_times: bool = False,
     ) -> Tuple[pd.DataFrame, str]:
-        """Gets a collection of data from the Whoop API."""
-        recs, token = self.collection(
-            start, end, next, limit, get_all_pages, correct_offset
-        )
-        df = self._to_df(recs)
+        """Gets a collection of data from the Whoop API (see `collection` for sharding and store).
+
+        If the client has a columnar archive, the window is read from the archive and only the parts
+        that are not archived yet are loaded from the API. `columns` limits the columns read from it.
+
+        If `columnar` is set, the raw records are written directly into the columns of the frame
+        (without creating the models), which yields all columns of the flattened schema of the model
+        sorted by time (oldest first). `time_index` additionally sets the (monotonic) time as index.
+
+        `epoch_times` (implies `columnar`) keeps the times as int64 UTC epoch milliseconds with an int16
+        `offset_minutes` column instead of shifting them (see `timestamps.with_local_times`).
+        """
+        columnar = columnar or epoch_times
+        if self._use_archive(next, get_all_pages):
+            read_cols = columns
+            if columnar and columns is not None:
+                read_cols = list(dict.fromkeys(list(columns) + [self._time_key, "timezone_offset"]))
+            df = self._archive_df(
+                start, end, limit, correct_offset and not epoch_times, shards, read_cols
+            )
+            if epoch_times:
+                normalize_frame(df, models.TIME_FIELDS, "timezone_offset")
+            if columnar:
+                # archive is read newest first
+                df = df.iloc[::-1].reset_index(drop=True)
+                if time_index:
+                    df.index = pd.DatetimeIndex(df[self._time_key].values.astype("datetime64[ms]"))
+            if columns is not None:
+                df = df[list(columns) + ([OFFSET_COLUMN] if epoch_times else [])]
+            return df, None
+        if columnar:
+            recs, token = self._raw_collection(start, end, next, limit, get_all_pages, shards)
+            df = records_to_df(
+                recs, self._model, correct_offset, self._time_key, time_index, epoch_times
+            )
+            if columns is not None:
+                df = df[list(columns) + ([OFFSET_COLUMN] if epoch_times else [])]
+            return df, token
+        if shards or self._use_store(next, get_all_pages):
+            items, token = self.collection(
+                start, end, next, limit, get_all_pages, correct_offset, shards
+            )
+            return self._to_df(items), token
+
+        # convert page by page (so the records are never held twice)
+        frames, token = [], None
+        try:
+            for page, token in self.iter_pages(
+                start, end, next, limit, get_all_pages, correct_offset
+            ):
+                if page:
+                    frames.append(self._to_df(page))
+        except WhoopAPIError as err:
+            err.partial = pd.concat(frames, ignore_index=True) if frames else self._to_df([])
+            raise
+        if not frames:
+            return self._to_df([]), token
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
 
         return df, token
 
@@ -179,7 +796,14 @@ class WhoopSleepHandler(WhoopDataHandler):
 
 class WhoopRecoveryHandler(WhoopDataHandler):
     def __init__(self, client) -> None:
-        super().__init__(client, "recovery", models.UserRecovery, "cycle/@/recovery")
+        super().__init__(
+            client,
+            "recovery",
+            models.UserRecovery,
+            "cycle/@/recovery",
+            id_key="cycle_id",
+            time_key="created_at",
+        )
 
 
 class WhoopWorkoutHandler(WhoopDataHandler):
@@ -0,0 +1,243 @@
+"""Builds the asyncio versions of the handlers for the Whoop API.
+
+The handlers share the configuration and parsing (`models_v1`) of the synchronous handlers
+and only replace the network bound methods with coroutines.
+
+Copyright (c) 2022 Felix Geilert
+"""
+
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+import pandas as pd
+
+from whoopy.models import models_v1 as models
+from . import handler_v1 as handlers
+
+
+class AsyncWhoopHandler(handlers.WhoopHandler):
+    async def _get(self, path: str, params: dict = None, **kwargs) -> Dict[str, Any]:
+        """Sends a GET request to the Whoop API and returns the verified json body.
+
+        Requests are queued within the rate limit of the scheduler of the client and throttled (429) or
+        failed (5xx) requests are retried with its backoff (see `RequestScheduler.send`).
+        """
+        path = f"{self.client._base_path}/{path}"
+        scheduler = getattr(self.client, "scheduler", None)
+        attempt = 0
+        while True:
+            # wait for the budget of the rate limit (without blocking the loop)
+            wait = scheduler.try_acquire() if scheduler is not None else 0
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait = scheduler.try_acquire()
+
+            try:
+                async with self.client._semaphore:
+                    async with self.client.session.get(path, params=params, **kwargs) as res:
+                        if scheduler is not None:
+                            scheduler.update(res.headers)
+                        if res.status == 200:
+                            return await res.json()
+                        status, headers = res.status, res.headers
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as ex:
+                if scheduler is None or attempt >= scheduler.max_retries:
+                    raise
+                delay = scheduler.delay(attempt)
+                logging.warning(f"Request failed ({ex!r}), retrying in {delay:.2f}s")
+            else:
+                if scheduler is None or status not in scheduler.retry_status or attempt >= scheduler.max_retries:
+                    raise handlers.WhoopAPIError(f"Whoop API returned status code {status}.", status)
+                delay = scheduler.retry_delay(attempt, status, headers)
+                logging.warning(f"Whoop API returned {status}, retrying in {delay:.2f}s")
+
+            scheduler._count("retries")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+class AsyncWhoopUserHandler(AsyncWhoopHandler, handlers.WhoopUserHandler):
+    async def profile(self) -> models.UserProfile:
+        data = await self._get("user/profile/basic")
+
+        return models.UserProfile(**data)
+
+    async def body_measurements(self) -> models.UserMeasurements:
+        data = await self._get("user/body_measurements")
+
+        return models.UserMeasurements(**data)
+
+
+class AsyncWhoopDataHandler(AsyncWhoopHandler, handlers.WhoopDataHandler):
+    """Async version of the data handler (see `handler_v1.WhoopDataHandler`)."""
+
+    async def _get_data(
+        self,
+        path: str,
+        start: str = None,
+        end: str = None,
+        next: str = None,
+        limit: int = 25,
+    ) -> Tuple[Dict, str]:
+        """Gets the data from the Whoop API."""
+        params = self._params(start, end, next, limit)
+        data = await self._get(path, params=params)
+        return data["records"], data.get("next_token")
+
+    async def _iter_raw(
+        self,
+        start: str = None,
+        end: str = None,
+        next: str = None,
+        limit: int = 25,
+        get_all_pages: bool = True,
+    ) -> AsyncIterator[Tuple[List[Dict], str]]:
+        """Iterates the raw record pages of the collection and the token that follows each page."""
+        while True:
+            recs, next = await self._get_data(self._path, start, end, next, limit)
+            yield recs, next
+
+            # stop after the first page or when the chain is exhausted
+            if not get_all_pages or not next:
+                return
+
+    async def iter_pages(
+        self,
+        start: str = None,
+        end: str = None,
+        next: str = None,
+        limit: int = 25,
+        get_all_pages: bool = True,
+        correct_offset: bool = True,
+    ) -> AsyncIterator[Tuple[List[models.UserData], str]]:
+        """Iterates the collection page by page (see `WhoopDataHandler.iter_pages`)."""
+        async for recs, token in self._iter_raw(start, end, next, limit, get_all_pages):
+            yield [self._parse(c, correct_offset) for c in recs], token
+
+    async def iter_records(
+        self,
+        start: str = None,
+        end: str = None,
+        next: str = None,
+        limit: int = 25,
+        get_all_pages: bool = True,
+        correct_offset: bool = True,
+    ) -> AsyncIterator[models.UserData]:
+        """Iterates the collection record by record (only one page is held in memory)."""
+        async for items, _ in self.iter_pages(start, end, next, limit, get_all_pages, correct_offset):
+            for item in items:
+                yield item
+
+    async def iter_df(
+        self,
+        start: str = None,
+        end: str = None,
+        next: str = None,
+        limit: int = 25,
+        get_all_pages: bool = True,
+        correct_offset: bool = True,
+        chunk_rows: int = 1000,
+    ) -> AsyncIterator[pd.DataFrame]:
+        """Iterates the collection as DataFrames of at most `chunk_rows` rows."""
+        if chunk_rows < 1:
+            raise ValueError("chunk_rows must be at least 1.")
+
+        chunk = []
+        async for item in self.iter_records(start, end, next, limit, get_all_pages, correct_offset):
+            chunk.append(item)
+            if len(chunk) >= chunk_rows:
+                yield self._to_df(chunk)
+                chunk = []
+        if chunk:
+            yield self._to_df(chunk)
+
+    async def single(self, id: int, correct_offset: bool = True) -> models.UserData:
+        """Gets a single data object from the Whoop API."""
+        data = await self._get(self._single_path(id))
+        return self._parse(data, correct_offset)
+
+    async def single_many(
+        self, ids: Iterable[int], correct_offset: bool = True, max_concurrency: int = None
+    ) -> Tuple[List[Optional[models.UserData]], Dict[int, Exception]]:
+        """Gets multiple single data objects concurrently (see `WhoopDataHandler.single_many`).
+
+        The concurrency is bound by the semaphore of the client (and `max_concurrency` if given).
+        The errors are keyed by the position in `ids`.
+        """
+        ids = list(ids)
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+        limit = asyncio.Semaphore(max_concurrency or max(len(ids), 1))
+
+        async def fetch(id: int) -> models.UserData:
+            async with limit:
+                return await self.single(id, correct_offset)
+
+        outcomes = await asyncio.gather(*(fetch(id) for id in ids), return_exceptions=True)
+        results, errors = [], {}
+        for i, out in enumerate(outcomes):
+            if isinstance(out, Exception):
+                errors[i] = out
+                out = None
+            results.append(out)
+        return results, errors
+
+    async def collection(
+        self,
+        start: str = None,
+        end: str = None,
+        next: str = None,
+        limit: int = 25,
+        get_all_pages: bool = True,
+        correct_offset: bool = True,
+    ) -> Tuple[List[models.UserData], str]:
+        """Gets a collection of data from the Whoop API."""
+        items, token = [], None
+        async for page, token in self.iter_pages(start, end, next, limit, get_all_pages, correct_offset):
+            items.extend(page)
+
+        return items, token
+
+    async def collection_df(
+        self,
+        start: str = None,
+        end: str = None,
+        next: str = None,
+        limit: int = 25,
+        get_all_pages: bool = True,
+        correct_offset: bool = True,
+    ) -> Tuple[pd.DataFrame, str]:
+        """Gets a collection of data from the Whoop API."""
+        # convert page by page (so the records are never held twice)
+        frames, token = [], None
+        async for page, token in self.iter_pages(start, end, next, limit, get_all_pages, correct_offset):
+            if page:
+                frames.append(self._to_df(page))
+        if not frames:
+            return self._to_df([]), token
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+        return df, token
+
+    async def latest(self) -> models.UserData:
+        """Gets the latest data from the Whoop API."""
+        recs, _ = await self.collection(limit=1, get_all_pages=False)
+        return recs[0]
+
+
+class AsyncWhoopCycleHandler(AsyncWhoopDataHandler, handlers.WhoopCycleHandler):
+    pass
+
+
+class AsyncWhoopSleepHandler(AsyncWhoopDataHandler, handlers.WhoopSleepHandler):
+    pass
+
+
+class AsyncWhoopRecoveryHandler(AsyncWhoopDataHandler, handlers.WhoopRecoveryHandler):
+    pass
+
+
+class AsyncWhoopWorkoutHandler(AsyncWhoopDataHandler, handlers.WhoopWorkoutHandler):
+    pass
@@ -0,0 +1,212 @@
+"""Rate-limit aware scheduling of the requests to the Whoop API.
+
+Requests take a token from a bucket that refills at the rate the API allows. The bucket is corrected
+by the rate-limit headers of every response, so requests queue once the budget is used up. Throttled
+(429) and failed (5xx) requests are retried with jittered exponential backoff (honoring `Retry-After`).
+
+Copyright (c) 2022 Felix Geilert
+"""
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import requests
+
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+def _first_int(value: Optional[str]) -> Optional[int]:
+    """Parses the first number of a header (e.g. "100, 100;window=60" -> 100)."""
+    if not value:
+        return None
+    try:
+        return int(float(value.split(",")[0].split(";")[0].strip()))
+    except ValueError:
+        return None
+
+
+def parse_limit(value: Optional[str]) -> Optional[Tuple[int, float]]:
+    """Parses the `X-RateLimit-Limit` header into the number of requests and the window (in seconds)."""
+    limit = _first_int(value)
+    if limit is None:
+        return None
+    window = 60.0
+    for part in value.split(","):
+        if "window=" in part:
+            try:
+                window = float(part.split("window=", 1)[1].split(";")[0])
+            except ValueError:
+                pass
+            break
+    return limit, window
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses the `Retry-After` header (seconds or http date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+class RequestScheduler:
+    def __init__(
+        self,
+        rate: int = 100,
+        per: float = 60.0,
+        max_retries: int = 5,
+        backoff: float = 0.5,
+        max_backoff: float = 60.0,
+        retry_status: Tuple[int, ...] = RETRY_STATUS,
+    ):
+        """Creates a new scheduler.
+
+        Args:
+            rate (int, optional): Requests allowed per window (updated from the rate-limit headers). Defaults to 100.
+            per (float, optional): Length of the window in seconds. Defaults to 60.
+            max_retries (int, optional): Retries of a throttled or failed request. Defaults to 5.
+            backoff (float, optional): Base delay of the exponential backoff in seconds. Defaults to 0.5.
+            max_backoff (float, optional): Maximum delay between two attempts in seconds. Defaults to 60.
+            retry_status (Tuple[int, ...], optional): Status codes that are retried. Defaults to 429 and 5xx.
+        """
+        if rate < 1 or per <= 0:
+            raise ValueError("rate and per must be positive.")
+        if max_retries < 0:
+            raise ValueError("max_retries must not be negative.")
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_status = tuple(retry_status)
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "waited": 0.0}
+
+        # token bucket
+        self._lock = threading.Lock()
+        self._capacity = float(rate)
+        self._fill_rate = rate / per
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _refill(self, now: float):
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._fill_rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        """Takes a token from the bucket if the budget allows it (without blocking).
+
+        Returns:
+            float: 0 if a token was taken, otherwise the time to wait before trying again (in seconds).
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = self._blocked_until - now
+            if wait <= 0:
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self.stats["requests"] += 1
+                    return 0.0
+                wait = (1 - self._tokens) / self._fill_rate
+            self.stats["waited"] += wait
+            return wait
+
+    def acquire(self):
+        """Takes a token from the bucket (blocks until the budget allows another request)."""
+        wait = self.try_acquire()
+        while wait > 0:
+            time.sleep(wait)
+            wait = self.try_acquire()
+
+    def update(self, headers: Dict[str, str]):
+        """Corrects the bucket by the rate-limit headers of a response."""
+        limit = parse_limit(headers.get("X-RateLimit-Limit"))
+        remaining = _first_int(headers.get("X-RateLimit-Remaining"))
+        reset = _first_int(headers.get("X-RateLimit-Reset"))
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if limit is not None:
+                self._capacity = float(limit[0])
+                self._fill_rate = limit[0] / limit[1]
+            if remaining is not None:
+                self._tokens = min(self._tokens, float(remaining))
+                # budget is exhausted until the window resets
+                if remaining <= 0 and reset is not None:
+                    self._blocked_until = max(self._blocked_until, now + reset)
+
+    def block(self, seconds: float):
+        """Blocks all requests for the given time (e.g. after a `Retry-After`)."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def delay(self, attempt: int, retry_after: float = None) -> float:
+        """Computes the delay before the given retry (full jitter, at least `Retry-After`)."""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_backoff))
+        return delay
+
+    def retry_delay(self, attempt: int, status: int, headers: Dict[str, str]) -> float:
+        """Computes the delay before retrying a failed response (throttled responses block all requests).
+
+        Args:
+            attempt (int): Number of the retry (starting at 0).
+            status (int): Status code of the response.
+            headers (Dict[str, str]): Headers of the response.
+
+        Returns:
+            float: The delay in seconds.
+        """
+        if status != 429:
+            return self.delay(attempt)
+        self._count("throttled")
+        delay = self.delay(attempt, parse_retry_after(headers.get("Retry-After")))
+        self.block(delay)
+        return delay
+
+    def send(self, request: Callable[[], requests.Response]) -> requests.Response:
+        """Sends the request within the rate limit and retries it on throttling or server errors.
+
+        Returns:
+            requests.Response: The final response (which might still be an error once the retries are used up).
+        """
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                res = request()
+            except (requests.ConnectionError, requests.Timeout) as ex:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.delay(attempt)
+                logging.warning(f"Request failed ({ex}), retrying in {delay:.2f}s")
+            else:
+                self.update(res.headers)
+                if res.status_code not in self.retry_status or attempt >= self.max_retries:
+                    return res
+
+                delay = self.retry_delay(attempt, res.status_code, res.headers)
+                logging.warning(f"Whoop API returned {res.status_code}, retrying in {delay:.2f}s")
+
+            self._count("retries")
+            attempt += 1
+            time.sleep(delay)
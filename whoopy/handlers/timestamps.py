@@ -0,0 +1,135 @@
+"""Vectorized normalization of the timestamps of whole pages.
+
+All timestamps of a page are parsed in one pass into int64 UTC epoch milliseconds, the timezone
+offsets into an int16 column of offset minutes. Local times (and local days) are derived from these
+only when needed, which keeps bucketing by local day a vectorized operation.
+
+Copyright (c) 2022 Felix Geilert
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from whoopy.models import models_v1 as models
+
+
+OFFSET_COLUMN = "offset_minutes"
+# missing epoch values hold the sentinel of NaT (so they convert back to NaT)
+NAT = np.iinfo(np.int64).min
+
+
+def parse_epoch_ms(values: Sequence[Optional[str]]) -> np.ndarray:
+    """Parses the timestamps (e.g. "2022-04-24T11:25:44.774Z") into UTC epoch milliseconds.
+
+    Returns:
+        np.ndarray: int64 epoch milliseconds (`NAT` for missing values).
+    """
+    try:
+        # numpy parses the iso strings in C (the trailing "Z" marks UTC)
+        arr = np.array(
+            [v.rstrip("Z") if isinstance(v, str) and v else "NaT" for v in values],
+            dtype="datetime64[ms]",
+        )
+    except ValueError:
+        # explicit offsets (e.g. "+01:00") have to be parsed by pandas
+        arr = pd.to_datetime(pd.Series(values, dtype=object), utc=True).dt.tz_localize(None)
+        arr = arr.values.astype("datetime64[ms]")
+    return arr.view(np.int64)
+
+
+def _offset_minutes(offset) -> int:
+    """Converts a single offset (e.g. "-05:00", "+0530" or "Z") into minutes."""
+    if not isinstance(offset, str) or offset in ("", "Z"):
+        return 0
+    if ":" not in offset:
+        offset = f"{offset[:-2]}:{offset[-2:]}"
+    return int(models.parse_offset(offset).total_seconds() // 60)
+
+
+def parse_offsets(values: Sequence[Optional[str]]) -> np.ndarray:
+    """Parses the timezone offsets into minutes (each distinct offset is parsed once).
+
+    Returns:
+        np.ndarray: int16 offset minutes (0 for missing values).
+    """
+    values = np.array([v if isinstance(v, str) else "" for v in values], dtype=object)
+    uniques, inverse = np.unique(values, return_inverse=True)
+    minutes = np.array([_offset_minutes(u) for u in uniques], dtype=np.int16)
+    return minutes[inverse.reshape(-1)]
+
+
+def normalize_page(
+    records: List[Dict],
+    fields: Sequence[str] = models.TIME_FIELDS,
+    offset_key: str = "timezone_offset",
+) -> Dict[str, np.ndarray]:
+    """Normalizes the timestamps of a page of raw records.
+
+    Args:
+        records (List[Dict]): The raw records of the page.
+        fields (Sequence[str], optional): The time fields of the records. Defaults to `models_v1.TIME_FIELDS`.
+        offset_key (str, optional): The field holding the timezone offset. Defaults to "timezone_offset".
+
+    Returns:
+        Dict[str, np.ndarray]: The epoch milliseconds of every field and the offset minutes
+            (stored under `OFFSET_COLUMN`).
+    """
+    n = len(records)
+
+    # parse all fields in a single pass
+    values = [rec.get(f) for f in fields for rec in records]
+    epochs = parse_epoch_ms(values).reshape(len(fields), n)
+    times = {f: epochs[i] for i, f in enumerate(fields)}
+    times[OFFSET_COLUMN] = parse_offsets([rec.get(offset_key) for rec in records])
+    return times
+
+
+def normalize_frame(
+    df: pd.DataFrame, columns: Sequence[str], offset_column: str = None
+) -> pd.DataFrame:
+    """Converts the time columns of the frame into UTC epoch milliseconds (in place).
+
+    The time columns can hold strings or datetimes (naive datetimes are treated as UTC). If an
+    `offset_column` is given, its offsets are stored as minutes under `OFFSET_COLUMN`.
+    """
+    for col in columns:
+        if col not in df.columns:
+            continue
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            series = df[col]
+            if series.dt.tz is not None:
+                series = series.dt.tz_convert("UTC").dt.tz_localize(None)
+            df[col] = series.values.astype("datetime64[ms]").view(np.int64)
+        elif not pd.api.types.is_integer_dtype(df[col]):
+            df[col] = parse_epoch_ms(df[col].tolist())
+    if offset_column is not None and offset_column in df.columns:
+        df[OFFSET_COLUMN] = parse_offsets(df[offset_column].tolist())
+    return df
+
+
+def local_time(epoch_ms: np.ndarray, offset_minutes: np.ndarray = None) -> np.ndarray:
+    """Derives the (naive) local times from the epoch milliseconds and the offset minutes."""
+    epoch_ms = np.asarray(epoch_ms, dtype=np.int64)
+    missing = epoch_ms == NAT
+    local = epoch_ms
+    if offset_minutes is not None:
+        local = epoch_ms + np.asarray(offset_minutes, dtype=np.int64) * 60000
+    return np.where(missing, NAT, local).view("datetime64[ms]")
+
+
+def local_day(epoch_ms: np.ndarray, offset_minutes: np.ndarray = None) -> np.ndarray:
+    """Derives the local day of every timestamp (for bucketing by day)."""
+    return local_time(epoch_ms, offset_minutes).astype("datetime64[D]")
+
+
+def with_local_times(
+    df: pd.DataFrame, columns: Sequence[str], suffix: str = ".local"
+) -> pd.DataFrame:
+    """Returns a copy of the normalized frame with local time columns added (e.g. `start.local`)."""
+    offsets = df[OFFSET_COLUMN].values if OFFSET_COLUMN in df.columns else None
+    local = {
+        f"{col}{suffix}": local_time(df[col].values, offsets) for col in columns if col in df.columns
+    }
+    return df.assign(**local)
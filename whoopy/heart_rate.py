@@ -0,0 +1,104 @@
+"""Compact ingestion of heart-rate samples.
+
+Samples are decoded from the `metrics/heart_rate` responses straight into numpy arrays of int64 UTC
+epoch milliseconds and uint8 bpm (9 bytes per sample), which grow in chunks as windows are appended.
+
+Copyright (c) 2022 Felix Geilert
+"""
+
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+HR_DTYPE = np.dtype([("time", np.int64), ("bpm", np.uint8)])
+DEFAULT_CHUNK = 1 << 16
+
+
+def decode_samples(values: Iterable[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """Decodes the `values` of a heart-rate response into time and bpm arrays.
+
+    Args:
+        values (Iterable[Dict]): Samples of the form `{"time": epoch_ms, "data": bpm}`.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The int64 epoch milliseconds and the uint8 bpm.
+    """
+    values = list(values)
+    count = len(values)
+    times = np.fromiter((v["time"] for v in values), dtype=np.int64, count=count)
+    bpm = np.fromiter((v["data"] for v in values), dtype=np.int64, count=count)
+    return times, np.clip(bpm, 0, 255).astype(np.uint8)
+
+
+class HeartRateBuffer:
+    def __init__(self, chunk: int = DEFAULT_CHUNK):
+        """Creates an empty buffer.
+
+        Args:
+            chunk (int, optional): Minimum number of samples the arrays grow by. Defaults to 65536.
+        """
+        if chunk < 1:
+            raise ValueError("chunk must be at least 1.")
+        self.chunk = chunk
+        self._times = np.empty(0, dtype=np.int64)
+        self._bpm = np.empty(0, dtype=np.uint8)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes allocated by the buffer."""
+        return self._times.nbytes + self._bpm.nbytes
+
+    @property
+    def times(self) -> np.ndarray:
+        """View of the stored epoch milliseconds."""
+        return self._times[: self._size]
+
+    @property
+    def bpm(self) -> np.ndarray:
+        """View of the stored bpm."""
+        return self._bpm[: self._size]
+
+    def _reserve(self, count: int):
+        """Grows the arrays so that `count` more samples fit."""
+        needed = self._size + count
+        if needed <= len(self._times):
+            return
+        # grow by at least a chunk (and geometrically for large buffers)
+        capacity = max(needed, len(self._times) + max(self.chunk, len(self._times) // 2))
+        times = np.empty(capacity, dtype=np.int64)
+        bpm = np.empty(capacity, dtype=np.uint8)
+        times[: self._size] = self._times[: self._size]
+        bpm[: self._size] = self._bpm[: self._size]
+        self._times, self._bpm = times, bpm
+
+    def append(self, times: np.ndarray, bpm: np.ndarray):
+        """Appends decoded samples (see `decode_samples`)."""
+        if len(times) != len(bpm):
+            raise ValueError("times and bpm must have the same length.")
+        count = len(times)
+        self._reserve(count)
+        self._times[self._size : self._size + count] = times
+        self._bpm[self._size : self._size + count] = bpm
+        self._size += count
+
+    def extend(self, values: Iterable[Dict]):
+        """Decodes and appends the `values` of a heart-rate response."""
+        self.append(*decode_samples(values))
+
+    def to_records(self) -> np.ndarray:
+        """Returns the samples as structured array of `HR_DTYPE`."""
+        records = np.empty(self._size, dtype=HR_DTYPE)
+        records["time"] = self.times
+        records["bpm"] = self.bpm
+        return records
+
+    def to_frame(self) -> pd.DataFrame:
+        """Returns the samples as frame with a (naive UTC) DatetimeIndex and a `hr` column."""
+        index = pd.DatetimeIndex(self.times.astype("datetime64[ms]"), name="time")
+        return pd.DataFrame({"hr": self.bpm.copy()}, index=index)
@@ -0,0 +1,4 @@
+"""Local mock of the Whoop API with synthetic data (for offline load and performance tests)."""
+
+from .data import MockDataset
+from .server import MockWhoopServer, access_token, refresh_token
@@ -0,0 +1,47 @@
+"""Runs the mock Whoop API.
+
+Usage: python -m whoopy.mock [--port 8080] [--users 1] [--years 2] [--latency 0.05] ...
+"""
+
+import argparse
+
+from whoopy.mock.server import MockWhoopServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the Whoop API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--years", type=float, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency", type=float, default=0.0, help="delay per response (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="additional random delay (s)")
+    parser.add_argument("--rate-limit", type=int, default=None, help="requests per window")
+    parser.add_argument("--rate-window", type=float, default=60.0, help="rate limit window (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 5xx responses")
+    args = parser.parse_args()
+
+    server = MockWhoopServer(
+        users=args.users,
+        years=args.years,
+        seed=args.seed,
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=args.rate_limit,
+        rate_window=args.rate_window,
+        error_rate=args.error_rate,
+    )
+    print(f"Serving the mock Whoop API on {server.url} (users {args.users}, years {args.years})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+"""Deterministic synthetic data of the mock Whoop API.
+
+Every day of every user is planned from its own seed, so any day can be generated independently (and
+in any order) while the data stays identical between runs. The plan of a day is formatted into the
+payloads of the v1 API (cycles, sleeps, recoveries and workouts) and of the unofficial v7 API (cycles,
+sleeps with events and heart rate).
+
+Copyright (c) 2022 Felix Geilert
+"""
+
+from bisect import bisect_left
+from datetime import datetime, timedelta
+import random
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from whoopy.models.models_v1 import SPORT_IDS
+
+
+EPOCH = datetime(1970, 1, 1)
+DAY_MS = 86_400_000
+MINUTE_MS = 60_000
+DEFAULT_START = datetime(2020, 1, 1)
+
+# offsets (in minutes) the users live in (some of them travel)
+OFFSETS = [-600, -480, -420, -300, -240, -210, 0, 60, 120, 180, 330, 345, 480, 540, 570, 600, 780]
+SLEEP_STAGES = ["LIGHT", "SWS", "REM", "WAKE"]
+FIRST_NAMES = ["Alex", "Sam", "Robin", "Kim", "Jordan", "Charlie", "Taylor", "Jamie"]
+LAST_NAMES = ["Miller", "O'Neil", "Schmidt", "Garcia", "Tanaka", "Okafor", "Novak", "Silva"]
+
+
+def to_ms(date: datetime) -> int:
+    """Converts a naive UTC datetime into epoch milliseconds."""
+    return (date - EPOCH) // timedelta(milliseconds=1)
+
+
+def iso_time(ms: int) -> str:
+    """Formats epoch milliseconds in the time format of the API."""
+    return (EPOCH + timedelta(milliseconds=int(ms))).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def offset_str(minutes: int, colon: bool = True) -> str:
+    """Formats an offset in minutes (e.g. 330 -> "+05:30", or "+0530" without colon)."""
+    sign = "-" if minutes < 0 else "+"
+    hours, mins = divmod(abs(minutes), 60)
+    return f"{sign}{hours:02}:{mins:02}" if colon else f"{sign}{hours:02}{mins:02}"
+
+
+def user_id(user: int) -> int:
+    """The id of the n-th user."""
+    return 10000 + user
+
+
+def plan_day(seed: int, user: int, day: int, start: datetime = DEFAULT_START) -> Dict[str, Any]:
+    """Plans a single day of a user (deterministic for the seed, user and day).
+
+    Args:
+        seed (int): Seed of the dataset.
+        user (int): Index of the user.
+        day (int): Index of the day (since `start`).
+        start (datetime, optional): First day of the dataset. Defaults to 2020-01-01.
+
+    Returns:
+        Dict[str, Any]: Times (epoch ms), offsets and scores of the sleep, naps and workouts of the day.
+    """
+    rnd = random.Random(f"{seed}-{user}-{day}")
+    home = random.Random(f"{seed}-{user}").choice(OFFSETS)
+
+    # users travel every few weeks (deterministic per block of 10 days)
+    block = random.Random(f"{seed}-{user}-trip-{day // 10}")
+    offset = block.choice(OFFSETS) if block.random() < 0.15 else home
+
+    # sleep starts in the local evening of the day
+    midnight = to_ms(start + timedelta(days=day)) - offset * MINUTE_MS
+    sleep_start = midnight + rnd.randint(21 * 60, 25 * 60) * MINUTE_MS - DAY_MS
+    in_bed = rnd.randint(300, 570) * MINUTE_MS
+    plan = {
+        "day": day,
+        "date": (start + timedelta(days=day)).strftime("%Y-%m-%d"),
+        "offset": offset,
+        "sleep_id": user_id(user) * 100_000 + day * 10,
+        "sleep_start": sleep_start,
+        "sleep_end": sleep_start + in_bed,
+        "in_bed": in_bed,
+        "awake": rnd.randint(10, 60) * MINUTE_MS,
+        "light": int(in_bed * rnd.uniform(0.4, 0.55)),
+        "sws": int(in_bed * rnd.uniform(0.12, 0.22)),
+        "rem": int(in_bed * rnd.uniform(0.15, 0.25)),
+        "cycles": rnd.randint(2, 6),
+        "disturbances": rnd.randint(0, 20),
+        "debt": rnd.randint(0, 60) * MINUTE_MS,
+        "respiratory_rate": round(rnd.uniform(12, 18), 2),
+        "efficiency": round(rnd.uniform(70, 99), 2),
+        "performance": round(rnd.uniform(50, 100), 2),
+        "consistency": round(rnd.uniform(40, 95), 2),
+        "recovery": rnd.randint(1, 99),
+        "resting_hr": rnd.randint(42, 68),
+        "hrv": round(rnd.uniform(20, 140), 3),
+        "spo2": round(rnd.uniform(94, 99), 2),
+        "skin_temp": round(rnd.uniform(32.5, 35), 2),
+        "strain": round(rnd.uniform(2, 21), 4),
+        "kilojoule": round(rnd.uniform(5000, 16000), 2),
+        "average_hr": rnd.randint(55, 85),
+        "max_hr": rnd.randint(120, 195),
+    }
+
+    # naps (in the local afternoon)
+    plan["naps"] = []
+    if rnd.random() < 0.1:
+        nap_start = midnight + rnd.randint(13 * 60, 16 * 60) * MINUTE_MS
+        plan["naps"].append(
+            {
+                "id": plan["sleep_id"] + 1,
+                "start": nap_start,
+                "end": nap_start + rnd.randint(15, 90) * MINUTE_MS,
+            }
+        )
+
+    # workouts (during the local day)
+    plan["workouts"] = []
+    for k in range(rnd.choice([0, 0, 1, 1, 1, 2])):
+        begin = midnight + rnd.randint(6 * 60, 20 * 60) * MINUTE_MS
+        duration = rnd.randint(15, 150) * MINUTE_MS
+        zones = [rnd.random() for _ in range(6)]
+        plan["workouts"].append(
+            {
+                "id": plan["sleep_id"] + 5 + k,
+                "sport_id": rnd.choice(list(SPORT_IDS)),
+                "start": begin,
+                "end": begin + duration,
+                "zones": [int(duration * z / sum(zones)) for z in zones],
+                "strain": round(rnd.uniform(2, 19), 4),
+                "average_hr": rnd.randint(95, 160),
+                "max_hr": rnd.randint(150, 200),
+                "kilojoule": round(rnd.uniform(200, 4000), 2),
+                "distance": round(rnd.uniform(0, 25000), 1),
+                "altitude_gain": round(rnd.uniform(0, 800), 1),
+            }
+        )
+    return plan
+
+
+def _v1_base(uid: int, created: int, offset: int) -> Dict[str, Any]:
+    return {
+        "user_id": uid,
+        "created_at": iso_time(created),
+        "updated_at": iso_time(created + 3_600_000),
+        "timezone_offset": offset_str(offset),
+        "score_state": "SCORED",
+    }
+
+
+def v1_records(plan: Dict, next_plan: Dict, uid: int) -> Dict[str, List[Dict]]:
+    """Formats the plan of a day into the records of the v1 API (keyed by resource)."""
+    offset = plan["offset"]
+    cycle = dict(
+        _v1_base(uid, plan["sleep_start"], offset),
+        id=plan["sleep_id"],
+        start=iso_time(plan["sleep_start"]),
+        end=iso_time(next_plan["sleep_start"]),
+        score={
+            "strain": plan["strain"],
+            "kilojoule": plan["kilojoule"],
+            "average_heart_rate": plan["average_hr"],
+            "max_heart_rate": plan["max_hr"],
+        },
+    )
+    sleep = dict(
+        _v1_base(uid, plan["sleep_end"], offset),
+        id=plan["sleep_id"],
+        nap=False,
+        start=iso_time(plan["sleep_start"]),
+        end=iso_time(plan["sleep_end"]),
+        score={
+            "stage_summary": {
+                "total_in_bed_time_milli": plan["in_bed"],
+                "total_awake_time_milli": plan["awake"],
+                "total_no_data_time_milli": 0,
+                "total_light_sleep_time_milli": plan["light"],
+                "total_slow_wave_sleep_time_milli": plan["sws"],
+                "total_rem_sleep_time_milli": plan["rem"],
+                "sleep_cycle_count": plan["cycles"],
+                "disturbance_count": plan["disturbances"],
+            },
+            "sleep_needed": {
+                "baseline_milli": 27_000_000,
+                "need_from_sleep_debt_milli": plan["debt"],
+                "need_from_recent_strain_milli": int(plan["strain"] * 60_000),
+                "need_from_recent_nap_milli": 0,
+            },
+            "respiratory_rate": plan["respiratory_rate"],
+            "sleep_performance_percentage": plan["performance"],
+            "sleep_consistency_percentage": plan["consistency"],
+            "sleep_efficiency_percentage": plan["efficiency"],
+        },
+    )
+    naps = [
+        dict(
+            _v1_base(uid, nap["end"], offset),
+            id=nap["id"],
+            nap=True,
+            start=iso_time(nap["start"]),
+            end=iso_time(nap["end"]),
+            score_state="UNSCORABLE",
+        )
+        for nap in plan["naps"]
+    ]
+    recovery = dict(
+        _v1_base(uid, plan["sleep_end"] + 600_000, offset),
+        cycle_id=plan["sleep_id"],
+        sleep_id=plan["sleep_id"],
+        score={
+            "user_calibrating": plan["day"] < 4,
+            "recovery_score": plan["recovery"],
+            "resting_heart_rate": plan["resting_hr"],
+            "hrv_rmssd_milli": plan["hrv"],
+            "spo2_percentage": plan["spo2"],
+            "skin_temp_celsius": plan["skin_temp"],
+        },
+    )
+    workouts = [
+        dict(
+            _v1_base(uid, w["end"], offset),
+            id=w["id"],
+            sport_id=w["sport_id"],
+            start=iso_time(w["start"]),
+            end=iso_time(w["end"]),
+            score={
+                "strain": w["strain"],
+                "average_heart_rate": w["average_hr"],
+                "max_heart_rate": w["max_hr"],
+                "kilojoule": w["kilojoule"],
+                "percent_recorded": 100.0,
+                "distance_meter": w["distance"],
+                "altitude_gain_meter": w["altitude_gain"],
+                "altitude_change_meter": 0.0,
+                "zone_duration": dict(
+                    zip(
+                        [f"zone_{z}_milli" for z in ["zero", "one", "two", "three", "four", "five"]],
+                        w["zones"],
+                    )
+                ),
+            },
+        )
+        for w in plan["workouts"]
+    ]
+    return {
+        "cycle": [cycle],
+        "activity/sleep": [sleep] + naps,
+        "recovery": [recovery],
+        "activity/workout": workouts,
+    }
+
+
+def _during(start: int, end: int) -> Dict[str, str]:
+    return {"lower": iso_time(start), "upper": iso_time(end), "bounds": "[)"}
+
+
+def vu7_sleep(plan: Dict) -> Dict[str, Any]:
+    """Formats the main sleep of the plan into the v7 sleep payload (including its events)."""
+    rnd = random.Random(f"events-{plan['sleep_id']}")
+    events, t = [], plan["sleep_start"]
+    while t < plan["sleep_end"]:
+        end = min(plan["sleep_end"], t + rnd.randint(5, 45) * MINUTE_MS)
+        events.append({"during": _during(t, end), "type": rnd.choice(SLEEP_STAGES)})
+        t = end
+    return {
+        "activityId": plan["sleep_id"],
+        "during": _during(plan["sleep_start"], plan["sleep_end"]),
+        "timezoneOffset": offset_str(plan["offset"], colon=False),
+        "score": plan["performance"],
+        "qualityDuration": plan["light"] + plan["sws"] + plan["rem"],
+        "latency": rnd.randint(1, 30) * MINUTE_MS,
+        "debtPre": plan["debt"],
+        "debtPost": max(0, plan["debt"] - 1_800_000),
+        "needFromStrain": int(plan["strain"] * 60_000),
+        "sleepNeed": 27_000_000 + plan["debt"],
+        "habitualSleepNeed": 27_000_000,
+        "timeInBed": plan["in_bed"],
+        "lightSleepDuration": plan["light"],
+        "slowWaveSleepDuration": plan["sws"],
+        "remSleepDuration": plan["rem"],
+        "wakeDuration": plan["awake"],
+        "arousalTime": rnd.randint(0, 20) * MINUTE_MS,
+        "noDataDuration": 0,
+        "creditFromNaps": sum(n["end"] - n["start"] for n in plan["naps"]),
+        "projectedSleep": plan["in_bed"],
+        "cyclesCount": plan["cycles"],
+        "disturbances": plan["disturbances"],
+        "respiratoryRate": plan["respiratory_rate"],
+        "sleepEfficiency": plan["efficiency"],
+        "sleepConsistency": plan["consistency"],
+        "isNap": False,
+        "events": events,
+    }
+
+
+def vu7_cycle(plan: Dict) -> Dict[str, Any]:
+    """Formats the plan of a day into the v7 cycle payload."""
+    offset = offset_str(plan["offset"], colon=False)
+    return {
+        "days": [plan["date"]],
+        "recovery": {
+            "score": plan["recovery"],
+            "restingHeartRate": plan["resting_hr"],
+            "heartRateVariabilityRmssd": plan["hrv"] / 1000,
+            "calibrating": plan["day"] < 4,
+        },
+        "strain": {
+            "score": plan["strain"],
+            "kilojoules": plan["kilojoule"],
+            "averageHeartRate": plan["average_hr"],
+            "maxHeartRate": plan["max_hr"],
+            "workouts": [
+                {
+                    "id": w["id"],
+                    "during": _during(w["start"], w["end"]),
+                    "timezoneOffset": offset,
+                    "sportId": w["sport_id"],
+                    "score": w["strain"],
+                    "kilojoules": w["kilojoule"],
+                    "averageHeartRate": w["average_hr"],
+                    "maxHeartRate": w["max_hr"],
+                    "zones": w["zones"],
+                }
+                for w in plan["workouts"]
+            ],
+        },
+        "sleep": {
+            "id": plan["sleep_id"],
+            "qualityDuration": plan["light"] + plan["sws"] + plan["rem"],
+            "score": plan["performance"],
+            "needBreakdown": {
+                "baseline": 27_000_000,
+                "debt": plan["debt"],
+                "naps": 0,
+                "strain": int(plan["strain"] * 60_000),
+                "total": 27_000_000 + plan["debt"],
+            },
+            "naps": [
+                {"id": n["id"], "during": _during(n["start"], n["end"]), "qualityDuration": n["end"] - n["start"]}
+                for n in plan["naps"]
+            ],
+        },
+    }
+
+
+def heart_rate(plan: Dict, next_plan: Dict, seed: int, user: int, step: int = 6) -> Tuple[np.ndarray, np.ndarray]:
+    """Generates the heart rate samples of a cycle (from its sleep to the next sleep).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The int64 epoch milliseconds and uint8 bpm of the samples.
+    """
+    rng = np.random.default_rng([seed, user, plan["day"]])
+    times = np.arange(plan["sleep_start"], next_plan["sleep_start"], step * 1000, dtype=np.int64)
+
+    # resting at night, higher during the day and peaks during workouts
+    bpm = np.full(len(times), plan["resting_hr"] + 25, dtype=np.float64)
+    bpm[times < plan["sleep_end"]] = plan["resting_hr"]
+    for w in plan["workouts"]:
+        bpm[(times >= w["start"]) & (times < w["end"])] = w["average_hr"]
+    bpm += 4 * np.sin(times * (2 * np.pi / 10_800_000)) + rng.normal(0, 3, len(times))
+    return times, np.clip(bpm, 30, 220).astype(np.uint8)
+
+
+def user_profile(seed: int, user: int) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Generates the profile and the body measurements of a user (in the format of the v1 API)."""
+    rnd = random.Random(f"{seed}-{user}-profile")
+    profile = {
+        "user_id": user_id(user),
+        "email": f"user{user}@example.com",
+        "first_name": rnd.choice(FIRST_NAMES),
+        "last_name": rnd.choice(LAST_NAMES),
+    }
+    body = {
+        "height_meter": round(rnd.uniform(1.55, 1.95), 2),
+        "weight_kilogram": round(rnd.uniform(50, 100), 1),
+        "max_heart_rate": rnd.randint(175, 205),
+    }
+    return profile, body
+
+
+class MockUser:
+    def __init__(self, seed: int, user: int, days: int, start: datetime = DEFAULT_START):
+        """Generates and indexes all records of a user.
+
+        Args:
+            seed (int): Seed of the dataset.
+            user (int): Index of the user.
+            days (int): Number of days of data.
+            start (datetime, optional): First day of the data. Defaults to 2020-01-01.
+        """
+        self.seed, self.user, self.days, self.start = seed, user, days, start
+        self.id = user_id(user)
+        self.profile, self.body = user_profile(seed, user)
+        self.created_at = to_ms(start) - DAY_MS
+
+        # generate all days (each plan also needs the next one for the end of its cycle)
+        self.plans = [plan_day(seed, user, d, start) for d in range(days + 1)]
+        self.v1: Dict[str, List[Dict]] = {}
+        for plan, next_plan in zip(self.plans, self.plans[1:]):
+            for resource, records in v1_records(plan, next_plan, self.id).items():
+                self.v1.setdefault(resource, []).extend(records)
+
+        # index the collections by their time (ascending) and the records by their id
+        self._times: Dict[str, List[int]] = {}
+        self._by_id: Dict[Tuple[str, int], Dict] = {}
+        for resource, records in self.v1.items():
+            key = "created_at" if resource == "recovery" else "start"
+            records.sort(key=lambda r: r[key])
+            self._times[resource] = [_parse_ms(r[key]) for r in records]
+            for r in records:
+                self._by_id[(resource, r["cycle_id"] if resource == "recovery" else r["id"])] = r
+        self._plans_by_sleep = {p["sleep_id"]: p for p in self.plans[:-1]}
+
+    def collection(self, resource: str, start: int = None, end: int = None) -> List[Dict]:
+        """Returns the records of the resource in `[start, end)` (newest first, as the API)."""
+        times = self._times.get(resource, [])
+        lo = 0 if start is None else bisect_left(times, start)
+        hi = len(times) if end is None else bisect_left(times, end)
+        return self.v1[resource][lo:hi][::-1]
+
+    def single(self, resource: str, id: int) -> Optional[Dict]:
+        return self._by_id.get((resource, id))
+
+    def vu7_cycles(self, start: int, end: int) -> List[Dict]:
+        """Returns the v7 cycles of the days in `[start, end]`."""
+        first = max(0, (start - to_ms(self.start)) // DAY_MS)
+        last = min(self.days - 1, (end - to_ms(self.start)) // DAY_MS)
+        return [vu7_cycle(self.plans[d]) for d in range(int(first), int(last) + 1)]
+
+    def vu7_sleep(self, sleep_id: int) -> Optional[Dict]:
+        plan = self._plans_by_sleep.get(sleep_id)
+        return vu7_sleep(plan) if plan is not None else None
+
+    def heart_rate(self, start: int, end: int, step: int = 6) -> List[Dict]:
+        """Returns the heart rate samples in `[start, end)` (in the v7 format)."""
+        base = to_ms(self.start)
+        first = max(0, (start - base) // DAY_MS - 1)
+        last = min(self.days - 1, (end - base) // DAY_MS + 1)
+        values = []
+        for d in range(int(first), int(last) + 1):
+            times, bpm = heart_rate(self.plans[d], self.plans[d + 1], self.seed, self.user, step)
+            keep = (times >= start) & (times < end)
+            values.extend(
+                {"time": t, "data": b} for t, b in zip(times[keep].tolist(), bpm[keep].tolist())
+            )
+        return values
+
+
+def _parse_ms(value: str) -> int:
+    return to_ms(datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%fZ"))
+
+
+class MockDataset:
+    def __init__(
+        self, users: int = 1, years: float = 2, seed: int = 42, start: datetime = DEFAULT_START
+    ):
+        """Synthetic data of a number of users (generated lazily per user).
+
+        Args:
+            users (int, optional): Number of users. Defaults to 1.
+            years (float, optional): Years of data per user. Defaults to 2.
+            seed (int, optional): Seed of the data. Defaults to 42.
+            start (datetime, optional): First day of the data. Defaults to 2020-01-01.
+        """
+        self.users = users
+        self.days = int(round(365 * years))
+        self.seed = seed
+        self.start = start
+        self._users: Dict[int, MockUser] = {}
+        self._lock = threading.Lock()
+
+    def user(self, uid: int) -> Optional[MockUser]:
+        """Returns the user with the given id (None if it does not exist)."""
+        index = uid - user_id(0)
+        if index < 0 or index >= self.users:
+            return None
+        with self._lock:
+            if index not in self._users:
+                self._users[index] = MockUser(self.seed, index, self.days, self.start)
+            return self._users[index]
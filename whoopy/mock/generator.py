@@ -0,0 +1,190 @@
+"""Streaming generator of large synthetic Whoop datasets.
+
+Generates N users over M years from a fixed seed (see `whoopy.mock.data`): the v1 records of every
+model (cycles, sleeps and naps, recoveries, workouts, profiles and body measurements), the v7 cycles
+and sleeps (with their events) and 6-second heart rate. Days are generated one after another and
+written right away, so the memory stays constant no matter how much data is written:
+
+    <path>/<user_id>/profile.json
+    <path>/<user_id>/<resource>.jsonl[.gz]   (cycle, sleep, recovery, workout, vu7_cycle, vu7_sleep)
+    <path>/<user_id>/heart_rate/             (a `HeartRateStore`)
+
+Usage (from the repository root): python -m whoopy.mock.generator data/ --users 10 --years 5
+
+Copyright (c) 2022 Felix Geilert
+"""
+
+import argparse
+from datetime import datetime
+import gzip
+import json
+import os
+from typing import Any, Callable, Dict, Iterator, Tuple
+
+from whoopy.mock.data import (
+    DEFAULT_START,
+    heart_rate,
+    plan_day,
+    user_id,
+    user_profile,
+    v1_records,
+    vu7_cycle,
+    vu7_sleep,
+)
+from whoopy.models import models_v1 as models
+
+
+# files of the records (keyed by the resources of the v1 API)
+RESOURCE_FILES = {
+    "cycle": "cycle",
+    "activity/sleep": "sleep",
+    "recovery": "recovery",
+    "activity/workout": "workout",
+    "vu7_cycle": "vu7_cycle",
+    "vu7_sleep": "vu7_sleep",
+}
+MODELS = {
+    "cycle": models.UserCycle,
+    "activity/sleep": models.UserSleep,
+    "recovery": models.UserRecovery,
+    "activity/workout": models.UserWorkout,
+}
+
+
+def iter_plans(
+    user: int, days: int, seed: int = 42, start: datetime = DEFAULT_START
+) -> Iterator[Tuple[Dict, Dict]]:
+    """Iterates the plans of the days of a user (together with the plan of the following day)."""
+    plan = plan_day(seed, user, 0, start)
+    for day in range(days):
+        next_plan = plan_day(seed, user, day + 1, start)
+        yield plan, next_plan
+        plan = next_plan
+
+
+def iter_records(
+    user: int, days: int, seed: int = 42, start: datetime = DEFAULT_START
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Iterates the payloads of a user day by day as `(resource, payload)`.
+
+    The resources are the paths of the v1 API (e.g. "activity/sleep") and "vu7_cycle" and "vu7_sleep".
+    """
+    uid = user_id(user)
+    for plan, next_plan in iter_plans(user, days, seed, start):
+        for resource, records in v1_records(plan, next_plan, uid).items():
+            for record in records:
+                yield resource, record
+        yield "vu7_cycle", vu7_cycle(plan)
+        yield "vu7_sleep", vu7_sleep(plan)
+
+
+def validate_record(resource: str, record: Dict[str, Any]):
+    """Validates a v1 record against its model (raises on invalid payloads)."""
+    model = MODELS.get(resource)
+    if model is not None:
+        model.from_dict(record, validate=True)
+
+
+def generate(
+    path: str,
+    users: int = 1,
+    years: float = 1,
+    seed: int = 42,
+    start: datetime = DEFAULT_START,
+    hr: bool = True,
+    compress: bool = False,
+    validate: bool = False,
+    progress: Callable[[int, int], None] = None,
+) -> Dict[str, int]:
+    """Writes a synthetic dataset to disk (streaming, day by day).
+
+    Args:
+        path (str): Directory of the dataset (one sub directory per user).
+        users (int, optional): Number of users. Defaults to 1.
+        years (float, optional): Years of data per user. Defaults to 1.
+        seed (int, optional): Seed of the data (the same seed always generates the same data). Defaults to 42.
+        start (datetime, optional): First day of the data. Defaults to 2020-01-01.
+        hr (bool, optional): Generate the 6-second heart rate. Defaults to True.
+        compress (bool, optional): Write the records as gzipped jsonl. Defaults to False.
+        validate (bool, optional): Validate every v1 record against its model. Defaults to False.
+        progress (Callable[[int, int], None], optional): Called with the number of finished and total user days.
+
+    Returns:
+        Dict[str, int]: Number of written records per file (and heart rate samples as "heart_rate").
+    """
+    from whoopy.storage.hr_store import HeartRateStore
+
+    days = int(round(365 * years))
+    suffix, opener = (".jsonl.gz", gzip.open) if compress else (".jsonl", open)
+    counts = {name: 0 for name in RESOURCE_FILES.values()}
+    counts["heart_rate"] = 0
+
+    for user in range(users):
+        uid = user_id(user)
+        folder = os.path.join(path, str(uid))
+        os.makedirs(folder, exist_ok=True)
+
+        # profile and body measurements
+        profile, body = user_profile(seed, user)
+        with open(os.path.join(folder, "profile.json"), "w") as f:
+            json.dump({"profile": profile, "body_measurements": body}, f)
+
+        files = {
+            name: opener(os.path.join(folder, name + suffix), "wt")
+            for name in RESOURCE_FILES.values()
+        }
+        store = HeartRateStore(os.path.join(folder, "heart_rate")) if hr else None
+        try:
+            for day, (plan, next_plan) in enumerate(iter_plans(user, days, seed, start)):
+                for resource, records in v1_records(plan, next_plan, uid).items():
+                    for record in records:
+                        if validate:
+                            validate_record(resource, record)
+                        files[RESOURCE_FILES[resource]].write(json.dumps(record) + "\n")
+                        counts[RESOURCE_FILES[resource]] += 1
+                files["vu7_cycle"].write(json.dumps(vu7_cycle(plan)) + "\n")
+                files["vu7_sleep"].write(json.dumps(vu7_sleep(plan)) + "\n")
+                counts["vu7_cycle"] += 1
+                counts["vu7_sleep"] += 1
+
+                # heart rate of the cycle (from this sleep to the next)
+                if store is not None:
+                    counts["heart_rate"] += store.append(*heart_rate(plan, next_plan, seed, user))
+                if progress is not None:
+                    progress(user * days + day + 1, users * days)
+        finally:
+            for f in files.values():
+                f.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates a synthetic Whoop dataset")
+    parser.add_argument("path", help="output directory")
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--years", type=float, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start", default=DEFAULT_START.strftime("%Y-%m-%d"))
+    parser.add_argument("--no-hr", action="store_true", help="skip the 6-second heart rate")
+    parser.add_argument("--gzip", action="store_true", help="compress the jsonl files")
+    parser.add_argument("--validate", action="store_true", help="validate the v1 records")
+    args = parser.parse_args()
+
+    counts = generate(
+        args.path,
+        users=args.users,
+        years=args.years,
+        seed=args.seed,
+        start=datetime.strptime(args.start, "%Y-%m-%d"),
+        hr=not args.no_hr,
+        compress=args.gzip,
+        validate=args.validate,
+        progress=lambda done, total: print(f"\r{done}/{total} days", end="", flush=True),
+    )
+    print()
+    for name, count in counts.items():
+        print(f"{name:<12}{count:>14,}")
+
+
+if __name__ == "__main__":
+    main()
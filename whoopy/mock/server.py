@@ -0,0 +1,421 @@
+"""Local stand-in for the Whoop API.
+
+Serves the endpoints of the v1 API (used by `handler_v1`) and of the unofficial v7 API (used by
+`client_vu7`) from synthetic data (see `whoopy.mock.data`), with `next_token` pagination. Latency,
+jitter, rate limits and error rates are configurable, so the clients can be load-tested offline.
+Successful GET responses carry an `ETag` and `Last-Modified` (the data never changes while the server
+runs) and conditional requests are answered with 304.
+
+Usage:
+    with MockWhoopServer(users=2, years=3, latency=0.05) as server:
+        client = server.v1_client()
+        df, _ = client.cycle.collection_df(start="2021-01-01", get_all_pages=True)
+
+Copyright (c) 2022 Felix Geilert
+"""
+
+import base64
+from datetime import timezone
+from email.utils import formatdate, parsedate_to_datetime
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from dateutil import parser
+
+from whoopy.mock.data import MockDataset, iso_time, to_ms, user_id
+from whoopy.models.models_v1 import SPORT_IDS
+
+
+V1_PREFIX = "/developer/v1/"
+V1_COLLECTIONS = ["cycle", "activity/sleep", "activity/workout", "recovery"]
+SCOPES = [
+    "offline",
+    "read:recovery",
+    "read:cycles",
+    "read:sleep",
+    "read:workout",
+    "read:profile",
+    "read:body_measurement",
+]
+TOKEN_TTL = 3600
+MAX_LIMIT = 25
+
+
+def access_token(uid: int) -> str:
+    """The access token of the user with the given id."""
+    return f"mock-access-{uid}"
+
+
+def refresh_token(uid: int) -> str:
+    """The refresh token of the user with the given id."""
+    return f"mock-refresh-{uid}"
+
+
+def _token_user(token: Optional[str], prefix: str) -> Optional[int]:
+    if not token or not token.startswith(prefix):
+        return None
+    try:
+        return int(token[len(prefix) :])
+    except ValueError:
+        return None
+
+
+def _parse_time(value: Optional[str]) -> Optional[int]:
+    """Parses a time of the query into epoch milliseconds."""
+    if not value:
+        return None
+    date = parser.isoparse(value)
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    return to_ms(date)
+
+
+def encode_token(offset: int) -> str:
+    return base64.urlsafe_b64encode(str(offset).encode()).decode()
+
+
+def decode_token(token: str) -> int:
+    return int(base64.urlsafe_b64decode(token.encode()).decode())
+
+
+class MockWhoopServer:
+    def __init__(
+        self,
+        users: int = 1,
+        years: float = 2,
+        seed: int = 42,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate_limit: int = None,
+        rate_window: float = 60.0,
+        error_rate: float = 0.0,
+        dataset: MockDataset = None,
+    ):
+        """Creates a new mock server (call `start` or use it as context manager).
+
+        Args:
+            users (int, optional): Number of users of the synthetic data. Defaults to 1.
+            years (float, optional): Years of data per user. Defaults to 2.
+            seed (int, optional): Seed of the data and of the injected errors. Defaults to 42.
+            host (str, optional): Host to bind to. Defaults to "127.0.0.1".
+            port (int, optional): Port to bind to. Defaults to a free port.
+            latency (float, optional): Delay of every response in seconds. Defaults to 0.
+            jitter (float, optional): Additional random delay of up to this many seconds. Defaults to 0.
+            rate_limit (int, optional): Requests allowed per window (429 beyond). Defaults to unlimited.
+            rate_window (float, optional): Length of the rate limit window in seconds. Defaults to 60.
+            error_rate (float, optional): Fraction of requests that fail with a 500 or 503. Defaults to 0.
+            dataset (MockDataset, optional): Data to serve (overrides `users`, `years` and `seed`).
+        """
+        self.dataset = dataset or MockDataset(users=users, years=years, seed=seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.error_rate = error_rate
+        self.stats = {"requests": 0, "throttled": 0, "errors": 0, "not_modified": 0}
+
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._thread = None
+        self.last_modified = int(time.time())
+
+        handler = type("MockHandler", (_MockHandler,), {"mock": self})
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+
+    @property
+    def port(self) -> int:
+        return self._httpd.server_address[1]
+
+    @property
+    def url(self) -> str:
+        """Base url of the server (as `API_BASE` of the v1 client, the v7 client takes it without the slash)."""
+        return f"http://{self._httpd.server_address[0]}:{self.port}/"
+
+    def start(self) -> "MockWhoopServer":
+        """Serves the requests on a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._httpd.serve_forever, name="whoopy-mock", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serves the requests on the current thread."""
+        self._httpd.serve_forever()
+
+    def stop(self):
+        """Stops the server and closes its socket."""
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def v1_client(self, user: int = 0, **kwargs):
+        """Creates a v1 client that is logged in as the n-th user of the server."""
+        from whoopy.client_v1 import WhoopClient
+
+        uid = user_id(user)
+        return WhoopClient(
+            access_token(uid),
+            TOKEN_TTL,
+            SCOPES,
+            refresh_token(uid),
+            client_id="mock",
+            client_secret="mock",
+            base_url=self.url,
+            **kwargs,
+        )
+
+    def vu7_client(self, user: int = 0, **kwargs):
+        """Creates a v7 client that is logged in as the n-th user of the server."""
+        from whoopy.client_vu7 import WhoopClient
+
+        uid = user_id(user)
+        return WhoopClient(
+            auth_token=access_token(uid), whoop_id=uid, base_url=self.url.rstrip("/"), **kwargs
+        )
+
+    def _admit(self) -> Tuple[int, Dict[str, str]]:
+        """Applies latency, rate limit and error injection to a request.
+
+        Returns:
+            Tuple[int, Dict[str, str]]: Status to fail the request with (0 if it passes) and the rate limit headers.
+        """
+        delay = self.latency + (self._rnd.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+        headers = {}
+        with self._lock:
+            self.stats["requests"] += 1
+            if self.rate_limit:
+                now = time.monotonic()
+                if now - self._window_start >= self.rate_window:
+                    self._window_start, self._window_count = now, 0
+                self._window_count += 1
+                reset = max(0, int(self._window_start + self.rate_window - now + 0.999))
+                headers = {
+                    "X-RateLimit-Limit": f"{self.rate_limit}, {self.rate_limit};window={self.rate_window:g}",
+                    "X-RateLimit-Remaining": str(max(0, self.rate_limit - self._window_count)),
+                    "X-RateLimit-Reset": str(reset),
+                }
+                if self._window_count > self.rate_limit:
+                    self.stats["throttled"] += 1
+                    headers["Retry-After"] = str(reset)
+                    return 429, headers
+            if self.error_rate and self._rnd.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return self._rnd.choice([500, 503]), headers
+        return 0, headers
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    # keep connections alive (the clients share a connection pool)
+    protocol_version = "HTTP/1.1"
+    mock: MockWhoopServer = None
+
+    def log_message(self, format, *args):
+        logging.debug(f"mock whoop api: {format % args}")
+
+    def handle(self):
+        # clients closing their kept-alive connections are not errors
+        try:
+            super().handle()
+        except ConnectionError:
+            self.close_connection = True
+
+    def _send(self, status: int, body: Any = None, headers: Dict[str, str] = None, conditional: bool = False):
+        data = json.dumps(body if body is not None else {}).encode()
+        headers = dict(headers or {})
+        if conditional and status == 200:
+            headers["ETag"] = f'"{hashlib.sha1(data).hexdigest()[:20]}"'
+            headers["Last-Modified"] = formatdate(self.mock.last_modified, usegmt=True)
+            if self._not_modified(headers["ETag"]):
+                with self.mock._lock:
+                    self.mock.stats["not_modified"] += 1
+                status, data = 304, b""
+
+        self.send_response(status)
+        if data:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _not_modified(self, etag: str) -> bool:
+        """Checks the validators of a conditional request (`If-None-Match` takes precedence)."""
+        match = self.headers.get("If-None-Match")
+        if match is not None:
+            return match.strip() == "*" or etag in [m.strip() for m in match.split(",")]
+        since = self.headers.get("If-Modified-Since")
+        if since is None:
+            return False
+        try:
+            return parsedate_to_datetime(since).timestamp() >= self.mock.last_modified
+        except (TypeError, ValueError):
+            return False
+
+    def _body(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode() if length else ""
+        if "json" in (self.headers.get("Content-Type") or ""):
+            return json.loads(raw or "{}")
+        return {k: v[0] for k, v in parse_qs(raw).items()}
+
+    def _user(self) -> Optional[Any]:
+        auth = self.headers.get("Authorization") or self.headers.get("authorization") or ""
+        uid = _token_user(auth[7:] if auth.startswith("Bearer ") else None, "mock-access-")
+        return self.mock.dataset.user(uid) if uid is not None else None
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method: str):
+        status, headers = self.mock._admit()
+        if status:
+            # drain the body so the connection stays usable
+            if method == "POST":
+                self._body()
+            return self._send(status, {"message": "injected failure"}, headers)
+
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        try:
+            if method == "POST" or url.path == "/oauth/token":
+                body = self._body() if method == "POST" else query
+                status, payload = self._auth(url.path, body)
+            elif url.path.startswith(V1_PREFIX):
+                status, payload = self._v1(url.path[len(V1_PREFIX) :], query)
+            else:
+                status, payload = self._vu7(url.path, query)
+        except (KeyError, ValueError) as ex:
+            status, payload = 400, {"message": f"Bad request: {ex}"}
+        self._send(status, payload, headers, conditional=method == "GET")
+
+    def _auth(self, path: str, body: Dict[str, Any]) -> Tuple[int, Any]:
+        """Token endpoints of the v1 (`oauth/oauth2/token`) and v7 (`oauth/token`) API."""
+        dataset = self.mock.dataset
+        if path == "/oauth/oauth2/token":
+            if body.get("grant_type") == "refresh_token":
+                uid = _token_user(body.get("refresh_token"), "mock-refresh-")
+            else:
+                # authorization codes name the user (or default to the first user)
+                code = body.get("code") or ""
+                uid = int(code) if code.isdigit() else user_id(0)
+            if uid is None or dataset.user(uid) is None:
+                return 401, {"message": "invalid grant"}
+            return 200, {
+                "access_token": access_token(uid),
+                "expires_in": TOKEN_TTL,
+                "refresh_token": refresh_token(uid),
+                "scope": " ".join(SCOPES),
+                "token_type": "bearer",
+            }
+        if path == "/oauth/token":
+            if body.get("grant_type") == "refresh_token":
+                uid = _token_user(body.get("refresh_token"), "mock-refresh-")
+            else:
+                # users log in as "user<n>" (any password)
+                match = re.fullmatch(r"user(\d+)(@.*)?", str(body.get("username", "")))
+                uid = user_id(int(match.group(1))) if match else None
+            user = dataset.user(uid) if uid is not None else None
+            if user is None:
+                return 401, {"message": "invalid credentials"}
+            return 200, {
+                "access_token": access_token(uid),
+                "refresh_token": refresh_token(uid),
+                "user": {"id": uid, "profile": {"createdAt": iso_time(user.created_at)}},
+            }
+        return 404, {"message": "not found"}
+
+    def _v1(self, path: str, query: Dict[str, str]) -> Tuple[int, Any]:
+        """Endpoints of the v1 API."""
+        user = self._user()
+        if user is None:
+            return 401, {"message": "unauthorized"}
+        path = path.rstrip("/")
+        if path == "user/profile/basic":
+            return 200, user.profile
+        if path == "user/body_measurements":
+            return 200, user.body
+
+        # collections (newest first, paginated by offset tokens)
+        if path in V1_COLLECTIONS:
+            limit = int(query.get("limit", 10))
+            if limit < 1 or limit > MAX_LIMIT:
+                return 400, {"message": f"limit must be between 1 and {MAX_LIMIT}"}
+            records = user.collection(
+                path, _parse_time(query.get("start")), _parse_time(query.get("end"))
+            )
+            offset = decode_token(query["nextToken"]) if query.get("nextToken") else 0
+            page = records[offset : offset + limit]
+            more = offset + limit < len(records)
+            return 200, {"records": page, "next_token": encode_token(offset + limit) if more else None}
+
+        # single records
+        match = re.fullmatch(r"cycle/(\d+)/recovery", path)
+        if match:
+            record = user.single("recovery", int(match.group(1)))
+        else:
+            match = re.fullmatch(r"(cycle|activity/sleep|activity/workout)/(\d+)", path)
+            record = user.single(match.group(1), int(match.group(2))) if match else None
+        if record is None:
+            return 404, {"message": "not found"}
+        return 200, record
+
+    def _vu7(self, path: str, query: Dict[str, str]) -> Tuple[int, Any]:
+        """Endpoints of the unofficial v7 API."""
+        if path.rstrip("/") == "/sports":
+            return 200, [{"id": k, "name": v} for k, v in SPORT_IDS.items()]
+
+        match = re.fullmatch(r"/users/(\d+)(/.*)?", path)
+        user = self._user()
+        if match is None:
+            return 404, {"message": "not found"}
+        if user is None or user.id != int(match.group(1)):
+            return 401, {"message": "unauthorized"}
+        sub = (match.group(2) or "").rstrip("/")
+
+        if sub == "":
+            return 200, {"id": user.id, "createdAt": iso_time(user.created_at)}
+        if sub == "/cycles":
+            return 200, user.vu7_cycles(_parse_time(query["start"]), _parse_time(query["end"]))
+        if sub == "/metrics/heart_rate":
+            step = int(query.get("step", 6))
+            values = user.heart_rate(
+                _parse_time(query["start"]), _parse_time(query["end"]), step
+            )
+            return 200, {"values": values}
+        match = re.fullmatch(r"/sleeps/(\d+)", sub)
+        if match:
+            sleep = user.vu7_sleep(int(match.group(1)))
+            if sleep is not None:
+                return 200, sleep
+        return 404, {"message": "not found"}
+
@@ -6,9 +6,37 @@ Copyright (c) 2022 Felix Geilert
 
 from abc import abstractclassmethod
 from datetime import datetime, timedelta
-from typing import Dict
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple, Type
 from pydantic import BaseModel
-import time_helper as th
+
+
+API_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+PYDANTIC_V2 = hasattr(BaseModel, "model_validate")
+TIME_FIELDS = ["created_at", "updated_at", "start", "end"]
+
+
+def parse_time(value: str) -> datetime:
+    """Parses a timestamp of the API (e.g. "2022-04-24T11:25:44.774Z") into a naive UTC datetime."""
+    try:
+        return datetime.fromisoformat(value[:-1] if value[-1] == "Z" else value)
+    except ValueError:
+        # older python versions only support 3 or 6 digit fractions
+        return datetime.strptime(value, API_TIME_FORMAT)
+
+
+@lru_cache(maxsize=256)
+def parse_offset(offset: str) -> timedelta:
+    """Parses a timezone offset string (e.g. "-05:00") into a timedelta."""
+    # check if negative
+    negative = offset[0] == "-"
+    if offset[0] in ["+", "-"]:
+        offset = offset[1:]
+
+    # parse hours and minutes to int
+    hours, minutes = offset.split(":")
+    td = timedelta(hours=int(hours), minutes=int(minutes))
+    return -td if negative else td
 
 
 class UserProfile(BaseModel):
@@ -42,34 +70,38 @@ class UserData(BaseModel):
         return data
 
     @classmethod
-    def from_dict(cls, data: Dict, correct_offset: bool = False):
-        # generate timedelta from timezone offset
-        td = timedelta(days=0)
-        if correct_offset and "timezone_offset" in data:
-            to_str = data["timezone_offset"]
-
-            # check if negative
-            negative = to_str[0] == "-"
-            if to_str[0] in ["+", "-"]:
-                to_str = to_str[1:]
-
-            # parse hours and minutes to int
-            hours, minutes = to_str.split(":")
-            hours = int(hours)
-            minutes = int(minutes)
+    def from_dict(cls, data: Dict, correct_offset: bool = False, validate: bool = True):
+        """Creates the object from the json payload of the API (the payload is not modified).
+
+        Args:
+            data (Dict): The json payload.
+            correct_offset (bool, optional): Shift the times into the local time of the record. Defaults to False.
+            validate (bool, optional): Validate the payload through pydantic. Trusted payloads (e.g. directly
+                from the API) can take the fast path instead: on pydantic v2 the whole payload is validated
+                in pydantic-core at once (nested models are not built in python, malformed payloads still
+                raise), on v1 the models are built without validation (malformed payloads are then not
+                detected). Defaults to True.
+        """
+        data = dict(data)
 
-            # generate timedelta
-            td = timedelta(hours=hours, minutes=minutes)
-            if negative:
-                td *= -1
+        # generate timedelta from timezone offset
+        td = None
+        if correct_offset and data.get("timezone_offset"):
+            td = parse_offset(data["timezone_offset"])
 
         # update the datetimes
-        for dt in ["created_at", "updated_at", "start", "end"]:
-            if dt in data and data[dt] is not None:
-                date = datetime.strptime(data[dt], "%Y-%m-%dT%H:%M:%S.%fZ")
-                data[dt] = th.any_to_datetime(date) + td
+        for dt in TIME_FIELDS:
+            value = data.get(dt)
+            if isinstance(value, str):
+                value = parse_time(value)
+                data[dt] = value + td if td else value
+
+        if not validate:
+            # pydantic-core validates the nested payload faster than the models are constructed in python
+            if PYDANTIC_V2:
+                return cls.model_validate(data)
+            return _construct(cls, data)
         data = cls._dict_parse(data)
-        print(data)
         return cls(**data)
 
 
@@ -145,7 +177,7 @@ class UserSleep(UserData):
     @classmethod
     def _dict_parse(cls, data: Dict):
         if "score" in data and data["score"] is not None:
-            score_dict = data["score"]
+            score_dict = dict(data["score"])
             if (
                 "stage_summary" in score_dict
                 and score_dict["stage_summary"] is not None
@@ -227,7 +259,7 @@ class UserWorkout(UserData):
     @classmethod
     def _dict_parse(cls, data: Dict):
         if "score" in data and data["score"] is not None:
-            score_dict = data["score"]
+            score_dict = dict(data["score"])
             if (
                 "zone_duration" in score_dict
                 and score_dict["zone_duration"] is not None
@@ -240,6 +272,68 @@ class UserWorkout(UserData):
         return data
 
 
+def _model_fields(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Returns the annotated types of the model fields (supports pydantic v1 and v2)."""
+    if hasattr(model, "model_fields"):
+        return {name: field.annotation for name, field in model.model_fields.items()}
+    return {name: field.outer_type_ for name, field in model.__fields__.items()}
+
+
+@lru_cache(maxsize=None)
+def _field_plan(model: Type[BaseModel]) -> Tuple[Dict[str, Type[BaseModel]], Tuple[str, ...]]:
+    """Returns the fields of the model that hold nested models and the fields that are floats."""
+    nested, floats = {}, []
+    for name, tp in _model_fields(model).items():
+        args = [a for a in getattr(tp, "__args__", None) or () if a is not type(None)]
+        tp = args[0] if args else tp
+        if isinstance(tp, type) and issubclass(tp, BaseModel):
+            nested[name] = tp
+        elif tp is float:
+            floats.append(name)
+    return nested, tuple(floats)
+
+
+def _construct(model: Type[BaseModel], data: Dict[str, Any]) -> BaseModel:
+    """Builds the model (and its nested models) without validation (fast path of pydantic v1).
+
+    Only the coercions that affect downstream dtypes are applied (ints in float fields).
+    """
+    nested, floats = _field_plan(model)
+    for name, sub in nested.items():
+        value = data.get(name)
+        if isinstance(value, dict):
+            data[name] = _construct(sub, dict(value))
+    for name in floats:
+        value = data.get(name)
+        if type(value) is int:
+            data[name] = float(value)
+    construct = getattr(model, "model_construct", None) or model.construct
+    return construct(**data)
+
+
+def flatten_fields(model: Type[BaseModel], prefix: str = "") -> List[Tuple[str, type]]:
+    """Returns the flattened schema of the model.
+
+    Nested models are expanded into dotted paths (e.g. `score.stage_summary.total_in_bed_time_milli`),
+    which matches the columns that `pd.json_normalize` generates for the model.
+
+    Returns:
+        List[Tuple[str, type]]: The column names and their python types.
+    """
+    fields = []
+    for name, tp in _model_fields(model).items():
+        # unwrap optional types
+        args = [a for a in getattr(tp, "__args__", None) or () if a is not type(None)]
+        if args:
+            tp = args[0]
+
+        if isinstance(tp, type) and issubclass(tp, BaseModel):
+            fields.extend(flatten_fields(tp, f"{prefix}{name}."))
+        else:
+            fields.append((f"{prefix}{name}", tp))
+    return fields
+
+
 SPORT_IDS = {
     -1: "Activity",
     126: "Assault Bike",
@@ -0,0 +1,267 @@
+"""Multi-resolution aggregates of heart-rate samples.
+
+The samples are aggregated into 1-minute, 15-minute, hourly and daily buckets (min, max, sum and
+count per bucket). The levels are extended incrementally as new samples are ingested, and queries
+read the most detailed level that still fits a point budget, so zooming out over months or years
+only touches a few thousand pre-aggregated rows.
+
+Copyright (c) 2022 Felix Geilert
+"""
+
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from whoopy.storage.hr_store import HeartRateStore, TimeLike, to_epoch_ms
+
+
+# resolutions of the levels in seconds (finest first)
+LEVELS = (60, 900, 3600, 86400)
+LEVEL_DTYPE = np.dtype(
+    [
+        ("time", np.int64),
+        ("min", np.uint8),
+        ("max", np.uint8),
+        ("sum", np.int64),
+        ("count", np.int64),
+    ]
+)
+DEFAULT_MAX_POINTS = 2000
+# samples that are aggregated at once when updating from a store
+UPDATE_BATCH = 1 << 22
+# minimum number of rows a level grows by
+LEVEL_CHUNK = 4096
+
+
+def aggregate(times: np.ndarray, bpm: np.ndarray, resolution: int) -> np.ndarray:
+    """Aggregates sorted samples into buckets of the given resolution.
+
+    Args:
+        times (np.ndarray): Sorted epoch milliseconds of the samples.
+        bpm (np.ndarray): Heart rate of the samples.
+        resolution (int): Length of the buckets in seconds.
+
+    Returns:
+        np.ndarray: One row of `LEVEL_DTYPE` per non-empty bucket.
+    """
+    if len(times) == 0:
+        return np.empty(0, dtype=LEVEL_DTYPE)
+    step = resolution * 1000
+    buckets = times // step
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+
+    rows = np.empty(len(starts), dtype=LEVEL_DTYPE)
+    rows["time"] = buckets[starts] * step
+    rows["min"] = np.minimum.reduceat(bpm, starts)
+    rows["max"] = np.maximum.reduceat(bpm, starts)
+    rows["sum"] = np.add.reduceat(bpm.astype(np.int64), starts)
+    rows["count"] = np.diff(np.append(starts, len(times)))
+    return rows
+
+
+class LevelBuffer:
+    def __init__(self, rows: np.ndarray = None, chunk: int = LEVEL_CHUNK):
+        """Creates a growable level (rows are appended in place, like `HeartRateBuffer`).
+
+        Args:
+            rows (np.ndarray, optional): Initial rows of `LEVEL_DTYPE`. Defaults to none.
+            chunk (int, optional): Minimum number of rows the level grows by. Defaults to 4096.
+        """
+        rows = np.empty(0, dtype=LEVEL_DTYPE) if rows is None else rows
+        self.chunk = chunk
+        self._rows = np.array(rows, dtype=LEVEL_DTYPE)
+        self._size = len(rows)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def rows(self) -> np.ndarray:
+        """View of the stored rows."""
+        return self._rows[: self._size]
+
+    def _reserve(self, count: int):
+        """Grows the array so that `count` more rows fit."""
+        needed = self._size + count
+        if needed <= len(self._rows):
+            return
+        # grow by at least a chunk (and geometrically for large levels)
+        capacity = max(needed, len(self._rows) + max(self.chunk, len(self._rows) // 2))
+        rows = np.empty(capacity, dtype=LEVEL_DTYPE)
+        rows[: self._size] = self._rows[: self._size]
+        self._rows = rows
+
+    def extend(self, rows: np.ndarray):
+        """Appends the rows (combining the bucket the level and the rows share)."""
+        if self._size and len(rows) and self._rows[self._size - 1]["time"] == rows["time"][0]:
+            last, first = self._rows[self._size - 1], rows[0]
+            last["min"] = min(last["min"], first["min"])
+            last["max"] = max(last["max"], first["max"])
+            last["sum"] += first["sum"]
+            last["count"] += first["count"]
+            rows = rows[1:]
+        count = len(rows)
+        self._reserve(count)
+        self._rows[self._size : self._size + count] = rows
+        self._size += count
+
+
+class HeartRatePyramid:
+    def __init__(self, path: str = None, levels: Tuple[int, ...] = LEVELS):
+        """Creates (or loads) a pyramid.
+
+        Args:
+            path (str, optional): Directory to persist the levels in. Defaults to memory only.
+            levels (Tuple[int, ...], optional): Resolutions of the levels in seconds.
+                Defaults to 1min, 15min, 1h and 1d.
+        """
+        self.path = path
+        self.resolutions = tuple(sorted(levels))
+        self._lock = threading.Lock()
+        self._levels: Dict[int, LevelBuffer] = {}
+        self.last: Optional[int] = None
+
+        for res in self.resolutions:
+            file = self._level_path(res)
+            if file is not None and os.path.exists(file):
+                self._levels[res] = LevelBuffer(np.load(file))
+            else:
+                self._levels[res] = LevelBuffer()
+        if path is not None and os.path.exists(os.path.join(path, "last.npy")):
+            self.last = int(np.load(os.path.join(path, "last.npy")))
+
+    @property
+    def levels(self) -> Dict[int, np.ndarray]:
+        """The rows of each level (views of the growable buffers)."""
+        return {res: level.rows for res, level in self._levels.items()}
+
+    def _level_path(self, res: int) -> Optional[str]:
+        if self.path is None:
+            return None
+        return os.path.join(self.path, f"level_{res}.npy")
+
+    def _save(self):
+        os.makedirs(self.path, exist_ok=True)
+        files = [(self._level_path(res), self._levels[res].rows) for res in self.resolutions]
+        files.append((os.path.join(self.path, "last.npy"), np.array(self.last, dtype=np.int64)))
+        for file, data in files:
+            tmp = f"{file}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, data)
+            os.replace(tmp, file)
+
+    def ingest(self, times: np.ndarray, bpm: np.ndarray, save: bool = True) -> int:
+        """Adds samples to all levels (samples that are not newer than the last ingested one are dropped).
+
+        Args:
+            times (np.ndarray): Epoch milliseconds of the samples.
+            bpm (np.ndarray): Heart rate of the samples.
+            save (bool, optional): Persist the levels afterwards (if the pyramid has a path). Defaults to True.
+
+        Returns:
+            int: Number of ingested samples.
+        """
+        times = np.asarray(times, dtype=np.int64)
+        bpm = np.asarray(bpm, dtype=np.uint8)
+        order = np.argsort(times, kind="stable")
+        times, bpm = times[order], bpm[order]
+        with self._lock:
+            if self.last is not None:
+                keep = times > self.last
+                times, bpm = times[keep], bpm[keep]
+            if len(times) == 0:
+                return 0
+
+            for res in self.resolutions:
+                self._levels[res].extend(aggregate(times, bpm, res))
+            self.last = int(times[-1])
+            if save and self.path is not None:
+                self._save()
+            return len(times)
+
+    def update(self, store: HeartRateStore) -> int:
+        """Ingests the samples of the store that are newer than the last ingested one."""
+        start = None if self.last is None else self.last + 1
+        count, batch, size = 0, [], 0
+
+        def flush():
+            if batch:
+                records = np.concatenate(batch)
+                batch.clear()
+                return self.ingest(records["time"], records["bpm"], save=False)
+            return 0
+
+        # aggregate the days in large batches (fewer partial buckets to combine and calls to sort)
+        for chunk in store.chunks(start=start):
+            batch.append(chunk)
+            size += len(chunk)
+            if size >= UPDATE_BATCH:
+                count += flush()
+                size = 0
+        count += flush()
+        if count and self.path is not None:
+            with self._lock:
+                self._save()
+        return count
+
+    def level_for(
+        self, start: TimeLike = None, end: TimeLike = None, max_points: int = DEFAULT_MAX_POINTS
+    ) -> int:
+        """Returns the finest resolution with at most `max_points` buckets in `[start, end)`.
+
+        Falls back to the coarsest level if none fits the budget.
+        """
+        start, end = to_epoch_ms(start), to_epoch_ms(end)
+        for res in self.resolutions:
+            lo, hi = self._bounds(self._levels[res].rows, start, end)
+            if hi - lo <= max_points:
+                return res
+        return self.resolutions[-1]
+
+    @staticmethod
+    def _bounds(level: np.ndarray, start: Optional[int], end: Optional[int]) -> Tuple[int, int]:
+        lo = 0 if start is None else int(np.searchsorted(level["time"], start, "left"))
+        hi = len(level) if end is None else int(np.searchsorted(level["time"], end, "left"))
+        return lo, hi
+
+    def query(
+        self,
+        start: TimeLike = None,
+        end: TimeLike = None,
+        max_points: int = DEFAULT_MAX_POINTS,
+        resolution: int = None,
+    ) -> pd.DataFrame:
+        """Returns the aggregated heart rate of the buckets that start in `[start, end)`.
+
+        Args:
+            start (TimeLike, optional): Start of the range (datetime or epoch ms).
+            end (TimeLike, optional): End of the range (exclusive).
+            max_points (int, optional): Maximum number of rows (selects the level). Defaults to 2000.
+            resolution (int, optional): Resolution of the level in seconds (overrides `max_points`).
+
+        Returns:
+            pd.DataFrame: Frame with a (naive UTC) DatetimeIndex and `min`, `mean`, `max` and `count`
+                columns. The resolution of the level is stored in `df.attrs["resolution"]`.
+        """
+        if resolution is None:
+            resolution = self.level_for(start, end, max_points)
+        elif resolution not in self._levels:
+            raise ValueError(f"No level with a resolution of {resolution}s.")
+
+        level = self._levels[resolution].rows
+        lo, hi = self._bounds(level, to_epoch_ms(start), to_epoch_ms(end))
+        rows = level[lo:hi]
+        df = pd.DataFrame(
+            {
+                "min": rows["min"],
+                "mean": rows["sum"] / rows["count"],
+                "max": rows["max"],
+                "count": rows["count"],
+            },
+            index=pd.DatetimeIndex(rows["time"].astype("datetime64[ms]"), name="time"),
+        )
+        df.attrs["resolution"] = resolution
+        return df
@@ -0,0 +1,243 @@
+"""Local memory-mapped store for heart-rate samples.
+
+Samples are kept as packed `(epoch_ms, bpm)` records (see `whoopy.heart_rate.HR_DTYPE`) in one
+append-only file per UTC day. A sparse index holds the first and last time and the number of samples
+of each day, so range queries only binary search the index and the days they touch and return
+zero-copy views into the memory-mapped files. The store only needs the network for new samples.
+
+Copyright (c) 2022 Felix Geilert
+"""
+
+from datetime import datetime, timedelta, timezone
+import os
+import threading
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from whoopy.heart_rate import HR_DTYPE
+
+
+DAY_MS = 86_400_000
+INDEX_DTYPE = np.dtype(
+    [("day", np.int64), ("first", np.int64), ("last", np.int64), ("count", np.int64)]
+)
+INDEX_FILE = "index.npy"
+
+TimeLike = Union[datetime, int, None]
+
+
+def to_epoch_ms(time: TimeLike) -> Optional[int]:
+    """Converts a (naive UTC or aware) datetime into epoch milliseconds (ints are passed through)."""
+    if time is None or isinstance(time, (int, np.integer)):
+        return time
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=timezone.utc)
+    return int(time.timestamp() * 1000)
+
+
+def to_naive_utc(time: datetime) -> datetime:
+    """Converts an aware datetime into a naive UTC datetime (naive datetimes are taken as UTC)."""
+    if time.tzinfo is None:
+        return time
+    return time.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class HeartRateStore:
+    def __init__(self, path: str):
+        """Opens (or creates) a store in the given directory.
+
+        Args:
+            path (str): Directory of the day files and the index.
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._maps: Dict[int, np.memmap] = {}
+
+        # load the sparse index
+        index_path = os.path.join(path, INDEX_FILE)
+        if os.path.exists(index_path):
+            self._index = np.load(index_path)
+        else:
+            self._index = np.empty(0, dtype=INDEX_DTYPE)
+
+    def __len__(self) -> int:
+        return int(self._index["count"].sum())
+
+    @property
+    def first(self) -> Optional[int]:
+        """Epoch milliseconds of the oldest stored sample."""
+        return int(self._index["first"][0]) if len(self._index) else None
+
+    @property
+    def last(self) -> Optional[int]:
+        """Epoch milliseconds of the newest stored sample."""
+        return int(self._index["last"][-1]) if len(self._index) else None
+
+    @property
+    def days(self) -> np.ndarray:
+        """The stored UTC days (as datetime64[D])."""
+        return self._index["day"].astype("datetime64[D]")
+
+    def _day_path(self, day: int) -> str:
+        date = np.datetime64(day, "D").astype(datetime)
+        return os.path.join(self.path, f"{date.year:04}", f"{date.isoformat()}.hr")
+
+    def _map(self, pos: int) -> np.memmap:
+        """Returns the memory map of the day at the given position of the index."""
+        day, count = int(self._index["day"][pos]), int(self._index["count"][pos])
+        mm = self._maps.get(day)
+        if mm is None or len(mm) != count:
+            mm = np.memmap(self._day_path(day), dtype=HR_DTYPE, mode="r", shape=(count,))
+            self._maps[day] = mm
+        return mm
+
+    def _write_index(self):
+        # replace atomically (the day files are only trusted up to the indexed count)
+        tmp = os.path.join(self.path, f"{INDEX_FILE}.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, self._index)
+        os.replace(tmp, os.path.join(self.path, INDEX_FILE))
+
+    def append(self, times: np.ndarray, bpm: np.ndarray) -> int:
+        """Appends samples (samples that are not newer than the last stored sample are dropped).
+
+        Args:
+            times (np.ndarray): Epoch milliseconds of the samples.
+            bpm (np.ndarray): Heart rate of the samples.
+
+        Returns:
+            int: Number of appended samples.
+        """
+        records = np.empty(len(times), dtype=HR_DTYPE)
+        records["time"] = times
+        records["bpm"] = bpm
+        return self.append_records(records)
+
+    def append_records(self, records: np.ndarray) -> int:
+        """Appends a structured array of `HR_DTYPE` (see `append`)."""
+        with self._lock:
+            records = np.sort(records, order="time", kind="stable")
+            last = self.last
+            if last is not None:
+                records = records[records["time"] > last]
+            # drop duplicate times within the batch
+            if len(records) > 1:
+                records = records[np.concatenate(([True], np.diff(records["time"]) > 0))]
+            if len(records) == 0:
+                return 0
+
+            # split the records into their days
+            days = records["time"] // DAY_MS
+            splits = np.flatnonzero(np.diff(days)) + 1
+            index = list(self._index)
+            for chunk in np.split(records, splits):
+                day = int(chunk["time"][0] // DAY_MS)
+                if index and index[-1]["day"] == day:
+                    _, first, _, count = index[-1]
+                else:
+                    first, count = chunk["time"][0], 0
+                    index.append(np.zeros((), dtype=INDEX_DTYPE))
+
+                # write behind the indexed samples (drops leftovers of interrupted appends)
+                path = self._day_path(day)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                    f.seek(int(count) * HR_DTYPE.itemsize)
+                    f.write(chunk.tobytes())
+                    f.truncate()
+                index[-1] = np.array(
+                    (day, first, chunk["time"][-1], count + len(chunk)), dtype=INDEX_DTYPE
+                )
+                self._maps.pop(day, None)
+
+            self._index = np.array(index, dtype=INDEX_DTYPE)
+            self._write_index()
+            return len(records)
+
+    def chunks(self, start: TimeLike = None, end: TimeLike = None) -> List[np.ndarray]:
+        """Returns zero-copy views of the samples in `[start, end)`, one per stored day.
+
+        Args:
+            start (TimeLike, optional): Start of the range (datetime or epoch ms). Defaults to the first sample.
+            end (TimeLike, optional): End of the range (exclusive). Defaults to after the last sample.
+        """
+        start, end = to_epoch_ms(start), to_epoch_ms(end)
+        with self._lock:
+            # binary search the days that overlap the range
+            lo = 0 if start is None else int(np.searchsorted(self._index["last"], start, "left"))
+            hi = (
+                len(self._index)
+                if end is None
+                else int(np.searchsorted(self._index["first"], end, "left"))
+            )
+
+            views = []
+            for pos in range(lo, hi):
+                mm = self._map(pos)
+                a = 0 if start is None else int(np.searchsorted(mm["time"], start, "left"))
+                b = len(mm) if end is None else int(np.searchsorted(mm["time"], end, "left"))
+                if b > a:
+                    views.append(mm[a:b])
+            return views
+
+    def query(self, start: TimeLike = None, end: TimeLike = None) -> np.ndarray:
+        """Returns the samples in `[start, end)` as array of `HR_DTYPE`.
+
+        The result is a view into the store if the range is within a single day, otherwise the days are copied.
+        """
+        views = self.chunks(start, end)
+        if len(views) == 1:
+            return views[0]
+        if len(views) == 0:
+            return np.empty(0, dtype=HR_DTYPE)
+        return np.concatenate(views)
+
+    def frame(self, start: TimeLike = None, end: TimeLike = None) -> pd.DataFrame:
+        """Returns the samples in `[start, end)` as frame with a (naive UTC) DatetimeIndex and a `hr` column."""
+        records = self.query(start, end)
+        index = pd.DatetimeIndex(records["time"].astype("datetime64[ms]"), name="time")
+        return pd.DataFrame({"hr": np.asarray(records["bpm"])}, index=index)
+
+    def missing_range(
+        self, start: datetime, end: datetime = None
+    ) -> Optional[Tuple[datetime, datetime]]:
+        """Returns the (naive UTC) range that still has to be fetched to cover `[start, end)`.
+
+        Only samples newer than the last stored sample are fetched (the store is append-only).
+        `start` and `end` can be naive (UTC) or aware datetimes.
+        """
+        start = to_naive_utc(start)
+        end = to_naive_utc(end) if end is not None else datetime.utcnow()
+        last = self.last
+        if last is not None:
+            start = max(start, datetime(1970, 1, 1) + timedelta(milliseconds=last + 1))
+        if start >= end:
+            return None
+        return start, end
+
+    def sync(self, client, start: datetime = None, end: datetime = None, progress=None) -> int:
+        """Fetches the heart rate newer than the last stored sample and appends it.
+
+        Args:
+            client (client_vu7.WhoopClient): Authenticated client to fetch the heart rate with.
+            start (datetime, optional): Start of the data to keep. Defaults to the start of the membership.
+            end (datetime, optional): End of the data to fetch. Defaults to now.
+            progress (Callable[[int, int], None], optional): Progress of the fetched windows.
+
+        Returns:
+            int: Number of appended samples.
+        """
+        window = self.missing_range(start or client.start_datetime, end)
+        if window is None:
+            return 0
+        records = client.get_hr(start=window[0], end=window[1], progress=progress, compact=True)
+        if records is None:
+            return 0
+
+        # the windows are rounded to days, so only keep the requested range
+        lo, hi = to_epoch_ms(window[0]), to_epoch_ms(window[1])
+        records = records[(records["time"] >= lo) & (records["time"] < hi)]
+        return self.append_records(records)
@@ -0,0 +1,333 @@
+"""Local columnar archive for the collections of the Whoop API.
+
+Records are stored as Parquet files partitioned by `resource/user_id/year-month` using one flattened
+schema per model (see `models_v1.flatten_fields`). Times are stored in UTC, the timezone offset is
+applied when reading. Requires `pyarrow` (install with `pip install whoopy[archive]`).
+
+Records older than the refresh window are final and appended as part files (merged by `compact`).
+The refresh window is loaded again by every request, so its records are kept in one tail file per
+partition that is replaced (instead of adding another part each time).
+
+Copyright (c) 2022 Felix Geilert
+"""
+
+from datetime import datetime, timedelta
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Type
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from whoopy.models import models_v1 as models
+
+
+# map the python types of the models to arrow types
+ARROW_TYPES = {
+    int: pa.int64(),
+    float: pa.float64(),
+    bool: pa.bool_(),
+    str: pa.string(),
+    datetime: pa.timestamp("us"),
+}
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+TAIL_FILE = "tail.parquet"
+
+
+def model_schema(model: Type[models.UserData]) -> pa.Schema:
+    """Generates the flattened arrow schema of the model."""
+    return pa.schema([(name, ARROW_TYPES[tp]) for name, tp in models.flatten_fields(model)])
+
+
+def apply_offset(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """Shifts the given UTC time columns by the `timezone_offset` of each row (in place)."""
+    if "timezone_offset" not in df.columns or len(df) == 0:
+        return df
+
+    # parse each distinct offset only once
+    offsets = df["timezone_offset"].dropna().unique()
+    deltas = {o: pd.Timedelta(models.parse_offset(o)) for o in offsets}
+    shift = df["timezone_offset"].map(deltas).fillna(pd.Timedelta(0))
+    for col in columns:
+        if col in df.columns:
+            df[col] = df[col] + shift
+    return df
+
+
+class ParquetArchive:
+    def __init__(
+        self,
+        root: str,
+        compact_interval: timedelta = timedelta(hours=1),
+        refresh_window: timedelta = timedelta(days=3),
+    ):
+        """Creates a new archive.
+
+        Args:
+            root (str): Root directory of the archive.
+            compact_interval (timedelta, optional): Minimum time between two automatic compactions
+                (which run after writes). Defaults to 1 hour.
+            refresh_window (timedelta, optional): Most recent part of the history that is never
+                considered complete (as the API still updates it). Defaults to 3 days.
+        """
+        self.root = root
+        self.compact_interval = compact_interval
+        self.refresh_window = refresh_window
+        self._lock = threading.Lock()
+        self._last_compaction = time.time()
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, resource: str, user_id: int) -> str:
+        return os.path.join(self.root, resource.replace("/", "-"), str(user_id))
+
+    @staticmethod
+    def _months(start: datetime, end: datetime) -> List[str]:
+        """Lists the partitions (year-month) that overlap the window."""
+        months, cur = [], datetime(start.year, start.month, 1)
+        while cur < end:
+            months.append(f"{cur.year:04d}-{cur.month:02d}")
+            cur = datetime(cur.year + cur.month // 12, cur.month % 12 + 1, 1)
+        return months
+
+    def coverage(self, resource: str, user_id: int) -> Optional[Tuple[datetime, datetime]]:
+        """Returns the window that is completely held by the archive (or None)."""
+        path = os.path.join(self._dir(resource, user_id), "_coverage.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            cov = json.load(f)
+        return datetime.strptime(cov["start"], TIME_FORMAT), datetime.strptime(cov["end"], TIME_FORMAT)
+
+    def cutoff(self) -> datetime:
+        """Start of the refresh window (records before it are considered final)."""
+        return datetime.utcnow() - self.refresh_window
+
+    def mark_covered(
+        self, resource: str, user_id: int, start: datetime, end: datetime, cutoff: datetime = None
+    ):
+        """Extends the covered window (capped by the refresh window)."""
+        end = min(end, cutoff or self.cutoff())
+        if end <= start:
+            return
+        cov = self.coverage(resource, user_id)
+        if cov is not None:
+            start, end = min(start, cov[0]), max(end, cov[1])
+
+        base = self._dir(resource, user_id)
+        os.makedirs(base, exist_ok=True)
+        tmp = os.path.join(base, f"_coverage.{uuid.uuid4().hex}.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"start": start.strftime(TIME_FORMAT), "end": end.strftime(TIME_FORMAT)}, f)
+        os.replace(tmp, os.path.join(base, "_coverage.json"))
+
+    def missing_windows(
+        self, resource: str, user_id: int, start: datetime, end: datetime
+    ) -> List[Tuple[datetime, datetime]]:
+        """Computes the windows that have to be loaded from the API to answer `[start, end)`."""
+        cov = self.coverage(resource, user_id)
+        if cov is None:
+            return [(start, end)]
+
+        # extend from the covered window (so it stays contiguous)
+        windows = []
+        if start < cov[0]:
+            windows.append((start, cov[0]))
+        if end > cov[1]:
+            windows.append((cov[1], end))
+        return windows
+
+    def write(
+        self,
+        resource: str,
+        user_id: int,
+        df: pd.DataFrame,
+        model: Type[models.UserData],
+        time_key: str = "start",
+    ) -> int:
+        """Writes the frame (with UTC times) into the partitions of its months.
+
+        Returns:
+            int: The number of files written.
+        """
+        if len(df) == 0:
+            return 0
+        schema = model_schema(model)
+
+        # conform the frame to the flattened schema
+        df = df.reindex(columns=schema.names)
+        base = self._dir(resource, user_id)
+        months = pd.to_datetime(df[time_key]).dt.strftime("%Y-%m")
+        files = 0
+        for month, part in df.groupby(months):
+            table = pa.Table.from_pandas(part, schema=schema, preserve_index=False)
+            os.makedirs(os.path.join(base, month), exist_ok=True)
+            pq.write_table(table, os.path.join(base, month, f"part-{uuid.uuid4().hex}.parquet"))
+            files += 1
+
+        self.maybe_compact()
+        return files
+
+    def store_window(
+        self,
+        resource: str,
+        user_id: int,
+        df: pd.DataFrame,
+        model: Type[models.UserData],
+        start: datetime,
+        end: datetime,
+        time_key: str = "start",
+    ) -> int:
+        """Stores the records that were loaded for `[start, end)` and extends the covered window.
+
+        Records before the refresh window are appended to their partitions. If the window reaches into
+        the refresh window, its records replace the tail of the resource.
+
+        Returns:
+            int: The number of files written.
+        """
+        cutoff = self.cutoff()
+        recent = pd.to_datetime(df[time_key]) >= cutoff if len(df) else pd.Series([], dtype=bool)
+        files = self.write(resource, user_id, df[~recent.values], model, time_key)
+        if end > cutoff:
+            files += self.write_tail(resource, user_id, df[recent.values], model, time_key)
+        self.mark_covered(resource, user_id, start, end, cutoff)
+        return files
+
+    def write_tail(
+        self,
+        resource: str,
+        user_id: int,
+        df: pd.DataFrame,
+        model: Type[models.UserData],
+        time_key: str = "start",
+    ) -> int:
+        """Replaces the tail files of the resource with the frame (the files are kept if nothing changed).
+
+        Returns:
+            int: The number of files written.
+        """
+        schema = model_schema(model)
+        base = self._dir(resource, user_id)
+        tables = {}
+        if len(df):
+            df = df.reindex(columns=schema.names)
+            months = pd.to_datetime(df[time_key]).dt.strftime("%Y-%m")
+            tables = {
+                month: pa.Table.from_pandas(part, schema=schema, preserve_index=False)
+                for month, part in df.groupby(months)
+            }
+
+        with self._lock:
+            old = {}
+            if os.path.isdir(base):
+                for month in os.listdir(base):
+                    path = os.path.join(base, month, TAIL_FILE)
+                    if os.path.exists(path):
+                        old[month] = path
+
+            # replace the changed tails (atomically, as readers might list the partition)
+            files = 0
+            for month, table in tables.items():
+                path = os.path.join(base, month, TAIL_FILE)
+                if month in old and pq.read_table(old[month]).equals(table):
+                    continue
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = os.path.join(base, month, f"tail.{uuid.uuid4().hex}.tmp")
+                pq.write_table(table, tmp)
+                os.replace(tmp, path)
+                files += 1
+            for month in set(old) - set(tables):
+                os.remove(old[month])
+        return files
+
+    @staticmethod
+    def _dedup(df: pd.DataFrame, id_key: str) -> pd.DataFrame:
+        """Keeps the latest version of every record."""
+        if "updated_at" in df.columns:
+            df = df.sort_values("updated_at", kind="stable")
+        return df.drop_duplicates(subset=[id_key], keep="last")
+
+    def read(
+        self,
+        resource: str,
+        user_id: int,
+        start: datetime,
+        end: datetime,
+        columns: List[str] = None,
+        time_key: str = "start",
+        id_key: str = "id",
+        model: Type[models.UserData] = None,
+    ) -> pd.DataFrame:
+        """Reads the records with `start <= time < end` (newest first) from the overlapping partitions.
+
+        Args:
+            columns (List[str], optional): Columns to read (all if None).
+            model (Type[models.UserData], optional): Model of the resource, which gives the (typed) columns
+                of the frame if nothing is archived yet.
+        """
+        base = self._dir(resource, user_id)
+        read_cols = None
+        if columns is not None:
+            read_cols = list(dict.fromkeys(list(columns) + [time_key, id_key, "updated_at"]))
+
+        # read only the files of the overlapping partitions (memory mapped)
+        tables = []
+        for month in self._months(start, end):
+            part_dir = os.path.join(base, month)
+            if not os.path.isdir(part_dir):
+                continue
+            for name in sorted(os.listdir(part_dir)):
+                if name.endswith(".parquet"):
+                    tables.append(
+                        pq.read_table(os.path.join(part_dir, name), columns=read_cols, memory_map=True)
+                    )
+        if not tables:
+            if model is None:
+                return pd.DataFrame(columns=columns)
+            df = model_schema(model).empty_table().to_pandas()
+            return df[list(columns)] if columns is not None else df
+
+        df = pa.concat_tables(tables).to_pandas()
+        df = df[(df[time_key] >= start) & (df[time_key] < end)]
+        df = self._dedup(df, id_key).sort_values(time_key, ascending=False, kind="stable")
+        if columns is not None:
+            df = df[list(columns)]
+        return df.reset_index(drop=True)
+
+    def compact(self, min_files: int = 2) -> int:
+        """Merges the files of every partition that holds at least `min_files` files into a single file.
+
+        Returns:
+            int: The number of compacted partitions.
+        """
+        compacted = 0
+        with self._lock:
+            for dirpath, _, names in os.walk(self.root):
+                # tails are replaced by the next request (and never merged)
+                parts = sorted(n for n in names if n.endswith(".parquet") and n != TAIL_FILE)
+                if len(parts) < min_files:
+                    continue
+                tables = [pq.read_table(os.path.join(dirpath, n)) for n in parts]
+                table = pa.concat_tables(tables)
+                # recoveries are identified by their cycle
+                id_key = "id" if "id" in table.column_names else "cycle_id"
+                df = self._dedup(table.to_pandas(), id_key)
+                out = pa.Table.from_pandas(df, schema=table.schema, preserve_index=False)
+
+                # write the merged file before removing the parts
+                pq.write_table(out, os.path.join(dirpath, f"part-{uuid.uuid4().hex}.parquet"))
+                for n in parts:
+                    os.remove(os.path.join(dirpath, n))
+                compacted += 1
+            self._last_compaction = time.time()
+        return compacted
+
+    def maybe_compact(self) -> int:
+        """Compacts the archive if the last compaction is older than the compaction interval."""
+        if time.time() - self._last_compaction < self.compact_interval.total_seconds():
+            return 0
+        return self.compact()
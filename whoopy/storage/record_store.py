@@ -0,0 +1,201 @@
+"""Local persistent store for raw records of the Whoop API.
+
+Records are kept as raw json payloads in SQLite keyed by `(user_id, resource, id)`, together with
+the time window that has been synced per resource and its high-water marks. This allows the data
+handlers to answer repeated queries locally and only fetch the missing or newer part from the API.
+
+Copyright (c) 2022 Felix Geilert
+"""
+
+from datetime import datetime, timedelta
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+
+STORE_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+
+def store_time(date: datetime) -> str:
+    """Converts a naive UTC datetime into the (sortable) time format of the API."""
+    return date.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+class RecordStore:
+    def __init__(self, path: str = ":memory:", refresh_window: timedelta = timedelta(days=3)):
+        """Creates a new record store.
+
+        Args:
+            path (str, optional): Path to the SQLite database. Defaults to ":memory:".
+            refresh_window (timedelta, optional): Records that started within this window before the
+                latest synced record are fetched again on sync, as the API still updates them
+                (e.g. when scores are calculated). Defaults to 3 days.
+        """
+        self.path = path
+        self.refresh_window = refresh_window
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                user_id INTEGER NOT NULL,
+                resource TEXT NOT NULL,
+                id TEXT NOT NULL,
+                start TEXT NOT NULL,
+                updated_at TEXT,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (user_id, resource, id)
+            );
+            CREATE INDEX IF NOT EXISTS records_start ON records (user_id, resource, start);
+            CREATE TABLE IF NOT EXISTS sync_state (
+                user_id INTEGER NOT NULL,
+                resource TEXT NOT NULL,
+                synced_start TEXT NOT NULL,
+                synced_end TEXT NOT NULL,
+                hwm_start TEXT,
+                hwm_updated_at TEXT,
+                PRIMARY KEY (user_id, resource)
+            );
+            """
+        )
+
+    def close(self):
+        """Closes the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def upsert(
+        self,
+        user_id: int,
+        resource: str,
+        records: Iterable[Dict[str, Any]],
+        id_key: str = "id",
+        time_key: str = "start",
+    ) -> int:
+        """Inserts or updates the raw records (older versions never replace newer ones).
+
+        Returns:
+            int: The number of records written.
+        """
+        rows = [
+            (user_id, resource, str(r[id_key]), r[time_key], r.get("updated_at"), json.dumps(r))
+            for r in records
+        ]
+        if not rows:
+            return 0
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO records (user_id, resource, id, start, updated_at, payload)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (user_id, resource, id) DO UPDATE SET
+                    start = excluded.start,
+                    updated_at = excluded.updated_at,
+                    payload = excluded.payload
+                WHERE excluded.updated_at IS NULL
+                    OR records.updated_at IS NULL
+                    OR excluded.updated_at >= records.updated_at
+                """,
+                rows,
+            )
+
+            # move the high-water marks
+            self._conn.execute(
+                """
+                UPDATE sync_state SET
+                    hwm_start = MAX(COALESCE(hwm_start, ''), ?),
+                    hwm_updated_at = MAX(COALESCE(hwm_updated_at, ''), ?)
+                WHERE user_id = ? AND resource = ?
+                """,
+                (
+                    max(r[3] for r in rows),
+                    max(r[4] or "" for r in rows),
+                    user_id,
+                    resource,
+                ),
+            )
+        return len(rows)
+
+    def query(
+        self, user_id: int, resource: str, start: datetime = None, end: datetime = None
+    ) -> List[Dict[str, Any]]:
+        """Returns the raw records with `start <= time < end` (newest first)."""
+        sql = "SELECT payload FROM records WHERE user_id = ? AND resource = ?"
+        params = [user_id, resource]
+        if start is not None:
+            sql += " AND start >= ?"
+            params.append(store_time(start))
+        if end is not None:
+            sql += " AND start < ?"
+            params.append(store_time(end))
+        sql += " ORDER BY start DESC"
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def state(self, user_id: int, resource: str) -> Optional[Dict[str, Any]]:
+        """Returns the synced window and high-water marks of the resource (or None if never synced)."""
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT synced_start, synced_end, hwm_start, hwm_updated_at
+                FROM sync_state WHERE user_id = ? AND resource = ?
+                """,
+                (user_id, resource),
+            ).fetchone()
+        if row is None:
+            return None
+
+        return {
+            "synced_start": datetime.strptime(row[0], STORE_TIME_FORMAT),
+            "synced_end": datetime.strptime(row[1], STORE_TIME_FORMAT),
+            "hwm_start": row[2] or None,
+            "hwm_updated_at": row[3] or None,
+        }
+
+    def mark_synced(self, user_id: int, resource: str, start: datetime, end: datetime):
+        """Extends the synced window of the resource (the window is kept contiguous by the caller)."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO sync_state (user_id, resource, synced_start, synced_end, hwm_start, hwm_updated_at)
+                SELECT ?, ?, ?, ?, MAX(start), MAX(updated_at)
+                FROM records WHERE user_id = ? AND resource = ?
+                ON CONFLICT (user_id, resource) DO UPDATE SET
+                    synced_start = MIN(sync_state.synced_start, excluded.synced_start),
+                    synced_end = MAX(sync_state.synced_end, excluded.synced_end)
+                """,
+                (user_id, resource, store_time(start), store_time(end), user_id, resource),
+            )
+
+    def missing_windows(
+        self, user_id: int, resource: str, start: datetime, end: datetime
+    ) -> List[Dict[str, datetime]]:
+        """Computes the windows that have to be fetched from the API to answer `[start, end)`.
+
+        This includes the part before the synced window and the tail starting shortly before
+        the high-water mark (to pick up new and updated records).
+        """
+        state = self.state(user_id, resource)
+        if state is None:
+            return [{"start": start, "end": end}]
+
+        windows = []
+        if start < state["synced_start"]:
+            windows.append({"start": start, "end": state["synced_start"]})
+
+        # refetch the tail from the latest known record (or the end of the synced window)
+        tail = state["synced_end"]
+        if state["hwm_start"]:
+            hwm = datetime.strptime(state["hwm_start"], STORE_TIME_FORMAT)
+            tail = min(tail, hwm)
+        tail -= self.refresh_window
+        if end > tail:
+            # start at the tail even if the request starts later (keeps the synced window contiguous)
+            windows.append({"start": tail, "end": end})
+
+        return windows
@@ -0,0 +1,95 @@
+"""Shared HTTP transport of the Whoop clients.
+
+All sessions created here share one pooled adapter, so connections (and their TLS handshakes) are
+reused across clients, threads and token refreshes. Responses are negotiated with gzip/deflate.
+
+Copyright (c) 2022 Felix Geilert
+"""
+
+import threading
+from typing import Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 16
+DEFAULT_HEADERS = {
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+_lock = threading.Lock()
+_adapter = None
+
+
+class SharedAdapter(HTTPAdapter):
+    """Adapter that keeps its pool alive when a session using it is closed."""
+
+    def close(self):
+        pass
+
+    def shutdown(self):
+        """Closes all pooled connections."""
+        super().close()
+
+
+def configure(
+    pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+    pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+    pool_block: bool = False,
+) -> SharedAdapter:
+    """Replaces the shared adapter (sessions created afterwards use the new pool).
+
+    Args:
+        pool_connections (int, optional): Number of hosts that are pooled. Defaults to 10.
+        pool_maxsize (int, optional): Maximum number of kept-alive connections per host. Defaults to 16.
+        pool_block (bool, optional): Block when all connections to a host are in use
+            (instead of opening additional connections that are not kept). Defaults to False.
+    """
+    global _adapter
+    with _lock:
+        old = _adapter
+        _adapter = SharedAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block
+        )
+    if old is not None:
+        old.shutdown()
+    return _adapter
+
+
+def shared_adapter() -> SharedAdapter:
+    """Returns the shared adapter (created with the default pool sizes on first use)."""
+    global _adapter
+    with _lock:
+        if _adapter is None:
+            _adapter = SharedAdapter(
+                pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE
+            )
+        return _adapter
+
+
+def create_session(headers: Dict[str, str] = None) -> requests.Session:
+    """Creates a session on the shared pool.
+
+    Args:
+        headers (Dict[str, str], optional): Additional default headers of the session.
+    """
+    session = requests.Session()
+    adapter = shared_adapter()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+def close():
+    """Closes all connections of the shared pool."""
+    global _adapter
+    with _lock:
+        old, _adapter = _adapter, None
+    if old is not None:
+        old.shutdown()